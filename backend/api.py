@@ -3,7 +3,7 @@ PyWebView JS Bridge API
 暴露 Python 功能给前端 JavaScript
 """
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Optional
 from core.calculator import add, subtract, multiply, divide, power
 from core.user_service import UserService
 from core.qt_project import (
@@ -13,12 +13,16 @@ from core.qt_project import (
     run_unit_test,
     run_ui_test,
     TestRecorder,
+    TestSuiteRunner,
+    load_test_report,
     analyze_test_failure,
 )
 from core.database import TestDatabase
 from core.services import VisualAgent
 from backend.static_analysis_api import StaticAnalysisAPI
+from backend.jobs import JobCancelled, JobContext, JobManager
 from core.utils.logger import logger
+from core.utils.process import kill_process_tree
 import platform
 import sys
 
@@ -40,6 +44,8 @@ class API:
         self.visual_agent = VisualAgent()
         # 初始化静态分析 API
         self.static_analysis_api = StaticAnalysisAPI()
+        # 后台任务（窗口创建后由 create_window 设置事件推送目标）
+        self.jobs = JobManager()
         logger.info("API 初始化完成")
 
     # ==================== 计算器 API ====================
@@ -232,9 +238,25 @@ class API:
         Returns:
             测试结果（含 run_id）
         """
+        return self._run_unit_test(executable_path, test_name, project_path)
+
+    def _run_unit_test(
+        self,
+        executable_path: str,
+        test_name: str,
+        project_path: str,
+        ctx: Optional[JobContext] = None
+    ) -> Dict:
+        """运行单元测试并记录（ctx 不为 None 时作为后台任务运行，取消时结束测试进程且不记录）"""
         logger.info(f"运行单元测试: {test_name}, 项目路径: {project_path}")
-        result = run_unit_test(executable_path, test_name)
+        result = run_unit_test(
+            executable_path, test_name,
+            on_start=(lambda process: ctx.on_cancel(lambda: kill_process_tree(process))) if ctx else None
+        )
         logger.info(f"测试执行完成: {test_name}, 状态: {result.status}")
+        if ctx:
+            ctx.check_cancelled()
+            ctx.progress(0.9, "记录测试结果")
         
         # 记录到数据库（不包含 AI 分析）
         logger.info(f"准备记录测试结果到数据库...")
@@ -246,6 +268,85 @@ class API:
         
         return result_dict
     
+    def run_unit_test_suite(self, project_path: str, jobs: int = None, split_functions: bool = False) -> Dict:
+        """
+        并发运行项目的全部单元测试并批量记录
+        
+        Args:
+            project_path: 项目路径
+            jobs: 同时运行的测试进程数，默认为 CPU 核数
+            split_functions: 是否把测试程序按测试函数拆分到多个进程
+            
+        Returns:
+            套件结果（results 中每项含 run_id）
+        """
+        return self._run_unit_test_suite(project_path, jobs, split_functions)
+
+    def _run_unit_test_suite(
+        self,
+        project_path: str,
+        jobs: int = None,
+        split_functions: bool = False,
+        ctx: Optional[JobContext] = None
+    ) -> Dict:
+        """运行单元测试套件（ctx 不为 None 时作为后台任务运行: 逐个推送用例结果，取消时结束全部测试进程且不记录）"""
+        logger.info(f"运行单元测试套件: {project_path}, jobs={jobs}, split={split_functions}")
+        tests = scan_unit_tests(project_path)
+        # 按上次运行的用例耗时均衡分片
+        durations = self.test_db.get_case_durations(project_path)
+        runner = TestSuiteRunner(jobs=jobs, split_functions=split_functions, durations=durations)
+        on_case = on_result = None
+        if ctx:
+            ctx.on_cancel(runner.cancel)
+            finished = []
+
+            def on_case(test_name, case):
+                ctx.progress(
+                    len(finished) / max(1, len(tests)), f"{test_name}::{case.name}",
+                    data={"type": "case", "test_name": test_name, "case": case.to_dict()}
+                )
+
+            def on_result(result):
+                finished.append(result.test_name)
+                ctx.progress(
+                    len(finished) / max(1, len(tests)), f"{result.test_name}: {result.status}",
+                    data={"type": "test", "result": result.to_dict()}
+                )
+
+        suite = runner.run(project_path, tests, on_case=on_case, on_result=on_result)
+        if ctx:
+            ctx.check_cancelled()
+            ctx.progress(None, "记录测试结果")
+        
+        # 一个事务写入全部测试结果
+        suite.run_ids = self.test_recorder.record_unit_tests(project_path, suite.results)
+        return suite.to_dict()
+    
+    def import_test_report(self, project_path: str, report_path: str, test_name: str = None) -> Dict:
+        """
+        导入测试报告文件并记录（QTest XML / JUnit XML / TAP / QTest 纯文本，格式自动识别）
+        
+        Args:
+            project_path: 项目路径
+            report_path: 报告文件路径
+            test_name: 测试名称，默认使用报告中的名称
+            
+        Returns:
+            {"success": True, "results": [测试结果（含 run_id）]} 或 {"success": False, "error": ...}
+        """
+        logger.info(f"导入测试报告: {report_path}")
+        try:
+            results = load_test_report(report_path, test_name)
+        except Exception as e:
+            logger.error(f"导入测试报告失败: {e}")
+            return {"success": False, "error": str(e)}
+        
+        run_ids = self.test_recorder.record_unit_tests(project_path, results)
+        result_dicts = [r.to_dict() for r in results]
+        for result, run_id in zip(result_dicts, run_ids):
+            result["run_id"] = run_id
+        return {"success": True, "results": result_dicts}
+    
     def run_ui_test_with_record(self, executable_path: str, test_name: str, project_path: str) -> Dict:
         """
         运行 UI 测试并记录（含截图）
@@ -258,8 +359,24 @@ class API:
         Returns:
             测试结果（含 run_id）
         """
+        return self._run_ui_test(executable_path, test_name, project_path)
+
+    def _run_ui_test(
+        self,
+        executable_path: str,
+        test_name: str,
+        project_path: str,
+        ctx: Optional[JobContext] = None
+    ) -> Dict:
+        """运行 UI 测试并记录（ctx 不为 None 时作为后台任务运行）"""
         logger.info(f"运行 UI 测试: {test_name}")
-        result = run_ui_test(executable_path, test_name, project_path)
+        result = run_ui_test(
+            executable_path, test_name, project_path,
+            on_start=(lambda process: ctx.on_cancel(lambda: kill_process_tree(process))) if ctx else None
+        )
+        if ctx:
+            ctx.check_cancelled()
+            ctx.progress(0.9, "记录测试结果")
         
         # 记录到数据库（含截图）
         run_id = self.test_recorder.record_ui_test(project_path, result)
@@ -287,6 +404,18 @@ class API:
         Returns:
             AI 分析结果
         """
+        return self._analyze_test_failure(project_path, test_name, test_file_path, failure_output, run_id)
+
+    def _analyze_test_failure(
+        self,
+        project_path: str,
+        test_name: str,
+        test_file_path: str,
+        failure_output: str,
+        run_id: int = None,
+        ctx: Optional[JobContext] = None
+    ) -> str:
+        """分析测试失败原因（ctx 不为 None 时作为后台任务运行，取消后不更新测试历史）"""
         logger.info(f"AI 分析测试失败: {test_name}, run_id: {run_id}")
         analysis = analyze_test_failure(
             project_path,
@@ -294,6 +423,8 @@ class API:
             test_file_path,
             failure_output
         )
+        if ctx:
+            ctx.check_cancelled()
         
         # 如果提供了 run_id，更新测试历史记录
         if run_id is not None:
@@ -685,13 +816,29 @@ class API:
         Returns:
             分析结果
         """
-        return self.static_analysis_api.analyze_project(
+        return self._analyze_project_static(project_dir, include_paths, enable_checks, severity, cppcheck_options)
+
+    def _analyze_project_static(
+        self,
+        project_dir: str,
+        include_paths: List[str] = None,
+        enable_checks: List[str] = None,
+        severity: str = "warning",
+        cppcheck_options: Dict = None,
+        ctx: Optional[JobContext] = None
+    ) -> Dict:
+        """对项目进行静态代码分析（ctx 不为 None 时作为后台任务运行，取消时结束 cppcheck）"""
+        result = self.static_analysis_api.analyze_project(
             project_dir=project_dir,
             include_paths=include_paths,
             enable_checks=enable_checks,
             severity=severity,
-            cppcheck_options=cppcheck_options
+            cppcheck_options=cppcheck_options,
+            on_start=(lambda process: ctx.on_cancel(lambda: kill_process_tree(process))) if ctx else None
         )
+        if ctx:
+            ctx.check_cancelled()
+        return result
     
     def analyze_file_static(self, project_dir: str, file_path: str) -> Dict:
         """
@@ -732,6 +879,37 @@ class API:
             logger.error(f"截屏错误: {e}")
             return {"success": False, "error": str(e)}
     
+    def start_live_view(self, fps: float = 10.0, quality: int = 70, region: List = None) -> Dict:
+        """
+        启动实时画面推流，返回本地 MJPEG / 图块推流地址
+        
+        Args:
+            fps: 目标帧率
+            quality: JPEG 质量 (1-100)
+            region: 截图区域 [x, y, width, height]
+        """
+        try:
+            return self.visual_agent.start_live_view(fps, quality, region)
+        except Exception as e:
+            logger.error(f"启动推流错误: {e}")
+            return {"success": False, "error": str(e)}
+    
+    def stop_live_view(self) -> Dict:
+        """停止实时画面推流"""
+        try:
+            return self.visual_agent.stop_live_view()
+        except Exception as e:
+            logger.error(f"停止推流错误: {e}")
+            return {"success": False, "error": str(e)}
+    
+    def get_live_view_status(self) -> Dict:
+        """获取实时画面推流状态"""
+        try:
+            return self.visual_agent.get_live_view_status()
+        except Exception as e:
+            logger.error(f"获取推流状态错误: {e}")
+            return {"success": False, "error": str(e)}
+    
     def get_window_info(self) -> Dict:
         """获取窗口信息"""
         try:
@@ -849,6 +1027,22 @@ class API:
             logger.error(f"颜色匹配错误: {e}")
             return {"success": False, "error": str(e)}
 
+    def recognize_batch(self, specs: List[Dict], parallel: bool = True) -> Dict:
+        """
+        批量识别 - 截图一次，在同一帧上执行多个模板/颜色识别
+        
+        Args:
+            specs: 识别规格列表，如
+                [{"type": "template", "template": "a.png", "threshold": 0.8, "roi": [...], "id": "保存按钮"},
+                 {"type": "color", "lower": [...], "upper": [...], "min_count": 100}]
+            parallel: 是否并行执行
+        """
+        try:
+            return self.visual_agent.recognize_batch(specs, parallel)
+        except Exception as e:
+            logger.error(f"批量识别错误: {e}")
+            return {"success": False, "error": str(e)}
+
     def click_template(
         self,
         template_path: str,
@@ -921,7 +1115,8 @@ class API:
         self,
         json_path: str,
         entry: str,
-        resource_dir: str = None
+        resource_dir: str = None,
+        adaptive_roi: bool = False
     ) -> Dict:
         """
         从 JSON 文件运行 Pipeline
@@ -930,13 +1125,50 @@ class API:
             json_path: Pipeline 配置文件路径
             entry: 入口节点名
             resource_dir: 资源目录
+            adaptive_roi: 未配置 roi 的节点先在历史命中位置附近识别
         """
         try:
-            return self.visual_agent.run_pipeline_from_file(json_path, entry, resource_dir)
+            return self.visual_agent.run_pipeline_from_file(
+                json_path, entry, resource_dir, adaptive_roi=adaptive_roi
+            )
         except Exception as e:
             logger.error(f"Pipeline 文件错误: {e}")
             return {"success": False, "error": str(e)}
 
+    def get_roi_suggestions(self, json_path: str, min_hits: int = None) -> Dict:
+        """
+        根据历史命中位置生成 Pipeline 各节点的建议 ROI
+        
+        Args:
+            json_path: Pipeline 配置文件路径
+            min_hits: 命中次数少于该值的节点不给出建议
+        """
+        try:
+            return self.visual_agent.get_roi_suggestions(json_path, min_hits)
+        except Exception as e:
+            logger.error(f"生成 ROI 建议错误: {e}")
+            return {"success": False, "error": str(e)}
+
+    def validate_pipeline(
+        self,
+        config: Dict,
+        entry: str = None,
+        resource_dir: str = None
+    ) -> Dict:
+        """
+        校验 Pipeline 配置（模板文件、参数、next 引用、不可达节点）
+        
+        Args:
+            config: Pipeline 配置 (JSON 格式的字典)
+            entry: 入口节点名
+            resource_dir: 资源目录（模板图片等）
+        """
+        try:
+            return self.visual_agent.validate_pipeline(config, entry, resource_dir)
+        except Exception as e:
+            logger.error(f"Pipeline 校验错误: {e}")
+            return {"success": False, "error": str(e)}
+
     def get_vision_capabilities(self) -> Dict:
         """获取视觉识别能力信息"""
         try:
@@ -1020,7 +1252,8 @@ class API:
         pipeline_path: str,
         entry: str,
         launch_app: bool = True,
-        resource_dir: str = None
+        resource_dir: str = None,
+        adaptive_roi: bool = False
     ) -> Dict:
         """
         运行 Pipeline 测试
@@ -1030,7 +1263,20 @@ class API:
             entry: 入口节点名
             launch_app: 是否先启动被测应用
             resource_dir: 资源目录（模板图片等），不提供则使用 pipeline 所在目录
+            adaptive_roi: 未配置 roi 的节点先在历史命中位置附近识别，未命中再扩大到全屏
         """
+        return self._run_pipeline_test(pipeline_path, entry, launch_app, resource_dir, adaptive_roi)
+
+    def _run_pipeline_test(
+        self,
+        pipeline_path: str,
+        entry: str,
+        launch_app: bool = True,
+        resource_dir: str = None,
+        adaptive_roi: bool = False,
+        ctx: Optional[JobContext] = None
+    ) -> Dict:
+        """运行 Pipeline 测试（ctx 不为 None 时作为后台任务运行，取消时停止 Pipeline）"""
         try:
             import time
             import json
@@ -1051,7 +1297,13 @@ class API:
                 launch_result = self.visual_agent.launch_target_app()
                 result["app_launched"] = launch_result.get("success", False)
                 if result["app_launched"]:
-                    time.sleep(2)  # 等待应用启动
+                    # 等待应用启动
+                    if ctx:
+                        ctx.progress(None, "等待应用启动")
+                        ctx.wait(2)
+                        ctx.check_cancelled()
+                    else:
+                        time.sleep(2)
             
             # 智能确定资源目录
             pipeline_file = Path(pipeline_path)
@@ -1083,14 +1335,20 @@ class API:
             pipeline_result = self.visual_agent.run_pipeline_from_file(
                 pipeline_path, 
                 entry, 
-                final_resource_dir
+                final_resource_dir,
+                adaptive_roi=adaptive_roi,
+                on_start=(lambda pipeline: ctx.on_cancel(pipeline.stop)) if ctx else None
             )
+            if ctx:
+                ctx.check_cancelled()
             
             result["pipeline_result"] = pipeline_result
             result["success"] = pipeline_result.get("success", False)
             
             return result
             
+        except JobCancelled:
+            raise
         except Exception as e:
             logger.error(f"运行 Pipeline 测试错误: {e}")
             return {
@@ -1098,6 +1356,89 @@ class API:
                 "error": str(e)
             }
     
+    # ==================== 后台任务 API ====================
+    # submit_* 立即返回任务 ID，任务在 JobManager 的线程池中执行，
+    # 进度和结果通过 "pyjob" 事件推送（也可用 get_job 查询），结果与对应的同步方法相同
+
+    def _submit(self, kind: str, fn, *args) -> Dict:
+        try:
+            job_id = self.jobs.submit(kind, lambda ctx: fn(*args, ctx=ctx))
+            return {"success": True, "job_id": job_id}
+        except Exception as e:
+            logger.error(f"提交后台任务失败: {kind}: {e}")
+            return {"success": False, "error": str(e)}
+
+    def submit_unit_test(self, executable_path: str, test_name: str, project_path: str) -> Dict:
+        """后台运行单元测试并记录（结果同 run_unit_test）"""
+        return self._submit("unit_test", self._run_unit_test, executable_path, test_name, project_path)
+
+    def submit_unit_test_suite(self, project_path: str, jobs: int = None, split_functions: bool = False) -> Dict:
+        """后台运行单元测试套件（结果同 run_unit_test_suite，用例结果随进度事件的 data 推送）"""
+        return self._submit("unit_test_suite", self._run_unit_test_suite, project_path, jobs, split_functions)
+
+    def submit_ui_test(self, executable_path: str, test_name: str, project_path: str) -> Dict:
+        """后台运行 UI 测试并记录（结果同 run_ui_test_with_record）"""
+        return self._submit("ui_test", self._run_ui_test, executable_path, test_name, project_path)
+
+    def submit_test_failure_analysis(
+        self,
+        project_path: str,
+        test_name: str,
+        test_file_path: str,
+        failure_output: str,
+        run_id: int = None
+    ) -> Dict:
+        """后台 AI 分析测试失败原因（结果同 analyze_test_failure）"""
+        return self._submit(
+            "test_failure_analysis", self._analyze_test_failure,
+            project_path, test_name, test_file_path, failure_output, run_id
+        )
+
+    def submit_static_analysis(
+        self,
+        project_dir: str,
+        include_paths: List[str] = None,
+        enable_checks: List[str] = None,
+        severity: str = "warning",
+        cppcheck_options: Dict = None
+    ) -> Dict:
+        """后台对项目进行静态代码分析（结果同 analyze_project_static）"""
+        return self._submit(
+            "static_analysis", self._analyze_project_static,
+            project_dir, include_paths, enable_checks, severity, cppcheck_options
+        )
+
+    def submit_pipeline_test(
+        self,
+        pipeline_path: str,
+        entry: str,
+        launch_app: bool = True,
+        resource_dir: str = None,
+        adaptive_roi: bool = False
+    ) -> Dict:
+        """后台运行 Pipeline 测试（结果同 run_pipeline_test）"""
+        return self._submit(
+            "pipeline_test", self._run_pipeline_test,
+            pipeline_path, entry, launch_app, resource_dir, adaptive_roi
+        )
+
+    def cancel_job(self, job_id: str) -> Dict:
+        """取消后台任务（排队中的直接取消，运行中的结束子进程/停止 Pipeline）"""
+        if self.jobs.cancel(job_id):
+            return {"success": True, "job_id": job_id}
+        return {"success": False, "error": f"任务不存在或已结束: {job_id}"}
+
+    def get_job(self, job_id: str) -> Dict:
+        """查询后台任务状态（已结束的任务包含 result）"""
+        job = self.jobs.get(job_id)
+        if job is None:
+            return {"success": False, "error": f"任务不存在: {job_id}"}
+        return {"success": True, "job": job}
+
+    def list_jobs(self, kind: str = None) -> Dict:
+        """列出后台任务（不含结果）"""
+        return {"success": True, "jobs": self.jobs.list(kind)}
+
     # ==================== 编辑器集成 API ====================
     
     def open_file_at_line(self, file_path: str, line: int, column: int = 1) -> Dict:
@@ -0,0 +1,301 @@
+"""
+后台任务 - 耗时的 API 调用在工作线程中执行
+
+PyWebView 在桥接线程上同步执行 js_api 的方法: 运行单元测试、Pipeline 测试（启动应用后等待 2 秒以上）、
+cppcheck 静态分析（最长 5 分钟）、AI 失败分析（网络请求）期间，前端的其他调用都要排队等待。
+
+JobManager 把这些调用放到有界线程池中执行:
+- submit 立即返回任务 ID，任务在线程池中排队执行
+- 进度、完成、失败、取消通过 window.evaluate_js 派发 "pyjob" 事件推送到前端
+  （window.addEventListener('pyjob', e => e.detail)），前端也可以用 get_job 轮询
+- cancel: 排队中的任务直接取消；运行中的任务设置取消标志并执行任务注册的取消回调
+  （如结束测试子进程、停止 Pipeline），无法中断的阻塞调用结束后丢弃结果并标记为已取消
+"""
+
+import json
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from core.utils.logger import logger
+
+
+# 任务状态
+PENDING = "pending"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINISHED_STATES = (SUCCEEDED, FAILED, CANCELLED)
+
+# 前端事件名
+JOB_EVENT = "pyjob"
+
+
+class JobCancelled(Exception):
+    """任务已被取消（由 JobContext.check_cancelled 抛出）"""
+
+
+@dataclass
+class Job:
+    """一个后台任务"""
+    id: str
+    kind: str
+    status: str = PENDING
+    progress: Optional[float] = None
+    message: str = ""
+    result: Any = None
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    cancel_event: threading.Event = field(default_factory=threading.Event, repr=False)
+    cancel_callbacks: List[Callable[[], None]] = field(default_factory=list, repr=False)
+    future: Optional[Future] = field(default=None, repr=False)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATES
+
+    def to_dict(self, include_result: bool = True) -> Dict[str, Any]:
+        data = {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "progress": self.progress,
+            "message": self.message,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "cancel_requested": self.cancel_event.is_set(),
+        }
+        if include_result:
+            data["result"] = self.result
+        return data
+
+
+class JobContext:
+    """传给任务函数的上下文，用于报告进度和响应取消"""
+
+    def __init__(self, manager: 'JobManager', job: Job):
+        self._manager = manager
+        self._job = job
+
+    @property
+    def job_id(self) -> str:
+        return self._job.id
+
+    @property
+    def cancelled(self) -> bool:
+        return self._job.cancel_event.is_set()
+
+    def check_cancelled(self):
+        """已请求取消时抛出 JobCancelled，供任务在步骤之间调用"""
+        if self.cancelled:
+            raise JobCancelled()
+
+    def wait(self, seconds: float) -> bool:
+        """等待指定秒数（代替 time.sleep），期间请求取消时提前返回 True"""
+        return self._job.cancel_event.wait(seconds)
+
+    def progress(self, value: Optional[float] = None, message: str = "", data: Any = None):
+        """报告进度
+
+        Args:
+            value: 0~1 的进度，None 表示不确定
+            message: 当前步骤说明
+            data: 随本次事件推送的增量数据（如刚完成的用例），不保存在任务中
+        """
+        self._manager._update_progress(self._job, value, message, data)
+
+    def on_cancel(self, callback: Callable[[], None]):
+        """注册取消回调（如结束子进程），注册时已请求取消则立即执行"""
+        with self._manager._lock:
+            if not self._job.cancel_event.is_set():
+                self._job.cancel_callbacks.append(callback)
+                return
+        self._manager._run_cancel_callback(self._job, callback)
+
+
+class JobManager:
+    """有界线程池上的后台任务管理
+
+    示例:
+        >>> manager = JobManager(max_workers=2)
+        >>> manager.set_window(window)
+        >>> job_id = manager.submit("unit_test", lambda ctx: run_unit_test(path, name))
+        >>> manager.get(job_id)["status"]
+        'running'
+    """
+
+    # 默认工作线程数
+    MAX_WORKERS = 2
+    # 最多保留的已结束任务数（超出时丢弃最早结束的）
+    MAX_FINISHED = 100
+
+    def __init__(self, max_workers: int = MAX_WORKERS, max_finished: int = MAX_FINISHED):
+        """
+        Args:
+            max_workers: 同时执行的任务数
+            max_finished: 最多保留的已结束任务数
+        """
+        self.max_workers = max_workers
+        self.max_finished = max_finished
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self._window = None
+
+    def set_window(self, window):
+        """设置用于推送事件的 PyWebView 窗口（None 表示不推送，前端轮询 get）"""
+        self._window = window
+
+    def submit(self, kind: str, fn: Callable[..., Any], *args, **kwargs) -> str:
+        """提交任务
+
+        Args:
+            kind: 任务类型（unit_test / pipeline_test / static_analysis ...）
+            fn: 任务函数，第一个参数为 JobContext，返回值需可 JSON 序列化
+
+        Returns:
+            任务 ID
+        """
+        job = Job(id=uuid.uuid4().hex[:12], kind=kind)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        logger.info(f"提交后台任务: {kind} ({job.id})")
+        self._emit(job)
+        job.future = self._executor.submit(self._run, job, fn, args, kwargs)
+        return job.id
+
+    def cancel(self, job_id: str) -> bool:
+        """取消任务
+
+        Returns:
+            任务存在且尚未结束时返回 True
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.finished:
+                return False
+            job.cancel_event.set()
+            callbacks, job.cancel_callbacks = job.cancel_callbacks, []
+            pending = job.status == PENDING and job.future is not None and job.future.cancel()
+            if pending:
+                self._finish(job, CANCELLED)
+
+        logger.info(f"取消后台任务: {job.kind} ({job.id})")
+        if pending:
+            self._emit(job)
+            return True
+        for callback in callbacks:
+            self._run_cancel_callback(job, callback)
+        self._emit(job)
+        return True
+
+    def get(self, job_id: str, include_result: bool = True) -> Optional[Dict[str, Any]]:
+        """任务状态，不存在时返回 None"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job.to_dict(include_result) if job else None
+
+    def list(self, kind: Optional[str] = None) -> List[Dict[str, Any]]:
+        """全部任务（不含结果），按创建时间排序"""
+        with self._lock:
+            jobs = sorted(self._jobs.values(), key=lambda j: j.created_at)
+            return [j.to_dict(include_result=False) for j in jobs if kind is None or j.kind == kind]
+
+    def shutdown(self, cancel_running: bool = True):
+        """关闭线程池（应用退出时调用）"""
+        if cancel_running:
+            with self._lock:
+                ids = [j.id for j in self._jobs.values() if not j.finished]
+            for job_id in ids:
+                self.cancel(job_id)
+        self._executor.shutdown(wait=False)
+
+    # ==================== 内部 ====================
+
+    def _run(self, job: Job, fn: Callable[..., Any], args, kwargs):
+        with self._lock:
+            if job.cancel_event.is_set():
+                self._finish(job, CANCELLED)
+                started = False
+            else:
+                job.status = RUNNING
+                job.started_at = time.time()
+                started = True
+        self._emit(job)
+        if not started:
+            return
+
+        try:
+            result = fn(JobContext(self, job), *args, **kwargs)
+            status, error = (CANCELLED, None) if job.cancel_event.is_set() else (SUCCEEDED, None)
+        except JobCancelled:
+            result, status, error = None, CANCELLED, None
+        except Exception as e:
+            logger.error(f"后台任务失败: {job.kind} ({job.id}): {e}")
+            result, status, error = None, (CANCELLED if job.cancel_event.is_set() else FAILED), str(e)
+
+        with self._lock:
+            # 取消后结束的任务丢弃结果
+            job.result = result if status == SUCCEEDED else None
+            job.error = error
+            self._finish(job, status)
+        logger.info(f"后台任务结束: {job.kind} ({job.id}) {status}")
+        self._emit(job)
+
+    def _finish(self, job: Job, status: str):
+        """标记任务结束，调用方需持有锁"""
+        job.status = status
+        job.finished_at = time.time()
+        if status == SUCCEEDED:
+            job.progress = 1.0
+        job.cancel_callbacks = []
+
+    def _update_progress(self, job: Job, value: Optional[float], message: str, data: Any = None):
+        with self._lock:
+            if job.finished:
+                return
+            job.progress = None if value is None else max(0.0, min(1.0, float(value)))
+            job.message = message
+        self._emit(job, data)
+
+    def _run_cancel_callback(self, job: Job, callback: Callable[[], None]):
+        try:
+            callback()
+        except Exception as e:
+            logger.warning(f"任务取消回调失败: {job.kind} ({job.id}): {e}")
+
+    def _prune(self):
+        """丢弃最早结束的任务，调用方需持有锁"""
+        finished = [j for j in self._jobs.values() if j.finished]
+        if len(finished) <= self.max_finished:
+            return
+        finished.sort(key=lambda j: j.finished_at or 0)
+        for job in finished[:len(finished) - self.max_finished]:
+            del self._jobs[job.id]
+
+    def _emit(self, job: Job, data: Any = None):
+        """向前端派发任务事件（只在任务结束时附带结果，进度事件可附带增量数据 data）"""
+        window = self._window
+        if window is None:
+            return
+        with self._lock:
+            detail = job.to_dict(include_result=job.finished)
+        if data is not None:
+            detail["data"] = data
+        try:
+            payload = json.dumps(detail, default=str)
+            window.evaluate_js(
+                f"window.dispatchEvent(new CustomEvent({json.dumps(JOB_EVENT)}, {{detail: {payload}}}))"
+            )
+        except Exception as e:
+            logger.warning(f"推送任务事件失败: {job.kind} ({job.id}): {e}")
@@ -3,7 +3,7 @@
 提供 cppcheck 相关的后端接口
 """
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Callable, Dict, Optional
 
 from core.qt_project.cppcheck_manager import CppcheckManager
 from core.qt_project.static_analyzer import StaticAnalyzer
@@ -76,7 +76,8 @@ class StaticAnalysisAPI:
         include_paths: Optional[list] = None,
         enable_checks: Optional[list] = None,
         severity: str = "warning",
-        cppcheck_options: Optional[dict] = None
+        cppcheck_options: Optional[dict] = None,
+        on_start: Optional[Callable] = None
     ) -> Dict[str, any]:
         """
         分析整个项目
@@ -87,6 +88,7 @@ class StaticAnalysisAPI:
             enable_checks: 启用的检查类型
             severity: 严重程度过滤
             cppcheck_options: cppcheck 选项配置
+            on_start: cppcheck 进程启动后的回调（见 StaticAnalyzer.analyze）
         
         Returns:
             分析结果字典
@@ -149,7 +151,8 @@ class StaticAnalysisAPI:
                 include_paths=include_paths,
                 enable_checks=enable_checks,  # 直接传递，不做默认值处理
                 severity=severity,
-                extra_args=extra_args if extra_args else None
+                extra_args=extra_args if extra_args else None,
+                on_start=on_start
             )
             
             logger.info(f"项目分析完成: {result.get('message')}")
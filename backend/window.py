@@ -55,6 +55,10 @@ def create_window(dev: bool = False) -> webview.Window:
         background_color="#FFFFFF",
     )
 
+    # 后台任务的进度和结果推送到该窗口，窗口关闭时取消未结束的任务
+    api.jobs.set_window(window)
+    window.events.closed += lambda: api.jobs.shutdown()
+
     logger.info("窗口创建成功")
     return window
 
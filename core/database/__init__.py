@@ -3,6 +3,6 @@
 管理测试历史记录和截图
 """
 from .db_manager import TestDatabase
-from .models import TestRun, TestCaseDetail, Screenshot
+from .models import TestRun, TestCaseDetail, Screenshot, NodeLocation
 
-__all__ = ['TestDatabase', 'TestRun', 'TestCaseDetail', 'Screenshot']
+__all__ = ['TestDatabase', 'TestRun', 'TestCaseDetail', 'Screenshot', 'NodeLocation']
@@ -4,9 +4,9 @@
 """
 import sqlite3
 from pathlib import Path
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime, timedelta
-from .models import TestRun, TestCaseDetail, Screenshot, TestRunDetail
+from .models import TestRun, TestCaseDetail, Screenshot, TestRunDetail, NodeLocation
 from core.utils.logger import logger
 
 
@@ -58,10 +58,16 @@ class TestDatabase:
                     case_name TEXT NOT NULL,
                     status TEXT NOT NULL,
                     message TEXT,
+                    duration_ms REAL,
                     FOREIGN KEY (run_id) REFERENCES test_runs(id) ON DELETE CASCADE
                 )
             """)
             
+            # 旧数据库的用例详情表没有耗时列
+            columns = {row[1] for row in cursor.execute("PRAGMA table_info(test_case_details)")}
+            if 'duration_ms' not in columns:
+                cursor.execute("ALTER TABLE test_case_details ADD COLUMN duration_ms REAL")
+            
             # UI 测试截图表
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS test_screenshots (
@@ -75,6 +81,27 @@ class TestDatabase:
                 )
             """)
             
+            # Pipeline 节点命中位置统计表（用于自动收窄 ROI）
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS node_locations (
+                    pipeline TEXT NOT NULL,
+                    node TEXT NOT NULL,
+                    hits INTEGER DEFAULT 0,
+                    frame_width INTEGER DEFAULT 0,
+                    frame_height INTEGER DEFAULT 0,
+                    min_x INTEGER DEFAULT 0,
+                    min_y INTEGER DEFAULT 0,
+                    max_x INTEGER DEFAULT 0,
+                    max_y INTEGER DEFAULT 0,
+                    last_x INTEGER DEFAULT 0,
+                    last_y INTEGER DEFAULT 0,
+                    last_width INTEGER DEFAULT 0,
+                    last_height INTEGER DEFAULT 0,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (pipeline, node)
+                )
+            """)
+            
             # 创建索引
             cursor.execute("""
                 CREATE INDEX IF NOT EXISTS idx_test_runs_project 
@@ -124,12 +151,73 @@ class TestDatabase:
             cursor = conn.cursor()
             for detail in details:
                 cursor.execute("""
-                    INSERT INTO test_case_details (run_id, case_name, status, message)
-                    VALUES (?, ?, ?, ?)
-                """, (run_id, detail.case_name, detail.status, detail.message))
+                    INSERT INTO test_case_details (run_id, case_name, status, message, duration_ms)
+                    VALUES (?, ?, ?, ?, ?)
+                """, (run_id, detail.case_name, detail.status, detail.message, detail.duration_ms))
             conn.commit()
             logger.info(f"保存 {len(details)} 个测试用例详情")
     
+    def save_test_runs(self, runs: List[Tuple[TestRun, List[TestCaseDetail]]]) -> List[int]:
+        """
+        批量保存测试运行记录及其用例详情（单个事务）
+        
+        Args:
+            runs: [(测试运行记录, 用例详情列表), ...]，详情的 run_id 会被忽略
+            
+        Returns:
+            run_ids: 与 runs 顺序一致的记录 ID
+        """
+        run_ids = []
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            for run, details in runs:
+                cursor.execute("""
+                    INSERT INTO test_runs (
+                        project_path, test_name, test_type, status,
+                        total, passed, failed, skipped, duration, output, ai_analysis
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, (
+                    run.project_path, run.test_name, run.test_type, run.status,
+                    run.total, run.passed, run.failed, run.skipped,
+                    run.duration, run.output, run.ai_analysis
+                ))
+                run_id = cursor.lastrowid
+                cursor.executemany("""
+                    INSERT INTO test_case_details (run_id, case_name, status, message, duration_ms)
+                    VALUES (?, ?, ?, ?, ?)
+                """, [(run_id, d.case_name, d.status, d.message, d.duration_ms) for d in details])
+                run_ids.append(run_id)
+            conn.commit()
+        logger.info(f"批量保存 {len(run_ids)} 条测试记录")
+        return run_ids
+    
+    def get_case_durations(self, project_path: str) -> Dict[str, Dict[str, float]]:
+        """
+        项目中每个单元测试最近一次有耗时记录的运行中各测试函数的耗时
+        
+        Args:
+            project_path: 项目路径
+            
+        Returns:
+            {测试名称: {测试函数: 毫秒}}，数据驱动测试的各数据行耗时累加到函数
+        """
+        with sqlite3.connect(self.db_path) as conn:
+            rows = conn.execute("""
+                SELECT r.id, r.test_name, d.case_name, d.duration_ms
+                FROM test_case_details d JOIN test_runs r ON d.run_id = r.id
+                WHERE r.project_path = ? AND r.test_type = 'unit' AND d.duration_ms IS NOT NULL
+                ORDER BY r.id
+            """, (project_path,)).fetchall()
+        
+        latest: Dict[str, Tuple[int, Dict[str, float]]] = {}
+        for run_id, test_name, case_name, duration_ms in rows:
+            if test_name not in latest or latest[test_name][0] != run_id:
+                latest[test_name] = (run_id, {})
+            functions = latest[test_name][1]
+            function = case_name.split('(', 1)[0]
+            functions[function] = functions.get(function, 0.0) + duration_ms
+        return {test_name: functions for test_name, (_, functions) in latest.items()}
+    
     def save_screenshot(self, run_id: int, step_number: int, step_name: str, image_data: bytes):
         """
         保存截图到数据库
@@ -338,3 +426,76 @@ class TestDatabase:
             rows = cursor.fetchall()
             logger.info(f"查询到 {len(rows)} 条记录")
             return [TestRun(**dict(row)) for row in rows]
+    
+    def get_node_locations(self, pipeline: Optional[str] = None) -> List[NodeLocation]:
+        """
+        获取 Pipeline 节点的历史命中位置统计
+        
+        Args:
+            pipeline: Pipeline 标识（配置文件路径），None 表示全部
+            
+        Returns:
+            位置统计列表
+        """
+        with sqlite3.connect(self.db_path) as conn:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            if pipeline is None:
+                cursor.execute("SELECT * FROM node_locations ORDER BY pipeline, node")
+            else:
+                cursor.execute("""
+                    SELECT * FROM node_locations WHERE pipeline = ? ORDER BY node
+                """, (pipeline,))
+            return [NodeLocation(**dict(row)) for row in cursor.fetchall()]
+    
+    def save_node_locations(self, locations: List[NodeLocation]):
+        """
+        保存节点位置统计（按 pipeline + node 覆盖写入，单个事务）
+        
+        Args:
+            locations: 位置统计列表（字段与 NodeLocation 相同的对象均可）
+        """
+        if not locations:
+            return
+        with sqlite3.connect(self.db_path) as conn:
+            conn.executemany("""
+                INSERT OR REPLACE INTO node_locations (
+                    pipeline, node, hits, frame_width, frame_height,
+                    min_x, min_y, max_x, max_y,
+                    last_x, last_y, last_width, last_height, updated_at
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+            """, [
+                (
+                    loc.pipeline, loc.node, loc.hits, loc.frame_width, loc.frame_height,
+                    loc.min_x, loc.min_y, loc.max_x, loc.max_y,
+                    loc.last_x, loc.last_y, loc.last_width, loc.last_height
+                )
+                for loc in locations
+            ])
+            conn.commit()
+            logger.info(f"保存 {len(locations)} 个节点位置统计")
+    
+    def delete_node_locations(self, pipeline: str, node: Optional[str] = None) -> int:
+        """
+        删除节点位置统计（界面布局变化后重新学习）
+        
+        Args:
+            pipeline: Pipeline 标识
+            node: 节点名，None 表示该 Pipeline 的全部节点
+            
+        Returns:
+            删除的记录数
+        """
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            if node is None:
+                cursor.execute("DELETE FROM node_locations WHERE pipeline = ?", (pipeline,))
+            else:
+                cursor.execute(
+                    "DELETE FROM node_locations WHERE pipeline = ? AND node = ?",
+                    (pipeline, node)
+                )
+            deleted = cursor.rowcount
+            conn.commit()
+            logger.info(f"删除了 {deleted} 条节点位置统计")
+            return deleted
@@ -36,6 +36,7 @@ class TestCaseDetail:
     case_name: str = ""
     status: str = ""  # 'PASS' | 'FAIL' | 'SKIP'
     message: Optional[str] = None
+    duration_ms: Optional[float] = None  # 耗时（毫秒），来自 QTest XML 报告
     
     def to_dict(self):
         return asdict(self)
@@ -69,6 +70,30 @@ class Screenshot:
         return result
 
 
+@dataclass
+class NodeLocation:
+    """Pipeline 节点的历史命中位置统计"""
+    pipeline: str = ""
+    node: str = ""
+    hits: int = 0
+    frame_width: int = 0
+    frame_height: int = 0
+    # 全部命中框的外接矩形
+    min_x: int = 0
+    min_y: int = 0
+    max_x: int = 0
+    max_y: int = 0
+    # 最近一次命中框
+    last_x: int = 0
+    last_y: int = 0
+    last_width: int = 0
+    last_height: int = 0
+    updated_at: Optional[str] = None
+    
+    def to_dict(self):
+        return asdict(self)
+
+
 @dataclass
 class TestRunDetail:
     """测试运行详情（含用例和截图）"""
@@ -5,6 +5,8 @@ from .scanner import scan_qt_projects, QtProjectInfo
 from .file_tree import scan_directory_tree, FileNode
 from .unit_test_scanner import scan_unit_tests, UnitTestFile
 from .unit_test_runner import run_unit_test, TestResult
+from .test_suite_runner import TestSuiteRunner, TestSuiteResult
+from .test_report import load_test_report, parse_qtest_xml, parse_junit_xml, parse_tap
 from .ui_test_runner import run_ui_test, UITestResult
 from .test_recorder import TestRecorder
 from .test_analyzer import analyze_test_failure
@@ -14,6 +16,8 @@ __all__ = [
     'scan_directory_tree', 'FileNode',
     'scan_unit_tests', 'UnitTestFile',
     'run_unit_test', 'TestResult',
+    'TestSuiteRunner', 'TestSuiteResult',
+    'load_test_report', 'parse_qtest_xml', 'parse_junit_xml', 'parse_tap',
     'run_ui_test', 'UITestResult',
     'TestRecorder',
     'analyze_test_failure'
@@ -5,10 +5,11 @@
 import subprocess
 import xml.etree.ElementTree as ET
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import Callable, List, Dict, Optional
 from datetime import datetime
 
 from core.utils.logger import logger
+from core.utils.process import process_group_kwargs, kill_process_tree
 from core.qt_project.cppcheck_manager import CppcheckManager
 
 
@@ -30,7 +31,8 @@ class StaticAnalyzer:
         include_paths: Optional[List[str]] = None,
         enable_checks: Optional[List[str]] = None,
         severity: str = "warning",
-        extra_args: Optional[List[str]] = None
+        extra_args: Optional[List[str]] = None,
+        on_start: Optional[Callable[[subprocess.Popen], None]] = None
     ) -> Dict[str, any]:
         """
         执行静态代码分析
@@ -40,6 +42,7 @@ class StaticAnalyzer:
             enable_checks: 启用的检查类型 (如 ["all", "style", "performance"])
             severity: 严重程度过滤 (error, warning, style, performance, portability, information)
             extra_args: 额外的 cppcheck 命令行参数
+            on_start: cppcheck 进程启动后的回调（后台任务用它注册取消时结束进程）
         
         Returns:
             分析结果字典
@@ -107,31 +110,40 @@ class StaticAnalyzer:
         
         try:
             # 执行 cppcheck
-            result = subprocess.run(
+            process = subprocess.Popen(
                 cmd,
-                capture_output=True,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
                 text=True,
-                timeout=300,  # 5分钟超时
-                cwd=str(self.project_dir)
+                cwd=str(self.project_dir),
+                **process_group_kwargs()
             )
+            if on_start is not None:
+                on_start(process)
+            try:
+                stdout, stderr = process.communicate(timeout=300)  # 5分钟超时
+            except subprocess.TimeoutExpired:
+                kill_process_tree(process)
+                process.communicate()
+                raise
             
             # cppcheck 将结果输出到 stderr（XML 格式）
-            xml_output = result.stderr
+            xml_output = stderr
             
             # 输出调试信息
-            logger.info(f"Cppcheck 返回码: {result.returncode}")
+            logger.info(f"Cppcheck 返回码: {process.returncode}")
             logger.info(f"Stderr 长度: {len(xml_output)} 字符")
-            logger.info(f"Stdout 长度: {len(result.stdout)} 字符")
+            logger.info(f"Stdout 长度: {len(stdout)} 字符")
             
             # 如果 stderr 为空，检查 stdout
-            if not xml_output and result.stdout:
-                xml_output = result.stdout
+            if not xml_output and stdout:
+                xml_output = stdout
                 logger.warning("Cppcheck 输出到 stdout 而不是 stderr")
             
             if not xml_output or '<results' not in xml_output:
                 logger.warning(f"未找到有效的 XML 输出，可能 cppcheck 运行失败或没有发现问题")
-                logger.debug(f"Stderr 内容: {result.stderr[:500]}")
-                logger.debug(f"Stdout 内容: {result.stdout[:500]}")
+                logger.debug(f"Stderr 内容: {stderr[:500]}")
+                logger.debug(f"Stdout 内容: {stdout[:500]}")
                 return {
                     "success": True,
                     "message": "分析完成，未发现问题（或 cppcheck 输出格式异常）",
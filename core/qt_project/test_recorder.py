@@ -41,8 +41,37 @@ class TestRecorder:
         """
         logger.info(f"记录单元测试: {result.test_name}")
         
-        # 创建测试运行记录
-        run = TestRun(
+        # 保存到数据库
+        run_id = self.db.save_test_run(self._unit_test_run(project_path, result, ai_analysis))
+        
+        # 保存测试用例详情
+        self.db.save_test_case_details(run_id, self._case_details(result, run_id))
+        
+        logger.info(f"单元测试记录完成: run_id={run_id}")
+        return run_id
+    
+    def record_unit_tests(self, project_path: str, results: List[TestResult]) -> List[int]:
+        """
+        批量记录单元测试结果（测试套件，单个数据库事务）
+        
+        Args:
+            project_path: 项目路径
+            results: 测试结果列表
+            
+        Returns:
+            run_ids: 与 results 顺序一致的记录 ID
+        """
+        run_ids = self.db.save_test_runs([
+            (self._unit_test_run(project_path, result), self._case_details(result))
+            for result in results
+        ])
+        logger.info(f"测试套件记录完成: {len(run_ids)} 条")
+        return run_ids
+    
+    @staticmethod
+    def _unit_test_run(project_path: str, result: TestResult, ai_analysis: str = None) -> TestRun:
+        """单元测试结果对应的测试运行记录"""
+        return TestRun(
             project_path=project_path,
             test_name=result.test_name,
             test_type='unit',
@@ -55,24 +84,20 @@ class TestRecorder:
             output=result.output,
             ai_analysis=ai_analysis
         )
-        
-        # 保存到数据库
-        run_id = self.db.save_test_run(run)
-        
-        # 保存测试用例详情
-        details = [
+    
+    @staticmethod
+    def _case_details(result: TestResult, run_id: int = 0) -> List[TestCaseDetail]:
+        """单元测试结果对应的用例详情记录"""
+        return [
             TestCaseDetail(
                 run_id=run_id,
-                case_name=case.name,
+                case_name=case.label,
                 status=case.status,
-                message=case.message
+                message=case.message,
+                duration_ms=case.duration_ms
             )
             for case in result.details
         ]
-        self.db.save_test_case_details(run_id, details)
-        
-        logger.info(f"单元测试记录完成: run_id={run_id}")
-        return run_id
     
     def record_ui_test(
         self, 
@@ -0,0 +1,445 @@
+"""
+测试报告解析 - QTest XML / JUnit XML / TAP
+
+纯文本输出是给人看的: 格式随 Qt 版本变化，用例耗时、基准测试指标也不完整。
+QTest 可以同时输出多种格式（`-o report.xml,xml -o -,txt`），运行器让文本输出走 stdout 用于实时显示，
+机器可读的报告写入临时文件，进程结束后解析为结构化结果:
+- 每个测试函数的耗时（<Duration msecs>），用于测试套件按耗时均衡分片
+- 数据驱动测试的每个数据行（<DataTag>）
+- 基准测试指标（<BenchmarkResult>）
+
+XML 使用 iterparse 流式解析，每个 TestFunction / testcase 处理完即释放，大报告也不会整体载入内存。
+load_test_report 也可以直接导入已有的报告文件（格式自动识别）。
+"""
+import os
+import re
+import tempfile
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+from core.qt_project.unit_test_runner import (
+    TestCaseResult, TestResult, FAILED_STATUSES, parse_qtest_output
+)
+from core.utils.logger import logger
+
+
+# 运行器默认请求的报告格式（QTest 的 -o 格式名）
+DEFAULT_REPORT_FORMAT = 'xml'
+REPORT_FORMATS = ('xml', 'junitxml', 'tap')
+
+# QTest XML 的 Incident 类型 -> 用例状态（xfail 不是用例结果，记为附加信息）
+XML_INCIDENT_STATUS = {
+    'pass': 'PASS', 'fail': 'FAIL', 'skip': 'SKIP', 'xpass': 'XPASS',
+    'bpass': 'BPASS', 'bfail': 'BFAIL', 'bxpass': 'BXPASS', 'bxfail': 'BXFAIL',
+}
+
+# 基准测试指标 -> 文本输出中的单位
+BENCHMARK_UNITS = {
+    'WalltimeMilliseconds': 'msecs',
+    'WalltimeNanoseconds': 'nsecs',
+    'CPUTicks': 'CPU ticks',
+    'InstructionReads': 'instruction reads',
+    'Events': 'events',
+}
+
+# 带数据标签的用例名: add(negative)
+LABEL_PATTERN = re.compile(r'^(\w+)\((.*)\)$')
+
+# TAP 结果行: ok 2 - add(positive) / not ok 3 - add(negative) # TODO 说明
+TAP_LINE_PATTERN = re.compile(r'^(not\s+)?ok\b\s*\d*\s*-?\s*(.*?)(?:\s+#\s*(SKIP|TODO)\b\s*(.*))?$', re.IGNORECASE)
+
+Source = Union[str, os.PathLike]
+
+
+def qtest_report_args(report_path: Source, report_format: str = DEFAULT_REPORT_FORMAT) -> List[str]:
+    """QTest 命令行参数: 报告写入 report_path，纯文本输出仍写到 stdout"""
+    return ['-o', f"{report_path},{report_format}", '-o', '-,txt']
+
+
+def create_report_path(test_name: str, report_format: str = DEFAULT_REPORT_FORMAT) -> str:
+    """创建报告临时文件（由调用方在读取后删除）"""
+    suffix = '.tap' if report_format == 'tap' else '.xml'
+    fd, path = tempfile.mkstemp(prefix=f"{test_name}_", suffix=suffix)
+    os.close(fd)
+    return path
+
+
+def read_qtest_report(
+    report_path: Source,
+    report_format: str,
+    test_name: str,
+    return_code: int,
+    output: str = ''
+) -> Optional[TestResult]:
+    """
+    读取并删除运行器生成的报告
+
+    Returns:
+        解析结果；报告为空或解析失败（如进程崩溃导致 XML 不完整）时返回 None，由调用方使用文本解析结果
+    """
+    path = Path(report_path)
+    try:
+        if not path.exists() or path.stat().st_size == 0:
+            return None
+        if report_format == 'xml':
+            return parse_qtest_xml(path, test_name, return_code, output)
+        if report_format == 'junitxml':
+            results = parse_junit_xml(path, return_code, output)
+            return _single_result(results, test_name, return_code, output)
+        if report_format == 'tap':
+            return parse_tap(path, test_name, return_code, output)
+        raise ValueError(f"不支持的报告格式: {report_format}")
+    except (ET.ParseError, ValueError, OSError) as e:
+        logger.warning(f"解析测试报告失败，使用文本输出: {test_name}: {e}")
+        return None
+    finally:
+        try:
+            path.unlink()
+        except OSError:
+            pass
+
+
+def load_test_report(
+    source: Source,
+    test_name: Optional[str] = None,
+    return_code: int = 0
+) -> List[TestResult]:
+    """
+    导入测试报告文件，自动识别 QTest XML / JUnit XML / TAP / QTest 纯文本
+
+    Args:
+        source: 报告文件路径
+        test_name: 测试名称，默认使用报告中的名称或文件名
+        return_code: 测试进程返回码（导入已有报告时通常未知，按 0 处理）
+
+    Returns:
+        测试结果列表（JUnit 报告中每个 testsuite 一项）
+    """
+    path = Path(source)
+    name = test_name or path.stem
+    with open(path, 'rb') as f:
+        head = f.read(512).lstrip()
+
+    if head.startswith(b'<'):
+        root = _xml_root_tag(path)
+        if root == 'TestCase':
+            return [parse_qtest_xml(path, test_name, return_code)]
+        if root in ('testsuites', 'testsuite'):
+            return parse_junit_xml(path, return_code)
+        raise ValueError(f"无法识别的 XML 报告: <{root}>")
+
+    text = path.read_text(encoding='utf-8', errors='replace')
+    if TAP_LINE_PATTERN.match(text.lstrip()) or text.lstrip().upper().startswith('TAP VERSION'):
+        return [parse_tap(path, name, return_code)]
+    return [parse_qtest_output(name, text, return_code)]
+
+
+# ==================== QTest XML ====================
+
+def parse_qtest_xml(
+    source: Source,
+    test_name: Optional[str] = None,
+    return_code: int = 0,
+    output: str = ''
+) -> TestResult:
+    """
+    解析 QTest XML 报告（-o file,xml）
+
+    每个 <TestFunction> 结束时生成该函数的用例: Incident 为用例结果，Message / xfail 附加到同一数据行的用例，
+    BenchmarkResult 按 tag 附加，函数耗时按数据行均分到各用例的 duration_ms
+    """
+    details: List[TestCaseResult] = []
+    suite_name = None
+    total_ms = None
+    stack: List[str] = []
+
+    for event, elem in ET.iterparse(str(source), events=('start', 'end')):
+        if event == 'start':
+            if elem.tag == 'TestCase' and suite_name is None:
+                suite_name = elem.get('name')
+            stack.append(elem.tag)
+            continue
+
+        stack.pop()
+        if elem.tag == 'TestFunction':
+            details.extend(_xml_function_cases(elem))
+            elem.clear()
+        elif elem.tag == 'Duration' and stack == ['TestCase']:
+            total_ms = _float(elem.get('msecs'))
+
+    passed = sum(1 for d in details if d.status == 'PASS')
+    failed = sum(1 for d in details if d.status in FAILED_STATUSES)
+    skipped = sum(1 for d in details if d.status == 'SKIP')
+    if total_ms is None:
+        total_ms = sum(d.duration_ms or 0 for d in details)
+
+    return TestResult(
+        test_name=test_name or suite_name or Path(source).stem,
+        status='passed' if failed == 0 and return_code == 0 else 'failed',
+        total=passed + failed + skipped,
+        passed=passed,
+        failed=failed,
+        skipped=skipped,
+        duration=_format_ms(total_ms),
+        output=output,
+        details=details
+    )
+
+
+def _xml_function_cases(function: ET.Element) -> List[TestCaseResult]:
+    name = function.get('name', '')
+    cases: List[TestCaseResult] = []
+    notes: Dict[Optional[str], List[str]] = {}
+    benchmarks: Dict[Optional[str], List[dict]] = {}
+    duration_ms = None
+
+    for child in function:
+        tag = _text(child.find('DataTag'))
+        if child.tag == 'Incident':
+            kind = child.get('type', '')
+            description = _text(child.find('Description'))
+            if kind not in XML_INCIDENT_STATUS:
+                # xfail 等: 记为附加信息
+                notes.setdefault(tag, []).append(f"{kind.upper()}: {description}" if description else kind.upper())
+                continue
+            status = XML_INCIDENT_STATUS[kind]
+            cases.append(TestCaseResult(
+                name=name,
+                status=status,
+                message=description,
+                data_tag=tag,
+                location=_xml_location(child) if status != 'PASS' else None,
+                messages=notes.pop(tag, None),
+                benchmarks=benchmarks.pop(tag, None)
+            ))
+        elif child.tag == 'Message':
+            kind = child.get('type', '')
+            description = _text(child.find('Description'))
+            if kind == 'skip':
+                # 旧版本 QTest 把 SKIP 记为 Message
+                cases.append(TestCaseResult(
+                    name=name, status='SKIP', message=description, data_tag=tag,
+                    location=_xml_location(child), messages=notes.pop(tag, None)
+                ))
+            else:
+                notes.setdefault(tag, []).append(f"{kind.upper()}: {description}" if description else kind.upper())
+        elif child.tag == 'BenchmarkResult':
+            bench_tag = child.get('tag') or None
+            value = _float(child.get('value')) or 0.0
+            iterations = int(child.get('iterations') or 0)
+            metric = child.get('metric', '')
+            benchmarks.setdefault(bench_tag, []).append({
+                'value': value,
+                'unit': BENCHMARK_UNITS.get(metric, metric),
+                'total': value * iterations,
+                'iterations': iterations,
+                'metric': metric,
+            })
+        elif child.tag == 'Duration':
+            duration_ms = _float(child.get('msecs'))
+
+    if duration_ms is not None and cases:
+        share = duration_ms / len(cases)
+        for case in cases:
+            case.duration_ms = share
+    return cases
+
+
+def _xml_location(elem: ET.Element) -> Optional[str]:
+    file = elem.get('file')
+    if not file:
+        return None
+    return f"{file}({elem.get('line', '0')})"
+
+
+# ==================== JUnit XML ====================
+
+def parse_junit_xml(source: Source, return_code: int = 0, output: str = '') -> List[TestResult]:
+    """
+    解析 JUnit XML 报告（QTest -o file,junitxml 或其他框架生成的 JUnit 报告）
+
+    每个 <testsuite> 生成一个 TestResult；testcase 名称中的数据标签（add(negative)）拆到 data_tag
+    """
+    results = []
+    details: List[TestCaseResult] = []
+
+    for event, elem in ET.iterparse(str(source), events=('end',)):
+        if elem.tag == 'testcase':
+            details.append(_junit_case(elem))
+            elem.clear()
+        elif elem.tag == 'testsuite':
+            passed = sum(1 for d in details if d.status == 'PASS')
+            failed = sum(1 for d in details if d.status in FAILED_STATUSES)
+            skipped = sum(1 for d in details if d.status == 'SKIP')
+            time_ms = _float(elem.get('time'), scale=1000)
+            results.append(TestResult(
+                test_name=elem.get('name') or Path(source).stem,
+                status='passed' if failed == 0 and return_code == 0 else 'failed',
+                total=passed + failed + skipped,
+                passed=passed,
+                failed=failed,
+                skipped=skipped,
+                duration=_format_ms(time_ms if time_ms is not None else sum(d.duration_ms or 0 for d in details)),
+                output=output,
+                details=details
+            ))
+            details = []
+            elem.clear()
+    return results
+
+
+def _junit_case(elem: ET.Element) -> TestCaseResult:
+    name, tag = _split_label(elem.get('name', ''))
+    status, message, location = 'PASS', None, None
+    for child in elem:
+        if child.tag in ('failure', 'error'):
+            status = 'FAIL'
+            text = (child.text or '').strip()
+            message = '\n'.join(m for m in (child.get('message'), text) if m) or None
+            location = _junit_location(child, elem)
+            break
+        if child.tag == 'skipped':
+            status = 'SKIP'
+            message = child.get('message') or (child.text or '').strip() or None
+    return TestCaseResult(
+        name=name,
+        status=status,
+        message=message,
+        data_tag=tag,
+        location=location,
+        duration_ms=_float(elem.get('time'), scale=1000)
+    )
+
+
+def _junit_location(failure: ET.Element, case: ET.Element) -> Optional[str]:
+    file = failure.get('file') or case.get('file')
+    if not file:
+        return None
+    line = failure.get('line') or case.get('line') or '0'
+    return f"{file}({line})"
+
+
+# ==================== TAP ====================
+
+def parse_tap(source: Source, test_name: str, return_code: int = 0, output: str = '') -> TestResult:
+    """
+    解析 TAP 报告（QTest -o file,tap）
+
+    `not ok ... # TODO` 为预期失败（记为通过并附加 XFAIL 信息），`ok ... # TODO` 为意外通过（XPASS），
+    失败之后的 YAML 块（---/...）中的 message / wanted / found / file / line 附加到该用例
+    """
+    details: List[TestCaseResult] = []
+    yaml: Optional[Dict[str, str]] = None
+
+    for line in _read_lines(source):
+        stripped = line.strip()
+        if yaml is not None:
+            if stripped == '...':
+                _apply_tap_yaml(details[-1], yaml)
+                yaml = None
+            elif ':' in stripped:
+                key, _, value = stripped.partition(':')
+                yaml.setdefault(key.strip(), value.strip())
+            continue
+        if stripped == '---' and details:
+            yaml = {}
+            continue
+
+        match = TAP_LINE_PATTERN.match(stripped)
+        if not match:
+            continue
+        not_ok, description, directive, reason = match.groups()
+        name, tag = _split_label(description.split('::')[-1].strip())
+        directive = (directive or '').upper()
+        reason = (reason or '').strip() or None
+        if directive == 'SKIP':
+            status, message, messages = 'SKIP', reason, None
+        elif directive == 'TODO':
+            if not_ok:
+                status, message, messages = 'PASS', None, [f"XFAIL: {reason}" if reason else 'XFAIL']
+            else:
+                status, message, messages = 'XPASS', reason, None
+        else:
+            status, message, messages = ('FAIL' if not_ok else 'PASS'), None, None
+        details.append(TestCaseResult(name=name, status=status, message=message, data_tag=tag, messages=messages))
+
+    if yaml is not None and details:
+        _apply_tap_yaml(details[-1], yaml)
+
+    passed = sum(1 for d in details if d.status == 'PASS')
+    failed = sum(1 for d in details if d.status in FAILED_STATUSES)
+    skipped = sum(1 for d in details if d.status == 'SKIP')
+    return TestResult(
+        test_name=test_name,
+        status='passed' if failed == 0 and return_code == 0 else 'failed',
+        total=passed + failed + skipped,
+        passed=passed,
+        failed=failed,
+        skipped=skipped,
+        duration='0ms',
+        output=output,
+        details=details
+    )
+
+
+def _apply_tap_yaml(case: TestCaseResult, yaml: Dict[str, str]):
+    lines = [yaml['message']] if yaml.get('message') else []
+    if 'found' in yaml:
+        lines.append(f"Actual: {yaml['found']}")
+    if 'wanted' in yaml:
+        lines.append(f"Expected: {yaml['wanted']}")
+    if lines and case.status != 'PASS':
+        case.message = '\n'.join(([case.message] if case.message else []) + lines)
+    if yaml.get('file'):
+        case.location = f"{yaml['file']}({yaml.get('line', '0')})"
+
+
+# ==================== 工具函数 ====================
+
+def _xml_root_tag(path: Path) -> str:
+    for _, elem in ET.iterparse(str(path), events=('start',)):
+        return elem.tag
+    return ''
+
+
+def _read_lines(source: Source) -> Iterator[str]:
+    with open(source, 'r', encoding='utf-8', errors='replace') as f:
+        yield from f
+
+
+def _single_result(results: List[TestResult], test_name: str, return_code: int, output: str) -> Optional[TestResult]:
+    """单个测试程序的 JUnit 报告只有一个 testsuite"""
+    if not results:
+        return None
+    result = results[0]
+    result.test_name = test_name
+    result.output = output
+    if return_code != 0:
+        result.status = 'failed'
+    return result
+
+
+def _split_label(label: str) -> Tuple[str, Optional[str]]:
+    """add(negative) -> ('add', 'negative')，initTestCase() -> ('initTestCase', None)"""
+    match = LABEL_PATTERN.match(label)
+    if not match:
+        return label, None
+    return match.group(1), match.group(2) or None
+
+
+def _text(elem: Optional[ET.Element]) -> Optional[str]:
+    if elem is None or elem.text is None:
+        return None
+    return elem.text.strip() or None
+
+
+def _float(value: Optional[str], scale: float = 1.0) -> Optional[float]:
+    try:
+        return float(value) * scale
+    except (TypeError, ValueError):
+        return None
+
+
+def _format_ms(ms: Optional[float]) -> str:
+    return f"{int(round(ms or 0))}ms"
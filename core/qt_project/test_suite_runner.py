@@ -0,0 +1,473 @@
+"""
+单元测试套件运行器
+并发运行项目的全部单元测试，并可把单个测试程序按测试函数拆分到多个进程
+
+run_unit_test 一次只运行一个测试程序，整套测试的耗时是各程序耗时之和。
+TestSuiteRunner:
+- 最多 jobs 个测试进程同时运行（每个进程由一个工作线程等待）
+- split_functions: 通过 `-functions` 列出测试函数，按函数分片（QTest 接受函数名作为参数），
+  各分片的结果合并回一个 TestResult
+- 用 QTestOutputParser 逐行解析测试输出，用例结果出现时立即回调 on_case，测试程序全部分片结束时回调 on_result
+- 同时输出 XML 报告（见 test_report），进程结束后以报告为准，得到每个用例的耗时
+- durations: 上次运行各测试函数的耗时（TestDatabase.get_case_durations），按耗时从长到短分配到最空闲的分片，
+  并让预计最慢的进程先启动；没有耗时记录时按函数轮流分配
+- 结果由 TestRecorder.record_unit_tests 在一个事务中写入数据库
+
+用法:
+    python -m core.qt_project.test_suite_runner playground/diagramscene_ultima -j 8 --split
+"""
+import argparse
+import os
+import re
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+from core.qt_project.unit_test_runner import (
+    QTestOutputParser, TestCaseResult, TestResult, qt_test_env, read_qtest_output
+)
+from core.qt_project.test_report import (
+    DEFAULT_REPORT_FORMAT, create_report_path, qtest_report_args, read_qtest_report
+)
+from core.qt_project.unit_test_scanner import UnitTestFile, scan_unit_tests, parse_test_cases_from_source
+from core.utils.logger import logger
+from core.utils.process import process_group_kwargs, kill_process_tree
+
+
+# 每个分片都会执行的固定函数，合并时只保留第一个分片的结果
+FIXTURE_FUNCTIONS = ('initTestCase', 'cleanupTestCase')
+
+@dataclass
+class TestShard:
+    """一个测试进程: 测试程序及要运行的测试函数（为空表示全部）"""
+    test: UnitTestFile
+    functions: List[str] = field(default_factory=list)
+    index: int = 0
+    count: int = 1
+    expected_ms: float = 0  # 按历史耗时估计的运行时间（无记录时为 0）
+
+
+@dataclass
+class TestSuiteResult:
+    """测试套件结果"""
+    project_path: str
+    status: str            # 'passed' | 'failed' | 'error'
+    total: int
+    passed: int
+    failed: int
+    skipped: int
+    wall_ms: int           # 整套测试的实际耗时
+    jobs: int              # 并发进程数
+    results: List[TestResult]
+    run_ids: List[int] = field(default_factory=list)
+
+    def to_dict(self):
+        results = [r.to_dict() for r in self.results]
+        for result, run_id in zip(results, self.run_ids):
+            result['run_id'] = run_id
+        return {
+            'project_path': self.project_path,
+            'status': self.status,
+            'total': self.total,
+            'passed': self.passed,
+            'failed': self.failed,
+            'skipped': self.skipped,
+            'wall_ms': self.wall_ms,
+            'duration': f"{self.wall_ms}ms",
+            'jobs': self.jobs,
+            'results': results,
+        }
+
+
+def list_test_functions(test: UnitTestFile, timeout: float = 10) -> List[str]:
+    """
+    列出测试程序的测试函数
+
+    优先运行 `<exe> -functions`，失败时从源文件解析 void testXxx()。
+    返回的名称会作为 QTest 参数传给分片，因此去掉固定函数、数据函数（testXxx_data）和重复项
+    （源文件中声明和定义各出现一次）
+    """
+    try:
+        result = subprocess.run(
+            [test.executable_path, '-functions'],
+            capture_output=True,
+            text=True,
+            encoding='utf-8',
+            errors='replace',
+            timeout=timeout,
+            env=qt_test_env(test.executable_path)
+        )
+        functions = re.findall(r'^(\w+)\(\)\s*$', result.stdout, re.MULTILINE)
+        if result.returncode == 0 and functions:
+            return _runnable_functions(functions)
+    except (OSError, subprocess.SubprocessError) as e:
+        logger.warning(f"列出测试函数失败: {test.name}: {e}")
+    return _runnable_functions(parse_test_cases_from_source(test.file_path))
+
+
+def _runnable_functions(functions: List[str]) -> List[str]:
+    """可以单独运行的测试函数（保持原有顺序）"""
+    runnable, seen = [], set()
+    for function in functions:
+        if function in FIXTURE_FUNCTIONS or function.endswith('_data') or function in seen:
+            continue
+        seen.add(function)
+        runnable.append(function)
+    return runnable
+
+
+def _duration_ms(duration: str) -> int:
+    match = re.match(r'(\d+)\s*ms', duration or '')
+    return int(match.group(1)) if match else 0
+
+
+def merge_shard_results(test_name: str, results: List[TestResult]) -> TestResult:
+    """
+    合并同一测试程序各分片的结果
+
+    initTestCase / cleanupTestCase 在每个分片中都会执行，只保留第一次出现的结果；
+    耗时取最慢的分片（分片并发执行）
+    """
+    if len(results) == 1:
+        return results[0]
+
+    passed = sum(r.passed for r in results)
+    failed = sum(r.failed for r in results)
+    skipped = sum(r.skipped for r in results)
+    details = []
+    fixtures: Dict[str, TestCaseResult] = {}
+    for result in results:
+        for case in result.details:
+            if case.name not in FIXTURE_FUNCTIONS:
+                details.append(case)
+            elif case.name not in fixtures:
+                fixtures[case.name] = case
+            elif case.status == 'PASS':
+                passed -= 1
+            elif case.status == 'FAIL':
+                failed -= 1
+            elif case.status == 'SKIP':
+                skipped -= 1
+    if 'initTestCase' in fixtures:
+        details.insert(0, fixtures['initTestCase'])
+    if 'cleanupTestCase' in fixtures:
+        details.append(fixtures['cleanupTestCase'])
+
+    statuses = {r.status for r in results}
+    if 'error' in statuses:
+        status = 'error'
+    elif 'failed' in statuses:
+        status = 'failed'
+    else:
+        status = 'passed'
+
+    return TestResult(
+        test_name=test_name,
+        status=status,
+        total=passed + failed + skipped,
+        passed=passed,
+        failed=failed,
+        skipped=skipped,
+        duration=f"{max(_duration_ms(r.duration) for r in results)}ms",
+        output="\n".join(
+            f"===== 分片 {i + 1}/{len(results)} =====\n{r.output}" for i, r in enumerate(results)
+        ),
+        details=details
+    )
+
+
+class TestSuiteRunner:
+    """并发运行一组单元测试
+
+    示例:
+        >>> runner = TestSuiteRunner(jobs=8, split_functions=True)
+        >>> suite = runner.run(project_path, on_case=lambda test, case: print(test, case.name, case.status))
+        >>> suite.wall_ms, suite.status
+        (1830, 'passed')
+
+    回调在工作线程中执行，需自行保证线程安全。
+    """
+
+    # 单个测试进程的超时（秒）
+    TIMEOUT = 30
+
+    def __init__(
+        self,
+        jobs: Optional[int] = None,
+        split_functions: bool = False,
+        timeout: float = TIMEOUT,
+        durations: Optional[Dict[str, Dict[str, float]]] = None,
+        report_format: Optional[str] = DEFAULT_REPORT_FORMAT
+    ):
+        """
+        Args:
+            jobs: 同时运行的测试进程数，默认为 CPU 核数
+            split_functions: 是否把测试程序按测试函数拆分到多个进程
+            timeout: 单个测试进程的超时（秒）
+            durations: 历史耗时 {测试名称: {测试函数: 毫秒}}，用于均衡分片和安排启动顺序
+            report_format: 同时输出的报告格式，None 表示只解析纯文本输出
+        """
+        self.jobs = max(1, jobs or os.cpu_count() or 1)
+        self.split_functions = split_functions
+        self.timeout = timeout
+        self.durations = durations or {}
+        self.report_format = report_format
+        self._processes: Dict[int, subprocess.Popen] = {}
+        self._lock = threading.Lock()
+        self._cancelled = threading.Event()
+
+    def run(
+        self,
+        project_path: str,
+        tests: Optional[List[UnitTestFile]] = None,
+        on_case: Optional[Callable[[str, TestCaseResult], None]] = None,
+        on_result: Optional[Callable[[TestResult], None]] = None
+    ) -> TestSuiteResult:
+        """
+        运行测试套件
+
+        Args:
+            project_path: 项目路径
+            tests: 要运行的测试，默认为 scan_unit_tests 找到的全部测试
+            on_case: 用例结果回调 (测试名称, 用例结果)，用例结果行输出时立即调用
+            on_result: 测试程序（全部分片）结束时的回调
+
+        Returns:
+            测试套件结果，results 与 tests 顺序一致
+        """
+        start = time.perf_counter()
+        if tests is None:
+            tests = scan_unit_tests(project_path)
+
+        shards = self._plan(tests)
+        logger.info(f"运行测试套件: {len(tests)} 个测试, {len(shards)} 个进程, 并发 {self.jobs}")
+
+        shard_results: Dict[str, List[Optional[TestResult]]] = {
+            test.name: [None] * sum(1 for s in shards if s.test is test) for test in tests
+        }
+        merged: Dict[str, TestResult] = {}
+        merge_lock = threading.Lock()
+
+        def run_shard(shard: TestShard):
+            result = self._run_shard(shard, on_case)
+            with merge_lock:
+                slots = shard_results[shard.test.name]
+                slots[shard.index] = result
+                if any(r is None for r in slots):
+                    return
+                merged[shard.test.name] = merge_shard_results(shard.test.name, slots)
+            if on_result is not None:
+                on_result(merged[shard.test.name])
+
+        with ThreadPoolExecutor(max_workers=self.jobs, thread_name_prefix="unit-test") as executor:
+            # 预计最慢的进程先提交（没有耗时记录时按分片数从多到少），避免最后只剩它在运行
+            order = sorted(shards, key=lambda s: (-s.expected_ms, -s.count))
+            for future in [executor.submit(run_shard, s) for s in order]:
+                future.result()
+
+        results = [merged[test.name] for test in tests]
+        passed = sum(r.passed for r in results)
+        failed = sum(r.failed for r in results)
+        skipped = sum(r.skipped for r in results)
+        statuses = {r.status for r in results}
+        if 'error' in statuses:
+            status = 'error'
+        elif 'failed' in statuses:
+            status = 'failed'
+        else:
+            status = 'passed'
+
+        wall_ms = int((time.perf_counter() - start) * 1000)
+        logger.info(f"测试套件完成: {status}, {passed} 通过, {failed} 失败, {skipped} 跳过, 耗时 {wall_ms}ms")
+        return TestSuiteResult(
+            project_path=project_path,
+            status=status,
+            total=passed + failed + skipped,
+            passed=passed,
+            failed=failed,
+            skipped=skipped,
+            wall_ms=wall_ms,
+            jobs=self.jobs,
+            results=results
+        )
+
+    def cancel(self):
+        """取消运行: 结束正在运行的测试进程，尚未开始的分片不再启动（在 run 之前调用同样有效）"""
+        self._cancelled.set()
+        with self._lock:
+            processes = list(self._processes.values())
+        for process in processes:
+            kill_process_tree(process)
+
+    def _plan(self, tests: List[UnitTestFile]) -> List[TestShard]:
+        """生成测试进程列表（拆分时每个测试程序最多 jobs 个分片）"""
+        splittable = [t for t in tests if self.split_functions and self.jobs > 1 and t.exists]
+        with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+            listed = dict(zip((t.name for t in splittable), executor.map(list_test_functions, splittable)))
+
+        shards = []
+        for test in tests:
+            known = self.durations.get(test.name, {})
+            functions = listed.get(test.name, [])
+            count = min(len(functions), self.jobs)
+            if count <= 1:
+                shards.append(TestShard(test=test, expected_ms=sum(known.values())))
+                continue
+            if not known:
+                for i in range(count):
+                    shards.append(TestShard(test=test, functions=functions[i::count], index=i, count=count))
+                continue
+
+            # 最长处理时间优先: 按耗时从长到短，每个函数分给当前预计耗时最少的分片；
+            # 没有记录的函数（新增的测试）按已知函数的平均耗时估计
+            measured = [ms for f, ms in known.items() if f not in FIXTURE_FUNCTIONS] or [0.0]
+            default_ms = sum(measured) / len(measured)
+            estimate = {f: known.get(f, default_ms) for f in functions}
+            groups: List[List[str]] = [[] for _ in range(count)]
+            loads = [0.0] * count
+            for function in sorted(functions, key=lambda f: -estimate[f]):
+                i = loads.index(min(loads))
+                groups[i].append(function)
+                loads[i] += estimate[function]
+            for i, group in enumerate(groups):
+                # 分片内保持源文件中的顺序
+                members = set(group)
+                ordered = [f for f in functions if f in members]
+                shards.append(TestShard(test=test, functions=ordered, index=i, count=count, expected_ms=loads[i]))
+        return shards
+
+    def _run_shard(
+        self,
+        shard: TestShard,
+        on_case: Optional[Callable[[str, TestCaseResult], None]]
+    ) -> TestResult:
+        """运行一个测试进程，逐行读取输出"""
+        test = shard.test
+        if self._cancelled.is_set():
+            return self._error_result(test.name, '已取消')
+
+        report_path = create_report_path(test.name, self.report_format) if self.report_format else None
+        command = [test.executable_path]
+        if report_path:
+            command += qtest_report_args(report_path, self.report_format)
+        command += shard.functions
+
+        try:
+            process = subprocess.Popen(
+                command,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True,
+                encoding='utf-8',
+                errors='replace',  # 遇到无法解码的字节用 � 替换
+                env=qt_test_env(test.executable_path),
+                **process_group_kwargs()
+            )
+        except OSError as e:
+            self._remove_report(report_path)
+            return self._error_result(test.name, f'运行失败: {str(e)}')
+
+        with self._lock:
+            self._processes[process.pid] = process
+        if self._cancelled.is_set():
+            kill_process_tree(process)
+
+        def emit(case: TestCaseResult):
+            # initTestCase / cleanupTestCase 只推送第一个分片的结果
+            if shard.index == 0 or case.name not in FIXTURE_FUNCTIONS:
+                on_case(test.name, case)
+
+        parser = QTestOutputParser(test.name, emit if on_case is not None else None)
+        try:
+            timed_out = read_qtest_output(process, parser, self.timeout)
+        finally:
+            with self._lock:
+                self._processes.pop(process.pid, None)
+
+        if timed_out:
+            self._remove_report(report_path)
+            return self._error_result(test.name, f'测试超时（{self.timeout:g}秒）\n{parser.output}', duration='timeout')
+        if self._cancelled.is_set():
+            self._remove_report(report_path)
+            return self._error_result(test.name, f'已取消\n{parser.output}')
+
+        result = parser.close(process.returncode)
+        if report_path:
+            report = read_qtest_report(report_path, self.report_format, test.name, process.returncode, result.output)
+            if report is not None:
+                return report
+        return result
+
+    @staticmethod
+    def _remove_report(report_path: Optional[str]):
+        if not report_path:
+            return
+        try:
+            os.remove(report_path)
+        except OSError:
+            pass
+
+    @staticmethod
+    def _error_result(test_name: str, output: str, duration: str = '0ms') -> TestResult:
+        return TestResult(
+            test_name=test_name,
+            status='error',
+            total=0,
+            passed=0,
+            failed=0,
+            skipped=0,
+            duration=duration,
+            output=output,
+            details=[]
+        )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """命令行运行项目的全部单元测试
+
+    用法: python -m core.qt_project.test_suite_runner PROJECT [-j N] [--split] [--record]
+    """
+    parser = argparse.ArgumentParser(description="并发运行 Qt 项目的单元测试")
+    parser.add_argument('project', help="Qt 项目目录（包含 tests/ 和 build/tests/）")
+    parser.add_argument('-j', '--jobs', type=int, default=None, help="同时运行的测试进程数，默认为 CPU 核数")
+    parser.add_argument('--split', action='store_true', help="按测试函数把测试程序拆分到多个进程")
+    parser.add_argument('--timeout', type=float, default=TestSuiteRunner.TIMEOUT, help="单个测试进程的超时（秒）")
+    parser.add_argument('--record', action='store_true', help="把结果写入测试历史数据库（并按历史耗时均衡分片）")
+    args = parser.parse_args(argv)
+
+    print_lock = threading.Lock()
+
+    def on_case(test_name: str, case: TestCaseResult):
+        with print_lock:
+            suffix = f"  {case.message}" if case.message else ""
+            print(f"{case.status:<5} {test_name}::{case.name}{suffix}", flush=True)
+
+    def on_result(result: TestResult):
+        with print_lock:
+            print(f"==> {result.test_name}: {result.status} "
+                  f"({result.passed} 通过, {result.failed} 失败, {result.skipped} 跳过, {result.duration})", flush=True)
+
+    db = None
+    durations = None
+    if args.record:
+        from core.database import TestDatabase
+        db = TestDatabase()
+        durations = db.get_case_durations(args.project)
+
+    runner = TestSuiteRunner(jobs=args.jobs, split_functions=args.split, timeout=args.timeout, durations=durations)
+    suite = runner.run(args.project, on_case=on_case, on_result=on_result)
+
+    if db is not None:
+        from core.qt_project.test_recorder import TestRecorder
+        suite.run_ids = TestRecorder(db).record_unit_tests(args.project, suite.results)
+
+    print(f"{len(suite.results)} 个测试, {suite.passed} 通过, {suite.failed} 失败, {suite.skipped} 跳过, "
+          f"耗时 {suite.wall_ms}ms（并发 {suite.jobs}）")
+    return 0 if suite.status == 'passed' else 1
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
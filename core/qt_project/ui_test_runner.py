@@ -5,9 +5,10 @@ UI 测试运行器
 import subprocess
 import re
 from pathlib import Path
-from typing import List, Optional
+from typing import Callable, List, Optional
 from dataclasses import dataclass, asdict
 from core.utils.logger import logger
+from core.utils.process import process_group_kwargs, kill_process_tree
 
 
 @dataclass
@@ -50,7 +51,12 @@ class UITestResult:
         }
 
 
-def run_ui_test(executable_path: str, test_name: str, project_dir: str) -> UITestResult:
+def run_ui_test(
+    executable_path: str,
+    test_name: str,
+    project_dir: str,
+    on_start: Optional[Callable[[subprocess.Popen], None]] = None
+) -> UITestResult:
     """
     运行 UI 测试并收集截图
     
@@ -58,6 +64,7 @@ def run_ui_test(executable_path: str, test_name: str, project_dir: str) -> UITes
         executable_path: 测试可执行文件路径
         test_name: 测试名称
         project_dir: 项目目录（用于查找截图）
+        on_start: 测试进程启动后的回调（后台任务用它注册取消时结束进程）
         
     Returns:
         UI 测试结果（含截图路径）
@@ -66,15 +73,24 @@ def run_ui_test(executable_path: str, test_name: str, project_dir: str) -> UITes
     
     try:
         # 运行测试（设置工作目录为项目目录）
-        result = subprocess.run(
+        process = subprocess.Popen(
             [executable_path],
-            capture_output=True,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
             text=True,
-            timeout=60,
-            cwd=project_dir  # 关键：设置工作目录
+            cwd=project_dir,  # 关键：设置工作目录
+            **process_group_kwargs()
         )
+        if on_start is not None:
+            on_start(process)
+        try:
+            stdout, stderr = process.communicate(timeout=60)
+        except subprocess.TimeoutExpired:
+            kill_process_tree(process)
+            process.communicate()
+            raise
         
-        output = result.stdout + result.stderr
+        output = stdout + stderr
         logger.debug(f"测试输出:\n{output}")
         
         # 解析测试结果
@@ -82,7 +98,7 @@ def run_ui_test(executable_path: str, test_name: str, project_dir: str) -> UITes
         duration = _parse_duration(output)
         
         # 确定状态
-        if result.returncode == 0 and failed == 0:
+        if process.returncode == 0 and failed == 0:
             status = 'passed'
         elif failed > 0:
             status = 'failed'
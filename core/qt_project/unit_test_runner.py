@@ -1,19 +1,37 @@
 """
 单元测试运行器
 运行 Qt 单元测试并解析结果
+
+纯文本输出逐行解析用于实时显示；同时让 QTest 输出 XML 报告（见 test_report），
+进程正常结束后以报告为准（含用例耗时），报告缺失或不完整时使用文本解析结果
 """
+import os
+import platform
 import subprocess
 import re
-from typing import Dict, List, Optional
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
 from dataclasses import dataclass, asdict
+from core.utils.process import process_group_kwargs, kill_process_tree
 
 
 @dataclass
 class TestCaseResult:
     """单个测试用例结果"""
-    name: str              # 测试用例名称
-    status: str            # 'PASS' | 'FAIL' | 'SKIP'
-    message: Optional[str] = None  # 失败信息
+    name: str              # 测试用例名称（测试函数名）
+    status: str            # 'PASS' | 'FAIL' | 'SKIP' | 'XPASS' | 'BPASS' | 'BFAIL' | 'BXPASS' | 'BXFAIL'
+    message: Optional[str] = None  # 失败信息（多行失败信息以换行连接）
+    data_tag: Optional[str] = None  # 数据驱动测试的数据标签
+    location: Optional[str] = None  # 失败位置 file(line)
+    messages: Optional[List[str]] = None  # 执行期间的 QWARN / QDEBUG / XFAIL 等输出
+    benchmarks: Optional[List[Dict[str, Any]]] = None  # 基准测试结果 [{value, unit, total, iterations}]
+    duration_ms: Optional[float] = None  # 耗时（毫秒，来自 XML 报告；数据驱动测试为函数耗时按数据行均分）
+    
+    @property
+    def label(self) -> str:
+        """用例标识: 函数名，数据驱动时附带数据标签"""
+        return f"{self.name}({self.data_tag})" if self.data_tag else self.name
     
     def to_dict(self):
         return asdict(self)
@@ -46,74 +64,331 @@ class TestResult:
         }
 
 
-def run_unit_test(executable_path: str, test_name: str) -> TestResult:
+# QTest 纯文本输出的结果行: 类型 : 类名::函数名(数据标签) 信息
+# 例: FAIL!  : TestCalc::add(negative) Compared values are not the same
+#     RESULT : TestCalc::bench():
+QTEST_LINE_PATTERN = re.compile(
+    r'^(PASS|FAIL!|XFAIL|XPASS|SKIP|BPASS|BFAIL|BXPASS|BXFAIL|RESULT|QWARN|QDEBUG|QINFO|QSYSTEM|QFATAL|QCRITICAL|WARNING|INFO)'
+    r'\s*:\s+[\w:]+?::(\w+)\((.*?)\)(?=:|\s|$):?\s*(.*)$'
+)
+# 结果之后的缩进行: 失败位置 / 基准测试数值
+QTEST_LOC_PATTERN = re.compile(r'^\s+Loc:\s+\[(.*)\]\s*$')
+QTEST_BENCHMARK_PATTERN = re.compile(
+    r'^\s+([-+\d.eE]+)\s+(.+?) per iteration \(total:\s*([-+\d.eE,]+),\s*iterations:\s*(\d+)\)'
+)
+# 格式: Totals: 4 passed, 0 failed, 0 skipped, 0 blacklisted, 1ms
+QTEST_TOTALS_PATTERN = re.compile(
+    r'Totals:\s+(\d+)\s+passed,\s+(\d+)\s+failed,\s+(\d+)\s+skipped,\s+(\d+)\s+blacklisted,\s+(\d+\w+)'
+)
+
+# 用例结果行类型 -> 状态
+QTEST_CASE_STATUS = {
+    'PASS': 'PASS', 'FAIL!': 'FAIL', 'SKIP': 'SKIP', 'XPASS': 'XPASS',
+    'BPASS': 'BPASS', 'BFAIL': 'BFAIL', 'BXPASS': 'BXPASS', 'BXFAIL': 'BXFAIL',
+}
+# 计为失败的状态（XPASS: 预期失败却通过）
+FAILED_STATUSES = ('FAIL', 'XPASS')
+
+
+class QTestOutputParser:
+    """QTest 纯文本输出的增量解析器
+
+    按行喂入输出（可以直接迭代子进程管道），用例结果完整时立即回调 on_case。
+    FAIL! / SKIP / XPASS 之后的缩进行（多行比较信息、Loc 位置）附加到该用例，读到 Loc 或下一条结果行时回调；
+    同一函数（数据标签）之前输出的 QWARN / XFAIL / 基准测试结果附加到该用例上。
+
+    示例:
+        >>> parser = QTestOutputParser("test_calc", on_case=lambda case: print(case.label, case.status))
+        >>> for line in process.stdout:
+        ...     parser.feed(line)
+        >>> result = parser.close(process.wait())
+    """
+    
+    def __init__(self, test_name: str, on_case: Optional[Callable[[TestCaseResult], None]] = None):
+        """
+        Args:
+            test_name: 测试名称
+            on_case: 用例结果回调
+        """
+        self.test_name = test_name
+        self.on_case = on_case
+        self.details: List[TestCaseResult] = []
+        self.totals: Optional[tuple] = None
+        self._lines: List[str] = []
+        # 等待缩进行的用例及其附加的信息行
+        self._pending: Optional[TestCaseResult] = None
+        self._pending_lines: List[str] = []
+        # 正在读取数值的基准测试 (函数名, 数据标签)
+        self._benchmark_key: Optional[tuple] = None
+        # 尚未出现结果行的用例的附加信息 (函数名, 数据标签) -> {'messages': [...], 'benchmarks': [...]}
+        self._notes: Dict[tuple, Dict[str, list]] = {}
+    
+    @property
+    def output(self) -> str:
+        """已喂入的完整输出"""
+        return ''.join(self._lines)
+    
+    def feed(self, line: str):
+        """喂入一行输出（可以带换行符）"""
+        self._lines.append(line if line.endswith('\n') else line + '\n')
+        text = line.rstrip('\r\n')
+        if not text.strip():
+            return
+        
+        if text[0].isspace():
+            self._feed_continuation(text)
+            return
+        
+        self._flush()
+        self._benchmark_key = None
+        
+        match = QTEST_LINE_PATTERN.match(text)
+        if match:
+            kind, function, tag, rest = match.groups()
+            key = (function, tag or None)
+            rest = rest.strip()
+            if kind in QTEST_CASE_STATUS:
+                self._start_case(kind, key, rest)
+            elif kind == 'RESULT':
+                self._benchmark_key = key
+            else:
+                self._note(key, 'messages').append(f"{kind}: {rest}" if rest else kind)
+            return
+        
+        totals = QTEST_TOTALS_PATTERN.search(text)
+        if totals:
+            self.totals = totals.groups()
+    
+    def close(self, return_code: int, output: Optional[str] = None) -> TestResult:
+        """
+        输出结束，汇总测试结果
+        
+        Args:
+            return_code: 测试进程返回码
+            output: 完整输出，默认为已喂入的内容
+        """
+        self._flush()
+        if output is None:
+            output = self.output
+        details = self.details
+        
+        if self.totals:
+            passed, failed, skipped = (int(v) for v in self.totals[:3])
+            duration = self.totals[4]
+            total = passed + failed + skipped
+            status = 'passed' if failed == 0 and return_code == 0 else 'failed'
+        else:
+            # 无法解析，使用返回码判断
+            passed = len([d for d in details if d.status == 'PASS'])
+            failed = len([d for d in details if d.status in FAILED_STATUSES])
+            skipped = len([d for d in details if d.status == 'SKIP'])
+            total = passed + failed + skipped
+            duration = '0ms'
+            status = 'passed' if return_code == 0 else 'failed'
+        
+        return TestResult(
+            test_name=self.test_name,
+            status=status,
+            total=total,
+            passed=passed,
+            failed=failed,
+            skipped=skipped,
+            duration=duration,
+            output=output,
+            details=details
+        )
+    
+    def _note(self, key: tuple, field_name: str) -> list:
+        return self._notes.setdefault(key, {}).setdefault(field_name, [])
+    
+    def _start_case(self, kind: str, key: tuple, rest: str):
+        notes = self._notes.pop(key, {})
+        case = TestCaseResult(
+            name=key[0],
+            status=QTEST_CASE_STATUS[kind],
+            message=rest or None,
+            data_tag=key[1],
+            messages=notes.get('messages'),
+            benchmarks=notes.get('benchmarks')
+        )
+        if kind in ('PASS', 'BPASS'):
+            # 通过的用例没有后续缩进行，立即回调
+            self._emit(case)
+        else:
+            self._pending = case
+    
+    def _feed_continuation(self, text: str):
+        if self._pending is not None:
+            loc = QTEST_LOC_PATTERN.match(text)
+            if loc:
+                # Loc 是失败信息的最后一行
+                self._pending.location = loc.group(1)
+                self._flush()
+            else:
+                self._pending_lines.append(text.strip())
+            return
+        if self._benchmark_key is not None:
+            bench = QTEST_BENCHMARK_PATTERN.match(text)
+            if bench:
+                value, unit, total, iterations = bench.groups()
+                self._note(self._benchmark_key, 'benchmarks').append({
+                    'value': float(value),
+                    'unit': unit,
+                    'total': float(total.replace(',', '')),
+                    'iterations': int(iterations),
+                })
+    
+    def _flush(self):
+        case = self._pending
+        if case is None:
+            return
+        if self._pending_lines:
+            case.message = '\n'.join(([case.message] if case.message else []) + self._pending_lines)
+        self._pending = None
+        self._pending_lines = []
+        self._emit(case)
+    
+    def _emit(self, case: TestCaseResult):
+        self.details.append(case)
+        if self.on_case is not None:
+            self.on_case(case)
+
+
+def read_qtest_output(process: subprocess.Popen, parser: QTestOutputParser, timeout: float) -> bool:
     """
-    运行单元测试
+    逐行读取测试进程的输出交给解析器，超时时结束进程树
+    
+    Args:
+        process: 以 stdout=PIPE、text=True 启动的测试进程
+        parser: 输出解析器
+        timeout: 超时（秒）
+        
+    Returns:
+        是否超时
+    """
+    timed_out = threading.Event()
+    
+    def on_timeout():
+        timed_out.set()
+        kill_process_tree(process)
+    
+    timer = threading.Timer(timeout, on_timeout)
+    timer.daemon = True
+    timer.start()
+    try:
+        for line in process.stdout:
+            parser.feed(line)
+        process.wait()
+    finally:
+        timer.cancel()
+        process.stdout.close()
+    return timed_out.is_set()
+
+
+def qt_test_env(executable_path: str) -> Dict[str, str]:
+    """
+    运行测试进程的环境变量（Windows 上把 Qt bin 目录加入 PATH）
+    
+    Args:
+        executable_path: 测试可执行文件路径
+    """
+    env = os.environ.copy()
+    
+    # 尝试查找 Qt bin 目录
+    # 在 Windows 上，Qt DLL 通常在项目附近或 Qt 安装目录
+    possible_qt_paths = []
+    
+    if platform.system() == "Windows":
+        # 查找常见的 Qt 路径
+        for drive in ['C:', 'D:']:
+            possible_qt_paths.extend([
+                f"{drive}\\Qt\\6.10.1\\mingw_64\\bin",
+                f"{drive}\\qtcreator\\6.10.1\\mingw_64\\bin",
+            ])
+        
+        # 添加到 PATH
+        for qt_path in possible_qt_paths:
+            if Path(qt_path).exists():
+                env['PATH'] = f"{qt_path};{env['PATH']}"
+                break
+    
+    return env
+
+
+def run_unit_test(
+    executable_path: str,
+    test_name: str,
+    on_start: Optional[Callable[[subprocess.Popen], None]] = None,
+    on_case: Optional[Callable[[TestCaseResult], None]] = None,
+    timeout: float = 30,
+    args: Optional[List[str]] = None,
+    report_format: Optional[str] = 'xml'
+) -> TestResult:
+    """
+    运行单元测试（边运行边解析输出）
     
     Args:
         executable_path: 测试可执行文件路径
         test_name: 测试名称
+        on_start: 测试进程启动后的回调（后台任务用它注册取消时结束进程）
+        on_case: 用例结果回调，用例结果输出时立即调用
+        timeout: 超时（秒）
+        args: 额外的 QTest 参数（如要运行的测试函数名）
+        report_format: 同时输出的报告格式（xml / junitxml / tap），None 表示只解析纯文本输出
         
     Returns:
         测试结果
     """
+    # 避免循环导入: test_report 依赖本模块的数据结构
+    from core.qt_project.test_report import create_report_path, qtest_report_args, read_qtest_report
+    
+    report_path = None
     try:
-        import os
-        import platform
-        from pathlib import Path
-        
-        # 设置环境变量，添加 Qt bin 目录到 PATH
-        env = os.environ.copy()
-        
-        # 从可执行文件路径推断 Qt 安装位置
-        exe_path = Path(executable_path)
-        
-        # 尝试查找 Qt bin 目录
-        # 在 Windows 上，Qt DLL 通常在项目附近或 Qt 安装目录
-        possible_qt_paths = []
-        
-        if platform.system() == "Windows":
-            # 查找常见的 Qt 路径
-            for drive in ['C:', 'D:']:
-                possible_qt_paths.extend([
-                    f"{drive}\\Qt\\6.10.1\\mingw_64\\bin",
-                    f"{drive}\\qtcreator\\6.10.1\\mingw_64\\bin",
-                ])
-            
-            # 添加到 PATH
-            for qt_path in possible_qt_paths:
-                if Path(qt_path).exists():
-                    env['PATH'] = f"{qt_path};{env['PATH']}"
-                    break
-        
-        # 运行测试
-        result = subprocess.run(
-            [executable_path],
-            capture_output=True,
+        env = qt_test_env(executable_path)
+        
+        command = [executable_path]
+        if report_format:
+            report_path = create_report_path(test_name, report_format)
+            command += qtest_report_args(report_path, report_format)
+        command += args or []
+        
+        # 运行测试（stderr 合并到 stdout，按输出顺序解析）
+        process = subprocess.Popen(
+            command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
             text=True,
             encoding='utf-8',
             errors='replace',  # 遇到无法解码的字节用 � 替换
-            timeout=30,
-            env=env
+            env=env,
+            **process_group_kwargs()
         )
+        if on_start is not None:
+            on_start(process)
         
-        output = result.stdout + result.stderr
+        parser = QTestOutputParser(test_name, on_case)
+        if read_qtest_output(process, parser, timeout):
+            return TestResult(
+                test_name=test_name,
+                status='error',
+                total=0,
+                passed=0,
+                failed=0,
+                skipped=0,
+                duration='timeout',
+                output=f'测试超时（{timeout:g}秒）\n{parser.output}',
+                details=parser.close(process.returncode).details
+            )
         
-        # 解析输出
-        return parse_qtest_output(test_name, output, result.returncode)
+        # 汇总结果
+        result = parser.close(process.returncode)
+        if report_path:
+            report = read_qtest_report(report_path, report_format, test_name, process.returncode, result.output)
+            report_path = None
+            if report is not None:
+                return report
+        return result
         
-    except subprocess.TimeoutExpired:
-        return TestResult(
-            test_name=test_name,
-            status='error',
-            total=0,
-            passed=0,
-            failed=0,
-            skipped=0,
-            duration='timeout',
-            output='测试超时（30秒）',
-            details=[]
-        )
     except Exception as e:
         return TestResult(
             test_name=test_name,
@@ -126,11 +401,17 @@ def run_unit_test(executable_path: str, test_name: str) -> TestResult:
             output=f'运行失败: {str(e)}',
             details=[]
         )
+    finally:
+        if report_path:
+            try:
+                os.remove(report_path)
+            except OSError:
+                pass
 
 
 def parse_qtest_output(test_name: str, output: str, return_code: int) -> TestResult:
     """
-    解析 QTest 输出
+    解析完整的 QTest 输出
     
     Args:
         test_name: 测试名称
@@ -140,63 +421,7 @@ def parse_qtest_output(test_name: str, output: str, return_code: int) -> TestRes
     Returns:
         测试结果
     """
-    details = []
-    
-    # 解析每个测试用例
-    # 格式: PASS   : TestClass::testMethod()
-    # 格式: FAIL!  : TestClass::testMethod() ...
-    pass_pattern = r'PASS\s+:\s+\w+::(\w+)\(\)'
-    fail_pattern = r'FAIL!\s+:\s+\w+::(\w+)\(\)'
-    
-    for match in re.finditer(pass_pattern, output):
-        details.append(TestCaseResult(
-            name=match.group(1),
-            status='PASS'
-        ))
-    
-    for match in re.finditer(fail_pattern, output):
-        # 尝试提取失败信息
-        case_name = match.group(1)
-        # 查找下一行的错误信息
-        lines = output[match.end():].split('\n')
-        message = lines[0].strip() if lines else None
-        
-        details.append(TestCaseResult(
-            name=case_name,
-            status='FAIL',
-            message=message
-        ))
-    
-    # 解析总结行
-    # 格式: Totals: 4 passed, 0 failed, 0 skipped, 0 blacklisted, 1ms
-    totals_pattern = r'Totals:\s+(\d+)\s+passed,\s+(\d+)\s+failed,\s+(\d+)\s+skipped,\s+\d+\s+blacklisted,\s+(\d+\w+)'
-    totals_match = re.search(totals_pattern, output)
-    
-    if totals_match:
-        passed = int(totals_match.group(1))
-        failed = int(totals_match.group(2))
-        skipped = int(totals_match.group(3))
-        duration = totals_match.group(4)
-        total = passed + failed + skipped
-        
-        status = 'passed' if failed == 0 and return_code == 0 else 'failed'
-    else:
-        # 无法解析，使用返回码判断
-        passed = len([d for d in details if d.status == 'PASS'])
-        failed = len([d for d in details if d.status == 'FAIL'])
-        skipped = 0
-        total = passed + failed
-        duration = '0ms'
-        status = 'passed' if return_code == 0 else 'failed'
-    
-    return TestResult(
-        test_name=test_name,
-        status=status,
-        total=total,
-        passed=passed,
-        failed=failed,
-        skipped=skipped,
-        duration=duration,
-        output=output,
-        details=details
-    )
+    parser = QTestOutputParser(test_name)
+    for line in output.splitlines():
+        parser.feed(line)
+    return parser.close(return_code, output=output)
@@ -3,6 +3,7 @@
 提供视觉测试等高级功能
 """
 from .visual_agent import VisualAgent
+from .live_view import LiveViewServer
 
-__all__ = ['VisualAgent']
+__all__ = ['VisualAgent', 'LiveViewServer']
 
@@ -0,0 +1,483 @@
+"""
+实时画面推流 - 本地 HTTP 服务推送屏幕画面
+
+get_screen_frame 每次调用都截全屏、PNG 编码、base64 后经 pywebview 的 JS 桥返回，
+前端轮询它做实时监控时只能达到几 FPS，并占满一个 CPU 核心。
+
+LiveViewServer 在 127.0.0.1 上提供 HTTP 推流:
+- GET /stream.mjpg?width=W    MJPEG 流（multipart/x-mixed-replace），可直接作为 <img> 的 src
+- GET /frame.jpg?width=W      最新一帧 JPEG
+- GET /tiles?since=S&width=W  自 S 以来变化的图块（长轮询，JSON），供 canvas 增量绘制
+
+推流内容是完整的屏幕画面，而本机上任何网页都能向 127.0.0.1 发请求:
+- 每次 start 生成随机令牌，所有请求必须带 ?token=...（start_live_view 返回的地址已包含），否则返回 403
+- 默认不发送 CORS 头，其他网页的脚本无法读取响应（<img> 显示 MJPEG 不需要 CORS）；
+  需要跨源 fetch /tiles 时通过 allow_origin 只放行应用自身的源
+
+所有观看者共享一个生产者线程:
+- 按目标 FPS 截图，缩小到观看者中最大的请求宽度（不放大）
+- 将缩小后的画面按 TILE_SIZE 分块，与上一帧逐块比较（最大绝对差），
+  只有变化的图块会重新 JPEG 编码；画面没有变化时不产生新帧，MJPEG 也不会重复推送
+- 有 MJPEG 观看者时才编码整帧
+- 没有观看者超过 IDLE_TIMEOUT 秒后生产者线程退出，下一个观看者连接时重新启动
+"""
+import base64
+import hmac
+import json
+import secrets
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+from core.utils.logger import logger
+
+try:
+    import cv2
+    import numpy as np
+    CV_AVAILABLE = True
+except ImportError:
+    CV_AVAILABLE = False
+
+try:
+    from core.vision import Rect, get_capture_backend
+    VISION_MODULE_AVAILABLE = True
+except ImportError:
+    VISION_MODULE_AVAILABLE = False
+
+
+class LiveViewServer:
+    """屏幕画面推流服务
+
+    示例:
+        >>> server = LiveViewServer(fps=15)
+        >>> server.start()
+        >>> server.endpoint("/stream.mjpg") + "&width=960"
+        'http://127.0.0.1:52731/stream.mjpg?token=...&width=960'
+        >>> server.stop()
+    """
+
+    # 图块边长（缩小后的像素）
+    TILE_SIZE = 64
+    # 图块内最大绝对差超过该值时视为变化 (0-255)
+    TILE_TOLERANCE = 8
+    # 未指定宽度时的输出宽度
+    DEFAULT_WIDTH = 1280
+    # 没有观看者超过该秒数后生产者线程退出
+    IDLE_TIMEOUT = 5.0
+    # 长轮询最长等待秒数
+    POLL_TIMEOUT = 2.0
+    # MJPEG 分段边界
+    BOUNDARY = "liveviewframe"
+
+    def __init__(
+        self,
+        fps: float = 10.0,
+        quality: int = 70,
+        region: Optional[Tuple[int, int, int, int]] = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        allow_origin: Optional[str] = None
+    ):
+        """
+        Args:
+            fps: 目标帧率
+            quality: JPEG 质量 (1-100)
+            region: 截图区域 (x, y, width, height)，None 表示全屏
+            host: 监听地址（默认只接受本机连接）
+            port: 监听端口，0 表示由系统分配
+            allow_origin: 允许跨源读取的源（如 http://127.0.0.1:8080），None 表示不发送 CORS 头
+        """
+        self.fps = fps
+        self.quality = quality
+        self.region = region
+        self.host = host
+        self.port = port
+        self.allow_origin = allow_origin
+        # 访问令牌（每次 start 重新生成）
+        self.token = ""
+
+        self._httpd: Optional[ThreadingHTTPServer] = None
+        self._server_thread: Optional[threading.Thread] = None
+        self._producer: Optional[threading.Thread] = None
+        self._cond = threading.Condition()
+        self._closed = False
+
+        # 观看者: key -> (请求宽度, 最近活动时刻)
+        self._viewers: Dict[Any, Tuple[int, float]] = {}
+        self._mjpeg_viewers = 0
+
+        # 最新画面状态（受 _cond 保护）
+        self._seq = 0
+        self._size: Tuple[int, int] = (0, 0)
+        self._prev: Optional[np.ndarray] = None
+        self._tiles: Dict[Tuple[int, int], Tuple[int, bytes]] = {}
+        self._full_jpeg: Optional[bytes] = None
+        self._full_seq = 0
+
+        self.frames = 0
+        self.encoded_tiles = 0
+
+    # ==================== 生命周期 ====================
+
+    @property
+    def running(self) -> bool:
+        return self._httpd is not None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def endpoint(self, path: str) -> str:
+        """带访问令牌的地址，其他查询参数以 & 追加"""
+        return f"{self.url}{path}?token={self.token}"
+
+    def check_token(self, token: Optional[str]) -> bool:
+        return bool(token) and hmac.compare_digest(token, self.token)
+
+    def start(self):
+        """启动 HTTP 服务（生产者线程在第一个观看者连接时启动）"""
+        if self._httpd is not None:
+            return
+        if not (CV_AVAILABLE and VISION_MODULE_AVAILABLE):
+            raise RuntimeError("视觉库未安装")
+
+        server = self
+
+        class Handler(_LiveViewHandler):
+            live_view = server
+
+        self._closed = False
+        self.token = secrets.token_urlsafe(24)
+        self._httpd = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._httpd.daemon_threads = True
+        self.port = self._httpd.server_address[1]
+        self._server_thread = threading.Thread(
+            target=self._httpd.serve_forever,
+            name="LiveViewServer",
+            daemon=True
+        )
+        self._server_thread.start()
+        logger.info(f"实时画面推流已启动: {self.url}")
+
+    def stop(self):
+        """停止 HTTP 服务和生产者线程"""
+        httpd, self._httpd = self._httpd, None
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if httpd is not None:
+            httpd.shutdown()
+            httpd.server_close()
+        producer = self._producer
+        if producer is not None:
+            producer.join(timeout=2)
+        logger.info("实时画面推流已停止")
+
+    def configure(self, fps: Optional[float] = None, quality: Optional[int] = None,
+                  region: Optional[Tuple[int, int, int, int]] = None):
+        """运行中调整帧率 / 质量 / 截图区域（区域变化时所有图块重新推送）"""
+        with self._cond:
+            if fps:
+                self.fps = fps
+            if quality:
+                self.quality = quality
+            if region != self.region:
+                self.region = region
+                self._reset_frame()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "running": self.running,
+                "url": self.url if self.running else None,
+                "fps": self.fps,
+                "viewers": len(self._viewers),
+                "mjpeg_viewers": self._mjpeg_viewers,
+                "seq": self._seq,
+                "size": list(self._size),
+                "frames": self.frames,
+                "encoded_tiles": self.encoded_tiles,
+            }
+
+    # ==================== 观看者 ====================
+
+    def _touch(self, key: Any, width: int):
+        """登记观看者的活动，并在需要时启动生产者线程（调用方需持有 _cond）"""
+        self._viewers[key] = (width, time.monotonic())
+        if self._producer is None or not self._producer.is_alive():
+            self._producer = threading.Thread(target=self._produce, name="LiveViewProducer", daemon=True)
+            self._producer.start()
+
+    def _target_width(self) -> int:
+        """活跃观看者中最大的请求宽度，并清理超时的观看者（调用方需持有 _cond）"""
+        now = time.monotonic()
+        for key, (_, seen) in list(self._viewers.items()):
+            if now - seen > self.IDLE_TIMEOUT:
+                del self._viewers[key]
+        return max((w for w, _ in self._viewers.values()), default=0)
+
+    def _reset_frame(self):
+        """丢弃上一帧，下一帧全部图块视为变化（调用方需持有 _cond）"""
+        self._prev = None
+        self._tiles = {}
+        self._full_jpeg = None
+
+    # ==================== 生产者 ====================
+
+    def _produce(self):
+        backend = get_capture_backend()
+        next_tick = time.perf_counter()
+        while True:
+            with self._cond:
+                width = self._target_width()
+                if self._closed or width == 0:
+                    self._producer = None
+                    return
+                region = Rect.from_tuple(self.region) if self.region else None
+                encode_full = self._mjpeg_viewers > 0
+
+            try:
+                image = backend.grab(region)
+                self._publish(image, width, encode_full)
+            except Exception as e:
+                logger.error(f"实时画面截图失败: {e}")
+
+            next_tick += 1.0 / max(self.fps, 0.1)
+            delay = next_tick - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                # 跟不上目标帧率时不追帧
+                next_tick = time.perf_counter()
+
+    def _publish(self, image: np.ndarray, width: int, encode_full: bool):
+        """缩小画面、比较图块并编码变化的部分"""
+        h, w = image.shape[:2]
+        if width < w:
+            size = (width, max(1, round(h * width / w)))
+            image = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+        h, w = image.shape[:2]
+        params = [cv2.IMWRITE_JPEG_QUALITY, int(self.quality)]
+        tile = self.TILE_SIZE
+
+        with self._cond:
+            prev = self._prev if self._size == (w, h) else None
+            # 新的 MJPEG 观看者加入时，即使画面没有变化也需要一份整帧
+            need_full = encode_full and (self._full_jpeg is None or self._full_seq != self._seq)
+        changed = self._changed_tiles(prev, image)
+        if not changed:
+            if need_full:
+                ok, buf = cv2.imencode(".jpg", prev, [cv2.IMWRITE_JPEG_QUALITY, int(self.quality)])
+                with self._cond:
+                    if ok and self._prev is prev:
+                        self._full_jpeg = buf.tobytes()
+                        self._full_seq = self._seq
+                        self._cond.notify_all()
+            return
+
+        encoded = []
+        for ty, tx in changed:
+            y, x = ty * tile, tx * tile
+            ok, buf = cv2.imencode(".jpg", image[y:y + tile, x:x + tile], params)
+            if ok:
+                encoded.append(((tx, ty), buf.tobytes()))
+        full = None
+        if encode_full:
+            ok, buf = cv2.imencode(".jpg", image, params)
+            full = buf.tobytes() if ok else None
+
+        with self._cond:
+            if self._size != (w, h):
+                self._tiles = {}
+            self._seq += 1
+            self._size = (w, h)
+            self._prev = image
+            for key, data in encoded:
+                self._tiles[key] = (self._seq, data)
+            self._full_jpeg = full
+            self._full_seq = self._seq if full is not None else 0
+            self.frames += 1
+            self.encoded_tiles += len(encoded)
+            self._cond.notify_all()
+
+    def _changed_tiles(self, prev: Optional[np.ndarray], image: np.ndarray) -> List[Tuple[int, int]]:
+        """与上一帧比较，返回变化图块的 (行, 列)"""
+        h, w = image.shape[:2]
+        tile = self.TILE_SIZE
+        rows, cols = -(-h // tile), -(-w // tile)
+        if prev is None:
+            return [(ty, tx) for ty in range(rows) for tx in range(cols)]
+
+        diff = cv2.absdiff(image, prev)
+        if diff.ndim == 3:
+            diff = diff.max(axis=2)
+        # 补齐到图块整数倍后按块取最大值
+        padded = np.zeros((rows * tile, cols * tile), dtype=np.uint8)
+        padded[:h, :w] = diff
+        block_max = padded.reshape(rows, tile, cols, tile).max(axis=(1, 3))
+        ys, xs = np.nonzero(block_max > self.TILE_TOLERANCE)
+        return list(zip(ys.tolist(), xs.tolist()))
+
+    # ==================== 取帧（HTTP 处理线程调用） ====================
+
+    def wait_frame(self, key: Any, width: int, since: int, timeout: float) -> int:
+        """等待比 since 更新的画面，返回最新序号（超时返回当前序号）"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self._touch(key, width)
+            while self._seq <= since and not self._closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            return self._seq
+
+    def full_jpeg(self, key: Any, width: int, since: int, timeout: float) -> Tuple[int, Optional[bytes]]:
+        """等待比 since 更新的整帧 JPEG（MJPEG 观看者）"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self._touch(key, width)
+            while (self._full_seq <= since or self._full_jpeg is None) and not self._closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return self._full_seq, None
+                self._cond.wait(remaining)
+            return self._full_seq, self._full_jpeg
+
+    def tiles_since(self, since: int) -> Dict[str, Any]:
+        """自 since 以来变化的图块（since 为 0 或画面尺寸变化后返回全部图块）"""
+        with self._cond:
+            tile = self.TILE_SIZE
+            return {
+                "seq": self._seq,
+                "width": self._size[0],
+                "height": self._size[1],
+                "tile": tile,
+                "tiles": [
+                    {
+                        "x": tx * tile,
+                        "y": ty * tile,
+                        "data": base64.b64encode(data).decode("ascii"),
+                    }
+                    for (tx, ty), (version, data) in self._tiles.items()
+                    if version > since
+                ],
+            }
+
+
+class _LiveViewHandler(BaseHTTPRequestHandler):
+    """推流 HTTP 请求处理"""
+
+    live_view: LiveViewServer = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        # 推流请求很频繁，不写访问日志
+        pass
+
+    def _query(self) -> Tuple[str, Dict[str, str]]:
+        parsed = urlparse(self.path)
+        return parsed.path, {k: v[-1] for k, v in parse_qs(parsed.query).items()}
+
+    def _width(self, query: Dict[str, str]) -> int:
+        try:
+            width = int(query.get("width", LiveViewServer.DEFAULT_WIDTH))
+        except ValueError:
+            width = LiveViewServer.DEFAULT_WIDTH
+        return max(16, width)
+
+    def _send(self, status: int, content_type: str, body: bytes):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self._send_cors()
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_cors(self):
+        origin = self.live_view.allow_origin
+        if origin and self.headers.get("Origin") == origin:
+            self.send_header("Access-Control-Allow-Origin", origin)
+            self.send_header("Vary", "Origin")
+
+    def do_GET(self):
+        path, query = self._query()
+        try:
+            if not self.live_view.check_token(query.get("token")):
+                self._send(403, "text/plain", b"forbidden")
+            elif path == "/stream.mjpg":
+                self._stream(query)
+            elif path == "/frame.jpg":
+                self._frame(query)
+            elif path == "/tiles":
+                self._tiles(query)
+            elif path == "/stats":
+                self._send(200, "application/json", json.dumps(self.live_view.stats()).encode("utf-8"))
+            else:
+                self._send(404, "text/plain", b"not found")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def _frame(self, query: Dict[str, str]):
+        view = self.live_view
+        key = ("frame", self.client_address)
+        with view._cond:
+            view._mjpeg_viewers += 1
+        try:
+            _, data = view.full_jpeg(key, self._width(query), 0, LiveViewServer.POLL_TIMEOUT)
+        finally:
+            with view._cond:
+                view._mjpeg_viewers -= 1
+        if data is None:
+            self._send(503, "text/plain", b"no frame")
+        else:
+            self._send(200, "image/jpeg", data)
+
+    def _tiles(self, query: Dict[str, str]):
+        view = self.live_view
+        try:
+            since = int(query.get("since", 0))
+        except ValueError:
+            since = 0
+        key = ("tiles", query.get("client", self.client_address[0]))
+        view.wait_frame(key, self._width(query), since, LiveViewServer.POLL_TIMEOUT)
+        body = json.dumps(view.tiles_since(since)).encode("utf-8")
+        self._send(200, "application/json", body)
+
+    def _stream(self, query: Dict[str, str]):
+        view = self.live_view
+        width = self._width(query)
+        key = ("mjpeg", self.client_address)
+        boundary = LiveViewServer.BOUNDARY.encode("ascii")
+
+        self.send_response(200)
+        self.send_header("Content-Type", f"multipart/x-mixed-replace; boundary={LiveViewServer.BOUNDARY}")
+        self.send_header("Cache-Control", "no-store")
+        self.send_header("Connection", "close")
+        self._send_cors()
+        self.end_headers()
+        self.close_connection = True
+
+        with view._cond:
+            view._mjpeg_viewers += 1
+        try:
+            seq = 0
+            while view.running:
+                # 画面没有变化时不推送，只刷新观看者的活动时间
+                seq_next, data = view.full_jpeg(key, width, seq, LiveViewServer.POLL_TIMEOUT)
+                if data is None:
+                    continue
+                seq = seq_next
+                self.wfile.write(
+                    b"--" + boundary + b"\r\n"
+                    b"Content-Type: image/jpeg\r\n"
+                    b"Content-Length: " + str(len(data)).encode("ascii") + b"\r\n\r\n"
+                    + data + b"\r\n"
+                )
+                self.wfile.flush()
+        finally:
+            with view._cond:
+                view._mjpeg_viewers -= 1
+                view._viewers.pop(key, None)
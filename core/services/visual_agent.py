@@ -11,9 +11,10 @@ import base64
 import time
 import subprocess
 import os
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
 from pathlib import Path
-from typing import Dict, Any, Optional, Tuple, List
+from typing import Callable, Dict, Any, Optional, Tuple, List
 from core.utils.logger import logger
 from dotenv import load_dotenv
 
@@ -32,7 +33,12 @@ try:
         TemplateMatcher, TemplateMatcherParam,
         ColorMatcher, ColorMatcherParam,
         Pipeline, PipelineNode,
-        Rect, RecoResult
+        compile_pipeline,
+        Rect, RecoResult,
+        RecoResultCache,
+        LocationHistory,
+        Frame,
+        get_capture_backend
     )
     VISION_MODULE_AVAILABLE = True
 except ImportError:
@@ -74,6 +80,14 @@ class VisualAgent:
         
         self.target_process = None
         self.ai_client = None
+        # 画面未变化时复用识别结果（wait_for_template 轮询使用）
+        self._reco_cache = RecoResultCache() if VISION_MODULE_AVAILABLE else None
+        # Pipeline 节点命中位置历史（与测试历史保存在同一个数据库中，首次使用时创建）
+        self._location_history = None
+        # 批量识别线程池（首次使用时创建）
+        self._batch_executor = None
+        # 实时画面推流服务（start_live_view 时创建）
+        self._live_view = None
         
         # 自动从 .env 读取 API Key（如果未提供）
         if not api_key and AI_LIB_AVAILABLE:
@@ -207,10 +221,75 @@ class VisualAgent:
 
     # ==================== 实时视觉监控 ====================
 
+    def start_live_view(
+        self,
+        fps: float = 10.0,
+        quality: int = 70,
+        region: Tuple[int, int, int, int] = None
+    ) -> Dict[str, Any]:
+        """
+        启动实时画面推流（本地 HTTP 服务，见 live_view.py）
+        
+        已启动时只更新帧率 / 质量 / 区域。前端将 stream_url 作为 <img> 的 src 即可，
+        实时监控不再经过 JS 桥传输 base64 图片。
+        
+        Args:
+            fps: 目标帧率
+            quality: JPEG 质量 (1-100)
+            region: (x, y, width, height) 截图区域，None 表示全屏
+            
+        Returns:
+            推流地址: stream_url (MJPEG) / frame_url (单帧 JPEG) / tiles_url (变化图块)，
+            均已包含本次会话的访问令牌（?token=...），其他参数以 & 追加
+        """
+        if not VISUAL_LIBS_AVAILABLE or not VISION_MODULE_AVAILABLE:
+            return {"success": False, "error": "视觉模块未安装"}
+        
+        try:
+            from .live_view import LiveViewServer
+            region = tuple(region) if region else None
+            if self._live_view is None:
+                self._live_view = LiveViewServer(fps=fps, quality=quality, region=region)
+            else:
+                self._live_view.configure(fps=fps, quality=quality, region=region)
+            self._live_view.start()
+            
+            view = self._live_view
+            return {
+                "success": True,
+                "url": view.url,
+                "stream_url": view.endpoint("/stream.mjpg"),
+                "frame_url": view.endpoint("/frame.jpg"),
+                "tiles_url": view.endpoint("/tiles"),
+                "fps": view.fps,
+            }
+        except Exception as e:
+            logger.error(f"启动实时画面推流失败: {e}")
+            return {"success": False, "error": str(e)}
+
+    def stop_live_view(self) -> Dict[str, Any]:
+        """停止实时画面推流"""
+        if self._live_view is None or not self._live_view.running:
+            return {"success": True, "message": "推流未启动"}
+        try:
+            self._live_view.stop()
+            return {"success": True}
+        except Exception as e:
+            logger.error(f"停止实时画面推流失败: {e}")
+            return {"success": False, "error": str(e)}
+
+    def get_live_view_status(self) -> Dict[str, Any]:
+        """实时画面推流状态（观看者数量、已推送帧数和图块数）"""
+        if self._live_view is None:
+            return {"success": True, "running": False}
+        return {"success": True, **self._live_view.stats()}
+
     def get_screen_frame(self, region: Tuple[int, int, int, int] = None) -> Dict[str, Any]:
         """
         获取屏幕截图帧（Base64编码）
         
+        用于单帧截图；实时监控请使用 start_live_view
+        
         Args:
             region: (x, y, width, height) 截图区域
             
@@ -427,18 +506,18 @@ class VisualAgent:
     # ==================== MAA 风格视觉识别 ====================
 
     def _capture_screen_cv(self, region: Tuple[int, int, int, int] = None) -> np.ndarray:
-        """截取屏幕并转换为 OpenCV 格式 (BGR)"""
-        if region:
-            screenshot = pyautogui.screenshot(region=region)
-        else:
-            screenshot = pyautogui.screenshot()
-        return cv2.cvtColor(np.array(screenshot), cv2.COLOR_RGB2BGR)
+        """截取屏幕并转换为 OpenCV 格式 (BGR)
+
+        使用共享的截图后端（优先 mss，未安装时回退到 pyautogui）
+        """
+        return get_capture_backend().grab(Rect.from_tuple(region) if region else None)
 
     def find_template(
         self,
         template_path: str,
         threshold: float = 0.7,
-        roi: List[int] = None
+        roi: List[int] = None,
+        use_cache: bool = False
     ) -> Dict[str, Any]:
         """
         模板匹配 - 在屏幕上查找模板图片
@@ -447,6 +526,7 @@ class VisualAgent:
             template_path: 模板图片路径
             threshold: 匹配阈值 (0-1)
             roi: 搜索区域 [x, y, width, height]
+            use_cache: ROI 画面与上次相同时直接复用上次的识别结果
             
         Returns:
             匹配结果，包含位置和分数
@@ -457,29 +537,29 @@ class VisualAgent:
         logger.info(f"模板匹配: {template_path}, 阈值: {threshold}")
         
         try:
-            # 截取屏幕
-            image = self._capture_screen_cv()
-            
             # 构建 ROI
             roi_rect = Rect.from_list(roi) if roi else None
             
+            # 截取屏幕（指定 ROI 时只截取 ROI 区域）
+            image = get_capture_backend().grab_rois([roi_rect] if roi_rect else None)
+            
             # 执行模板匹配
-            param = TemplateMatcherParam(
-                templates=[template_path],
-                thresholds=[threshold]
-            )
-            matcher = TemplateMatcher(image, param, roi_rect)
-            result = matcher.analyze()
+            param = self._template_param(template_path, threshold)
+            def analyze() -> RecoResult:
+                return TemplateMatcher(image, param, roi_rect).analyze()
+            
+            cached = False
+            if use_cache:
+                # 模板文件被替换后 mtime 变化，不再复用旧模板的识别结果
+                key = (
+                    "find_template", (template_path, os.stat(template_path).st_mtime_ns),
+                    threshold, tuple(roi) if roi else None
+                )
+                result, cached = self._reco_cache.get_or_compute(key, image, roi_rect, analyze)
+            else:
+                result = analyze()
             
-            return {
-                "success": result.success,
-                "algorithm": "TemplateMatch",
-                "cost_ms": result.cost_ms,
-                "box": result.box.to_dict() if result.box else None,
-                "score": result.score,
-                "all_count": len(result.all_results),
-                "filtered_count": len(result.filtered_results)
-            }
+            return self._template_result(result, cached)
             
         except Exception as e:
             logger.error(f"模板匹配失败: {e}")
@@ -518,35 +598,162 @@ class VisualAgent:
             # 构建 ROI
             roi_rect = Rect.from_list(roi) if roi else None
             
-            # 颜色空间转换方法
-            method_map = {
-                "HSV": cv2.COLOR_BGR2HSV,
-                "RGB": cv2.COLOR_BGR2RGB,
-                "BGR": 0,  # 不转换
-            }
-            method = method_map.get(color_space.upper(), cv2.COLOR_BGR2HSV)
-            
             # 执行颜色匹配
-            param = ColorMatcherParam(
-                ranges=[(lower, upper)],
-                method=method,
-                count=min_count
-            )
+            param = self._color_param(lower, upper, color_space, min_count)
             matcher = ColorMatcher(image, param, roi_rect)
             result = matcher.analyze()
             
+            return self._color_result(result)
+            
+        except Exception as e:
+            logger.error(f"颜色匹配失败: {e}")
+            return {"success": False, "error": str(e)}
+
+    @staticmethod
+    def _template_param(template_path: str, threshold: float) -> 'TemplateMatcherParam':
+        """find_template / recognize_batch 使用的模板匹配参数"""
+        return TemplateMatcherParam(
+            templates=[template_path],
+            thresholds=[threshold],
+            adaptive_scale=True
+        )
+
+    @staticmethod
+    def _color_param(lower: List[int], upper: List[int], color_space: str, min_count: int) -> 'ColorMatcherParam':
+        """find_color / recognize_batch 使用的颜色匹配参数"""
+        # 颜色空间转换方法
+        method_map = {
+            "HSV": cv2.COLOR_BGR2HSV,
+            "RGB": cv2.COLOR_BGR2RGB,
+            "BGR": 0,  # 不转换
+        }
+        return ColorMatcherParam(
+            ranges=[(lower, upper)],
+            method=method_map.get(color_space.upper(), cv2.COLOR_BGR2HSV),
+            count=min_count
+        )
+
+    @staticmethod
+    def _template_result(result: 'RecoResult', cached: bool = False) -> Dict[str, Any]:
+        return {
+            "success": result.success,
+            "algorithm": "TemplateMatch",
+            "cost_ms": result.cost_ms,
+            "box": result.box.to_dict() if result.box else None,
+            "score": result.score,
+            "all_count": len(result.all_results),
+            "filtered_count": len(result.filtered_results),
+            "cached": cached
+        }
+
+    @staticmethod
+    def _color_result(result: 'RecoResult') -> Dict[str, Any]:
+        return {
+            "success": result.success,
+            "algorithm": "ColorMatch",
+            "cost_ms": result.cost_ms,
+            "box": result.box.to_dict() if result.box else None,
+            "pixel_count": int(result.score) if result.score else 0,
+            "all_count": len(result.all_results),
+            "filtered_count": len(result.filtered_results)
+        }
+
+    def _get_batch_executor(self) -> ThreadPoolExecutor:
+        """批量识别的线程池（识别器在 OpenCV 中释放 GIL，各规格可并行）"""
+        if self._batch_executor is None:
+            self._batch_executor = ThreadPoolExecutor(
+                max_workers=min(8, os.cpu_count() or 4),
+                thread_name_prefix="recognize-batch"
+            )
+        return self._batch_executor
+
+    def recognize_batch(self, specs: List[Dict[str, Any]], parallel: bool = True) -> Dict[str, Any]:
+        """
+        批量识别 - 截图一次，在同一帧上执行多个识别
+        
+        UI 状态检查往往要同时探测多个控件，逐个调用 find_template / find_color
+        每次都要截图并经过一次 JS 桥调用；这里只截图一次（全部规格都指定 ROI 时只截取 ROI 的并集），
+        各识别共享同一个 Frame（颜色空间转换等预处理只做一次），并在线程池中并行执行。
+        
+        Args:
+            specs: 识别规格列表，每项为:
+                {"type": "template", "template": 路径, "threshold": 0.7, "roi": [x, y, w, h], "id": 可选}
+                {"type": "color", "lower": [...], "upper": [...], "roi": [...],
+                 "color_space": "HSV", "min_count": 100, "id": 可选}
+            parallel: 是否并行执行
+            
+        Returns:
+            {"success", "capture_ms", "cost_ms", "found", "results": [...]}，
+            results 与 specs 一一对应，每项格式与 find_template / find_color 相同并附带 index 和 id
+        """
+        if not VISUAL_LIBS_AVAILABLE or not VISION_MODULE_AVAILABLE:
+            return {"success": False, "error": "视觉模块未安装"}
+        
+        logger.info(f"批量识别: {len(specs)} 项")
+        start = time.perf_counter()
+        
+        try:
+            # 先解析全部规格，参数错误只影响对应的项
+            jobs: List[Optional[Tuple[str, Any, Optional[Rect]]]] = []
+            results: List[Optional[Dict[str, Any]]] = []
+            for spec in specs:
+                try:
+                    kind = spec.get("type", "template")
+                    roi_rect = Rect.from_list(spec["roi"]) if spec.get("roi") else None
+                    if kind == "template":
+                        param = self._template_param(spec["template"], spec.get("threshold", 0.7))
+                    elif kind == "color":
+                        param = self._color_param(
+                            spec["lower"], spec["upper"],
+                            spec.get("color_space", "HSV"), spec.get("min_count", 100)
+                        )
+                    else:
+                        raise ValueError(f"未知的识别类型: {kind}")
+                    jobs.append((kind, param, roi_rect))
+                    results.append(None)
+                except Exception as e:
+                    jobs.append(None)
+                    results.append({"success": False, "error": f"规格错误: {e}"})
+            
+            # 截图一次
+            capture_start = time.perf_counter()
+            rois = [job[2] for job in jobs if job is not None]
+            if not all(rois):
+                rois = None
+            frame = Frame(get_capture_backend().grab_rois(rois), timestamp=capture_start)
+            capture_ms = (time.perf_counter() - capture_start) * 1000
+            
+            def run(job: Tuple[str, Any, Optional[Rect]]) -> Dict[str, Any]:
+                kind, param, roi_rect = job
+                try:
+                    if kind == "template":
+                        return self._template_result(TemplateMatcher(frame, param, roi_rect).analyze())
+                    return self._color_result(ColorMatcher(frame, param, roi_rect).analyze())
+                except Exception as e:
+                    return {"success": False, "error": str(e)}
+            
+            pending = [(i, job) for i, job in enumerate(jobs) if job is not None]
+            if parallel and len(pending) > 1:
+                outputs = self._get_batch_executor().map(run, [job for _, job in pending])
+            else:
+                outputs = (run(job) for _, job in pending)
+            for (i, _), output in zip(pending, outputs):
+                results[i] = output
+            
+            for i, (spec, result) in enumerate(zip(specs, results)):
+                result["index"] = i
+                result["id"] = spec.get("id") if isinstance(spec, dict) else None
+            
             return {
-                "success": result.success,
-                "algorithm": "ColorMatch",
-                "cost_ms": result.cost_ms,
-                "box": result.box.to_dict() if result.box else None,
-                "pixel_count": int(result.score) if result.score else 0,
-                "all_count": len(result.all_results),
-                "filtered_count": len(result.filtered_results)
+                "success": True,
+                "capture_ms": capture_ms,
+                "cost_ms": (time.perf_counter() - start) * 1000,
+                "found": sum(1 for r in results if r.get("success")),
+                "results": results
             }
             
         except Exception as e:
-            logger.error(f"颜色匹配失败: {e}")
+            logger.error(f"批量识别失败: {e}")
             return {"success": False, "error": str(e)}
 
     def click_template(
@@ -608,11 +815,22 @@ class VisualAgent:
             logger.error(f"找图点击失败: {e}")
             return {"success": False, "error": str(e)}
 
+    def _get_location_history(self) -> 'LocationHistory':
+        """节点命中位置历史（存储在测试历史数据库中）"""
+        if self._location_history is None:
+            from core.database import TestDatabase
+            self._location_history = LocationHistory(TestDatabase())
+        return self._location_history
+
     def run_pipeline(
         self,
         config: Dict[str, Any],
         entry: str,
-        resource_dir: str = None
+        resource_dir: str = None,
+        save_debug_images: bool = True,
+        pipeline_name: str = None,
+        adaptive_roi: bool = False,
+        on_start: Callable[[Any], None] = None
     ) -> Dict[str, Any]:
         """
         运行视觉测试流水线
@@ -621,6 +839,10 @@ class VisualAgent:
             config: Pipeline 配置 (JSON 格式的字典)
             entry: 入口节点名
             resource_dir: 资源目录（模板图片等）
+            save_debug_images: 是否保存每个节点的调试截图到 log 目录
+            pipeline_name: Pipeline 名称，提供时记录各节点的命中位置
+            adaptive_roi: 未配置 roi 的节点先在历史命中位置附近识别，未命中再扩大到全屏
+            on_start: Pipeline 开始运行前的回调（后台任务用它注册取消时调用 pipeline.stop）
             
         Returns:
             执行结果
@@ -644,15 +866,19 @@ class VisualAgent:
         try:
             # 创建 Pipeline
             pipeline = Pipeline(
-                screen_capture_func=self._capture_screen_cv,
-                resource_dir=resource_dir
+                resource_dir=resource_dir,
+                capture_backend=get_capture_backend(),
+                location_history=self._get_location_history() if pipeline_name else None,
+                adaptive_roi=adaptive_roi
             )
             
             # 加载配置
-            pipeline.load_from_dict(config)
+            pipeline.load_from_dict(config, name=pipeline_name)
+            if on_start is not None:
+                on_start(pipeline)
             
             # 运行
-            result = pipeline.run(entry)
+            result = pipeline.run(entry, save_debug_images=save_debug_images)
             
             return result.to_dict()
             
@@ -664,15 +890,21 @@ class VisualAgent:
         self,
         json_path: str,
         entry: str,
-        resource_dir: str = None
+        resource_dir: str = None,
+        save_debug_images: bool = True,
+        adaptive_roi: bool = False,
+        on_start: Callable[[Any], None] = None
     ) -> Dict[str, Any]:
         """
-        从 JSON 文件运行 Pipeline
+        从 JSON 文件运行 Pipeline（按文件路径记录各节点的命中位置）
         
         Args:
             json_path: Pipeline 配置文件路径
             entry: 入口节点名
             resource_dir: 资源目录
+            save_debug_images: 是否保存每个节点的调试截图到 log 目录
+            adaptive_roi: 未配置 roi 的节点先在历史命中位置附近识别，未命中再扩大到全屏
+            on_start: Pipeline 开始运行前的回调
         """
         if not VISUAL_LIBS_AVAILABLE or not VISION_MODULE_AVAILABLE:
             return {"success": False, "error": "视觉模块未安装"}
@@ -684,7 +916,12 @@ class VisualAgent:
             with open(json_path, 'r', encoding='utf-8') as f:
                 config = json.load(f)
             
-            return self.run_pipeline(config, entry, resource_dir)
+            return self.run_pipeline(
+                config, entry, resource_dir, save_debug_images,
+                pipeline_name=str(Path(json_path).resolve()),
+                adaptive_roi=adaptive_roi,
+                on_start=on_start
+            )
             
         except FileNotFoundError:
             return {"success": False, "error": f"配置文件不存在: {json_path}"}
@@ -694,6 +931,70 @@ class VisualAgent:
             logger.error(f"Pipeline 执行失败: {e}")
             return {"success": False, "error": str(e)}
 
+    def get_roi_suggestions(self, json_path: str, min_hits: int = None) -> Dict[str, Any]:
+        """
+        根据历史命中位置生成 Pipeline 各节点的建议 ROI
+        
+        Args:
+            json_path: Pipeline 配置文件路径
+            min_hits: 命中次数少于该值的节点不给出建议，默认 LocationHistory.REPORT_MIN_HITS
+            
+        Returns:
+            {"success", "pipeline", "nodes": [{node, hits, frame, bounds, last, suggested_roi, area_ratio, current_roi}]}
+        """
+        if not VISION_MODULE_AVAILABLE:
+            return {"success": False, "error": "视觉模块未安装"}
+        
+        try:
+            import json
+            with open(json_path, 'r', encoding='utf-8') as f:
+                config = json.load(f)
+            
+            pipeline = Pipeline(location_history=self._get_location_history())
+            pipeline.load_from_dict(config, name=str(Path(json_path).resolve()))
+            if min_hits is None:
+                min_hits = LocationHistory.REPORT_MIN_HITS
+            return {
+                "success": True,
+                "pipeline": json_path,
+                "nodes": pipeline.location_report(min_hits),
+            }
+        except FileNotFoundError:
+            return {"success": False, "error": f"配置文件不存在: {json_path}"}
+        except Exception as e:
+            logger.error(f"生成 ROI 建议失败: {e}")
+            return {"success": False, "error": str(e)}
+
+    def validate_pipeline(
+        self,
+        config: Dict,
+        entry: str = None,
+        resource_dir: str = None
+    ) -> Dict[str, Any]:
+        """
+        校验 Pipeline 配置（不运行）
+        
+        检查模板文件、识别参数、next 引用和不可达节点
+        
+        Args:
+            config: Pipeline 配置
+            entry: 入口节点名，不提供则以未被引用的节点为入口
+            resource_dir: 资源目录
+        """
+        if not VISUAL_LIBS_AVAILABLE or not VISION_MODULE_AVAILABLE:
+            return {"success": False, "error": "视觉模块未安装"}
+        
+        try:
+            compiled = compile_pipeline(
+                config,
+                resource_dir,
+                entries=[entry] if entry else None
+            )
+            return {"success": compiled.ok, **compiled.to_dict()}
+        except Exception as e:
+            logger.error(f"Pipeline 校验失败: {e}")
+            return {"success": False, "error": str(e)}
+
     def wait_for_template(
         self,
         template_path: str,
@@ -705,6 +1006,9 @@ class VisualAgent:
         """
         等待模板出现
         
+        每次轮询前先比较 ROI 画面，画面未变化时复用上次的识别结果，
+        静态界面上的等待只需要一次截图和一次缩略图比较。
+        
         Args:
             template_path: 模板图片路径
             threshold: 匹配阈值
@@ -724,7 +1028,7 @@ class VisualAgent:
         elapsed = 0
         
         while elapsed < timeout:
-            result = self.find_template(template_path, threshold, roi)
+            result = self.find_template(template_path, threshold, roi, use_cache=True)
             
             if result.get("success"):
                 logger.info(f"模板已出现，耗时: {elapsed}ms")
@@ -754,6 +1058,8 @@ class VisualAgent:
                 "color_match",         # 颜色匹配
                 "click_template",      # 找图点击
                 "wait_for_template",   # 等待模板
+                "live_view",           # 实时画面推流
+                "recognize_batch",     # 批量识别（一次截图）
                 "pipeline",            # 任务流水线
             ] if VISION_MODULE_AVAILABLE else [],
             "description": "MAA 风格视觉识别系统"
@@ -1,3 +1,4 @@
 from .logger import logger, setup_logger
+from .process import process_group_kwargs, kill_process_tree
 
-__all__ = ["logger", "setup_logger"]
+__all__ = ["logger", "setup_logger", "process_group_kwargs", "kill_process_tree"]
@@ -0,0 +1,36 @@
+"""
+子进程工具
+
+测试程序和 cppcheck 可能再启动子进程（脚本包装、QProcess、cppcheck -j），
+只结束直接子进程时，孙进程仍持有输出管道，communicate() 会一直等到它们退出。
+这里让子进程在独立的进程组中启动，结束时整组结束。
+"""
+import os
+import platform
+import signal
+import subprocess
+from typing import Any, Dict
+
+
+def process_group_kwargs() -> Dict[str, Any]:
+    """Popen 参数: 在独立的进程组中启动子进程"""
+    if platform.system() == "Windows":
+        return {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+    return {"start_new_session": True}
+
+
+def kill_process_tree(process: subprocess.Popen):
+    """结束进程及其启动的全部子进程（进程需以 process_group_kwargs() 启动）"""
+    try:
+        if platform.system() == "Windows":
+            subprocess.run(
+                ["taskkill", "/F", "/T", "/PID", str(process.pid)],
+                capture_output=True
+            )
+        else:
+            os.killpg(process.pid, signal.SIGKILL)
+    except (OSError, subprocess.SubprocessError):
+        pass
+    # 进程组已不存在或 taskkill 失败时至少结束直接子进程
+    if process.poll() is None:
+        process.kill()
@@ -25,10 +25,37 @@ from .types import (
     OrderBy,
 )
 from .base import VisionBase
-from .template_matcher import TemplateMatcher, TemplateMatcherParam
-from .feature_matcher import FeatureMatcher, FeatureMatcherParam, FeatureDetector
+from .frame import Frame
+from .template_matcher import TemplateMatcher, TemplateMatcherParam, ColorMode
+from .template_cache import TemplateCache, TemplateEntry, get_template_cache
+from .scale_prior import ScalePriorStore, get_scale_prior_store
+from .feature_matcher import (
+    FeatureMatcher,
+    FeatureMatcherParam,
+    FeatureDetector,
+    build_feature_index,
+)
+from .feature_index import FeatureIndex
+from .feature_cache import FeatureCache, TemplateFeatures, get_feature_cache
 from .color_matcher import ColorMatcher, ColorMatcherParam
-from .pipeline import Pipeline, PipelineNode
+from .color_classifier import ColorClassifier, ColorSpaceCache
+from .capture import (
+    CaptureBackend,
+    MssCapture,
+    PyAutoGuiCapture,
+    create_capture_backend,
+    get_capture_backend,
+)
+from .frame_diff import RecoResultCache
+from .roi_history import LocationHistory, NodeLocationStats
+from .pipeline import (
+    Pipeline,
+    PipelineNode,
+    CompiledNode,
+    CompiledPipeline,
+    PipelineCompileError,
+    compile_pipeline,
+)
 
 __all__ = [
     # Types
@@ -41,16 +68,45 @@ __all__ = [
     'OrderBy',
     # Base
     'VisionBase',
+    'Frame',
     # Matchers
     'TemplateMatcher',
     'TemplateMatcherParam',
+    'ColorMode',
+    'TemplateCache',
+    'TemplateEntry',
+    'get_template_cache',
+    'ScalePriorStore',
+    'get_scale_prior_store',
     'FeatureMatcher',
     'FeatureMatcherParam',
     'FeatureDetector',
+    'FeatureCache',
+    'TemplateFeatures',
+    'get_feature_cache',
+    'FeatureIndex',
+    'build_feature_index',
     'ColorMatcher', 
     'ColorMatcherParam',
+    'ColorClassifier',
+    'ColorSpaceCache',
+    # Capture
+    'CaptureBackend',
+    'MssCapture',
+    'PyAutoGuiCapture',
+    'create_capture_backend',
+    'get_capture_backend',
+    # Frame diff
+    'RecoResultCache',
+    # ROI history
+    'LocationHistory',
+    'NodeLocationStats',
     # Pipeline
     'Pipeline',
     'PipelineNode',
+    'CompiledNode',
+    'CompiledPipeline',
+    'PipelineCompileError',
+    'compile_pipeline',
 ]
 
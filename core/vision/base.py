@@ -4,7 +4,7 @@
 
 import time
 from abc import ABC, abstractmethod
-from typing import Optional, List, Tuple
+from typing import Optional, List, Tuple, Union
 from dataclasses import dataclass
 import numpy as np
 
@@ -15,34 +15,36 @@ except ImportError:
     CV_AVAILABLE = False
 
 from .types import Rect, RecoResult, MatchResult, OrderBy
+from .frame import Frame
 
 
 class VisionBase(ABC):
     """视觉识别基类
     
     所有识别器继承此类，提供:
-    - 统一的图像和ROI处理
+    - 统一的图像和ROI处理（画面以 Frame 共享预处理结果）
     - 结果排序和筛选
     - 调试绘图支持
     """
     
     def __init__(
         self, 
-        image: np.ndarray,
+        image: Union[np.ndarray, Frame],
         roi: Optional[Rect] = None,
         name: str = ""
     ):
         """
         Args:
-            image: 输入图像 (BGR格式)
+            image: 输入图像 (BGR格式)，或同一帧上多个识别器共享的 Frame
             roi: 识别区域，None表示全图
             name: 识别器名称（用于调试）
         """
         if not CV_AVAILABLE:
             raise ImportError("OpenCV (cv2) is required for vision module")
         
-        self._image = image
-        self._roi = roi or Rect(0, 0, image.shape[1], image.shape[0])
+        self._frame = Frame.wrap(image)
+        self._image = self._frame.image
+        self._roi = roi or Rect(0, 0, self._image.shape[1], self._image.shape[0])
         self._name = name
         self._debug_draw = False
         self._draw_image: Optional[np.ndarray] = None
@@ -52,6 +54,11 @@ class VisionBase(ABC):
         """原始图像"""
         return self._image
     
+    @property
+    def frame(self) -> Frame:
+        """画面帧（灰度、HSV、金字塔层等派生数据的缓存）"""
+        return self._frame
+    
     @property
     def roi(self) -> Rect:
         """识别区域"""
@@ -173,28 +180,75 @@ class VisionBase(ABC):
         if not results:
             return []
         
-        # 按分数过滤
-        results = [r for r in results if r.score >= score_threshold]
-        if not results:
-            return []
+        boxes = np.array([r.box.to_tuple() for r in results], dtype=np.float64)
+        scores = np.array([r.score for r in results], dtype=np.float64)
+        keep = VisionBase.nms_indices(boxes, scores, iou_threshold, score_threshold)
+        return [results[i] for i in keep]
+    
+    @staticmethod
+    def nms_indices(
+        boxes: np.ndarray,
+        scores: np.ndarray,
+        iou_threshold: float = 0.5,
+        score_threshold: float = 0.0
+    ) -> np.ndarray:
+        """向量化的非极大值抑制
         
-        # 按分数降序排序
-        results = sorted(results, key=lambda r: r.score, reverse=True)
+        与 nms 语义一致，但直接处理数组，避免逐个构造 MatchResult
+        
+        Args:
+            boxes: (N, 4) 数组，每行 [x, y, width, height]
+            scores: (N,) 分数数组
+            iou_threshold: IoU阈值，超过此值认为重叠
+            score_threshold: 分数阈值，低于此值的结果被过滤
+            
+        Returns:
+            保留框的索引（按分数降序）
+        """
+        scores = np.asarray(scores, dtype=np.float64)
+        if scores.size == 0:
+            return np.empty(0, dtype=np.intp)
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        
+        # 按分数过滤，再按分数降序排序（稳定排序，同分保持原顺序）
+        valid = np.flatnonzero(scores >= score_threshold)
+        order = valid[np.argsort(-scores[valid], kind='stable')]
+        
+        x1 = boxes[:, 0]
+        y1 = boxes[:, 1]
+        x2 = x1 + boxes[:, 2]
+        y2 = y1 + boxes[:, 3]
+        areas = boxes[:, 2] * boxes[:, 3]
         
         keep = []
-        while results:
-            best = results.pop(0)
+        while order.size > 0:
+            best = order[0]
             keep.append(best)
+            rest = order[1:]
             
             # 计算剩余框与最佳框的IoU
-            remaining = []
-            for r in results:
-                iou = VisionBase._compute_iou(best.box, r.box)
-                if iou < iou_threshold:
-                    remaining.append(r)
-            results = remaining
+            inter_w = np.minimum(x2[best], x2[rest]) - np.maximum(x1[best], x1[rest])
+            inter_h = np.minimum(y2[best], y2[rest]) - np.maximum(y1[best], y1[rest])
+            intersection = np.where((inter_w > 0) & (inter_h > 0), inter_w * inter_h, 0.0)
+            union = areas[best] + areas[rest] - intersection
+            iou = np.divide(
+                intersection, union,
+                out=np.zeros_like(intersection), where=union > 0
+            )
+            order = rest[iou < iou_threshold]
         
-        return keep
+        return np.array(keep, dtype=np.intp)
+    
+    @staticmethod
+    def to_match_results(boxes: np.ndarray, scores: np.ndarray) -> List[MatchResult]:
+        """将 (N, 4) 框数组和分数数组转换为 MatchResult 列表"""
+        return [
+            MatchResult(
+                box=Rect(x=int(b[0]), y=int(b[1]), width=int(b[2]), height=int(b[3])),
+                score=float(score)
+            )
+            for b, score in zip(boxes, scores)
+        ]
     
     @staticmethod
     def _compute_iou(box1: Rect, box2: Rect) -> float:
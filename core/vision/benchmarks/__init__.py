@@ -0,0 +1 @@
+# 视觉模块性能基准脚本
@@ -0,0 +1,282 @@
+"""
+屏幕截图后端 - 可插拔的截图接口
+
+Pipeline 和 VisualAgent 的每次识别都要先截图，截图往往是一个 tick 里最慢的一步。
+pyautogui 经过 PIL Image → RGB ndarray → BGR 多次拷贝，而且总是截全屏。
+
+本模块提供统一的截图接口:
+- MssCapture: 基于 mss（Windows GDI / X11 / macOS CoreGraphics），直接得到 BGRA 内存
+- PyAutoGuiCapture: 兼容后端，未安装 mss 时使用
+
+所有后端都返回 BGR 格式的 numpy 数组，并支持:
+- 只截取指定区域 (grab)
+- 只截取若干 ROI 的并集，返回全屏坐标系的画面 (grab_rois)
+"""
+
+import math
+import threading
+from abc import ABC, abstractmethod
+from typing import Optional, Sequence, Tuple
+import numpy as np
+
+try:
+    import cv2
+    CV_AVAILABLE = True
+except ImportError:
+    CV_AVAILABLE = False
+
+try:
+    import pyautogui
+    PYAUTOGUI_AVAILABLE = True
+except ImportError:
+    PYAUTOGUI_AVAILABLE = False
+
+try:
+    import mss
+    MSS_AVAILABLE = True
+except ImportError:
+    MSS_AVAILABLE = False
+
+from .types import Rect
+
+
+def union_rect(rects: Sequence[Rect]) -> Optional[Rect]:
+    """计算多个矩形的外接矩形（并集的包围盒）"""
+    rects = [r for r in rects if r]
+    if not rects:
+        return None
+    x1 = min(r.x for r in rects)
+    y1 = min(r.y for r in rects)
+    x2 = max(r.x + r.width for r in rects)
+    y2 = max(r.y + r.height for r in rects)
+    return Rect(x1, y1, x2 - x1, y2 - y1)
+
+
+def clip_rect(rect: Rect, width: int, height: int) -> Rect:
+    """将矩形裁剪到 [0, width) x [0, height) 范围内"""
+    x1 = min(max(rect.x, 0), width)
+    y1 = min(max(rect.y, 0), height)
+    x2 = min(max(rect.x + rect.width, 0), width)
+    y2 = min(max(rect.y + rect.height, 0), height)
+    return Rect(x1, y1, x2 - x1, y2 - y1)
+
+
+class CaptureBackend(ABC):
+    """截图后端基类
+
+    子类实现 screen_size 和 grab 即可。
+    """
+
+    # 后端名称（用于日志和配置）
+    name: str = ""
+
+    # ROI 并集占全屏的比例超过该值时直接截全屏
+    FULL_GRAB_RATIO = 0.8
+
+    @abstractmethod
+    def screen_size(self) -> Tuple[int, int]:
+        """主屏幕尺寸 (width, height)"""
+
+    @abstractmethod
+    def grab(self, region: Optional[Rect] = None, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """截取屏幕区域
+
+        Args:
+            region: 截图区域（屏幕坐标），None 表示全屏
+            out: 可选的目标数组 (h, w, 3) uint8，提供时直接写入并返回 out
+
+        Returns:
+            BGR 格式的 numpy 数组
+        """
+
+    def grab_rois(self, rois: Optional[Sequence[Rect]] = None) -> np.ndarray:
+        """只截取 ROI 并集所在的区域
+
+        返回的画面仍是全屏尺寸，坐标与全屏截图一致，
+        识别器可以直接使用原有的 ROI；并集以外的区域为黑色。
+
+        Args:
+            rois: 本次需要识别的 ROI 列表，None 或空列表表示截全屏
+        """
+        if not rois:
+            return self.grab()
+
+        width, height = self.screen_size()
+        region = union_rect(rois)
+        region = clip_rect(region, width, height) if region else None
+        if not region or region.area() >= width * height * self.FULL_GRAB_RATIO:
+            return self.grab()
+
+        # np.zeros 由 calloc 分配，未写入的页不会真正占用内存，
+        # 实际只有并集区域被截图数据写入
+        frame = np.zeros((height, width, 3), dtype=np.uint8)
+        try:
+            self.grab(
+                region,
+                out=frame[region.y:region.y + region.height, region.x:region.x + region.width]
+            )
+        except ValueError:
+            # 区域截图与 screen_size 的坐标系不一致（如 HiDPI 缩放），退回全屏截图
+            return self.grab()
+        return frame
+
+    def close(self):
+        """释放后端资源"""
+
+
+class PyAutoGuiCapture(CaptureBackend):
+    """基于 pyautogui 的截图后端（兼容实现）"""
+
+    name = "pyautogui"
+
+    def __init__(self):
+        if not (PYAUTOGUI_AVAILABLE and CV_AVAILABLE):
+            raise ImportError("OpenCV and pyautogui required")
+
+    def screen_size(self) -> Tuple[int, int]:
+        size = pyautogui.size()
+        return int(size[0]), int(size[1])
+
+    def grab(self, region: Optional[Rect] = None, out: Optional[np.ndarray] = None) -> np.ndarray:
+        if region:
+            screenshot = pyautogui.screenshot(region=region.to_tuple())
+        else:
+            screenshot = pyautogui.screenshot()
+        rgb = np.asarray(screenshot)
+        if out is None:
+            return cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR)
+        np.copyto(out, rgb[:, :, 2::-1])
+        return out
+
+
+class MssCapture(CaptureBackend):
+    """基于 mss 的截图后端
+
+    mss 直接调用系统截图接口，返回 BGRA 内存，
+    这里零拷贝地包装成 ndarray，丢弃 alpha 通道时一次拷贝写入目标数组。
+    mss 实例不能跨线程使用，每个线程持有自己的实例。
+
+    mss 的显示器和截图区域使用逻辑坐标，返回的图像却是物理像素（Retina 上为 2 倍）。
+    为了让全屏截图和区域截图处于同一坐标系（全屏截图的像素坐标），
+    screen_size 返回物理像素尺寸，grab 的 region 也按物理像素给出，截图前按缩放比例换算为逻辑坐标。
+    """
+
+    name = "mss"
+
+    def __init__(self, monitor: int = 1):
+        """
+        Args:
+            monitor: mss 显示器编号，1 为主屏幕（与 pyautogui 一致），0 为所有屏幕
+        """
+        if not MSS_AVAILABLE:
+            raise ImportError("mss required")
+        self._monitor_index = monitor
+        self._local = threading.local()
+        self._instances = []
+        self._lock = threading.Lock()
+        # 显示器编号 -> (水平缩放, 垂直缩放)，物理像素 / 逻辑坐标
+        self._scales = {}
+
+    def _sct(self):
+        sct = getattr(self._local, 'sct', None)
+        if sct is None:
+            sct = mss.mss()
+            self._local.sct = sct
+            with self._lock:
+                self._instances.append(sct)
+        return sct
+
+    def _monitor(self) -> dict:
+        return self._sct().monitors[self._monitor_index]
+
+    def _grab_bgra(self, area: dict) -> np.ndarray:
+        shot = self._sct().grab(area)
+        return np.frombuffer(shot.raw, dtype=np.uint8).reshape(shot.height, shot.width, 4)
+
+    def _grab_full(self) -> np.ndarray:
+        """截取整个显示器，同时记录缩放比例"""
+        mon = self._monitor()
+        bgra = self._grab_bgra(mon)
+        self._scales[self._monitor_index] = (bgra.shape[1] / mon['width'], bgra.shape[0] / mon['height'])
+        return bgra
+
+    def _scale(self) -> Tuple[float, float]:
+        """物理像素 / 逻辑坐标的缩放比例，尚未截过全屏时截一次全屏测定"""
+        scale = self._scales.get(self._monitor_index)
+        if scale is None:
+            self._grab_full()
+            scale = self._scales[self._monitor_index]
+        return scale
+
+    def screen_size(self) -> Tuple[int, int]:
+        mon = self._monitor()
+        sx, sy = self._scale()
+        return round(mon['width'] * sx), round(mon['height'] * sy)
+
+    def grab(self, region: Optional[Rect] = None, out: Optional[np.ndarray] = None) -> np.ndarray:
+        sx, sy = self._scale() if region else (1.0, 1.0)
+        if not region:
+            bgra = self._grab_full()
+        elif not (sx.is_integer() and sy.is_integer()):
+            # 非整数缩放时逻辑坐标换算后无法与物理像素对齐，截全屏再裁剪
+            bgra = self._grab_full()[region.y:region.y + region.height, region.x:region.x + region.width]
+        else:
+            mon = self._monitor()
+            # 覆盖 region 的逻辑坐标区域，截图后裁掉取整多出的部分
+            left = int(region.x / sx)
+            top = int(region.y / sy)
+            right = math.ceil((region.x + region.width) / sx)
+            bottom = math.ceil((region.y + region.height) / sy)
+            bgra = self._grab_bgra({
+                'left': mon['left'] + left,
+                'top': mon['top'] + top,
+                'width': max(1, right - left),
+                'height': max(1, bottom - top),
+            })
+            ox = region.x - round(left * sx)
+            oy = region.y - round(top * sy)
+            bgra = bgra[oy:oy + region.height, ox:ox + region.width]
+            if bgra.shape[:2] != (region.height, region.width):
+                # 截图尺寸与换算结果不符时退回全屏截图再裁剪
+                bgra = self._grab_full()[region.y:region.y + region.height, region.x:region.x + region.width]
+
+        if out is None:
+            return cv2.cvtColor(bgra, cv2.COLOR_BGRA2BGR) if CV_AVAILABLE else bgra[:, :, :3].copy()
+        np.copyto(out, bgra[:, :, :3])
+        return out
+
+    def close(self):
+        with self._lock:
+            instances, self._instances = self._instances, []
+        for sct in instances:
+            try:
+                sct.close()
+            except Exception:
+                pass
+        self._local = threading.local()
+
+
+def create_capture_backend(name: str = "auto") -> CaptureBackend:
+    """创建截图后端
+
+    Args:
+        name: "mss" / "pyautogui" / "auto"（优先 mss，未安装时回退到 pyautogui）
+    """
+    if name == "mss" or (name == "auto" and MSS_AVAILABLE):
+        return MssCapture()
+    if name in ("pyautogui", "auto"):
+        return PyAutoGuiCapture()
+    raise ValueError(f"Unknown capture backend: {name}")
+
+
+_default_backend: Optional[CaptureBackend] = None
+_default_lock = threading.Lock()
+
+
+def get_capture_backend() -> CaptureBackend:
+    """获取进程级共享的默认截图后端（首次调用时创建）"""
+    global _default_backend
+    with _default_lock:
+        if _default_backend is None:
+            _default_backend = create_capture_backend()
+        return _default_backend
@@ -0,0 +1,48 @@
+"""
+Pipeline 配置校验工具
+
+在启动被测程序之前检查 Pipeline JSON:
+模板文件是否存在、识别参数是否合法、next 是否引用了不存在的节点、是否有不可达节点。
+
+用法:
+    python -m core.vision.check_pipeline core/vision/examples/demo_pipeline.json
+"""
+
+import argparse
+import json
+from pathlib import Path
+from typing import List, Optional
+
+from .pipeline import compile_pipeline
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """命令行校验 Pipeline 配置，发布前发现错误的模板路径和跳转
+
+    用法: python -m core.vision.check_pipeline config.json [--resource-dir DIR] [--entry NODE ...]
+    """
+    parser = argparse.ArgumentParser(description="校验 Pipeline JSON 配置")
+    parser.add_argument('config', help="Pipeline JSON 文件")
+    parser.add_argument('--resource-dir', help="资源目录，默认使用配置中的 $resource_base 或配置所在目录")
+    parser.add_argument('--entry', nargs='*', help="入口节点，默认以未被引用的节点为入口")
+    args = parser.parse_args(argv)
+
+    config_path = Path(args.config)
+    with open(config_path, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+
+    resource_dir = args.resource_dir
+    if not resource_dir:
+        resource_dir = (config_path.parent / config.get('$resource_base', '.')).resolve()
+
+    compiled = compile_pipeline(config, resource_dir, entries=args.entry)
+    for error in compiled.errors:
+        print(f"错误: {error}")
+    for warning in compiled.warnings:
+        print(f"警告: {warning}")
+    print(f"{len(compiled.nodes)} 个节点, {len(compiled.errors)} 个错误, {len(compiled.warnings)} 个警告")
+    return 0 if compiled.ok else 1
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
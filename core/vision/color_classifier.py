@@ -0,0 +1,175 @@
+"""
+颜色分类器 - 编译后的多范围颜色掩码
+
+ColorMatcher 原先对每组颜色范围做一次 cv2.inRange 再 bitwise_or，
+范围越多，遍历像素的次数越多；多个 ColorMatch 节点识别同一帧时，
+还会对同一块区域重复做颜色空间转换。
+
+本模块提供:
+- ColorClassifier: 由颜色范围编译出的查找表，一次遍历得到全部范围的并集掩码
+- ColorSpaceCache: 同一帧内按转换方法缓存转换后的画面，供多个节点复用
+
+查找表的结构:
+inRange 的每个范围是各通道区间的交集（轴对齐的长方体），
+因此 256³ 的三维查找表可以无损地拆成每个通道一张 256 项的位掩码表:
+第 c 个通道值为 v 时，lut[v, c] 的第 i 位表示 v 落在第 i 组范围的该通道区间内。
+cv2.LUT 一次遍历查出三个通道的位掩码，三者按位与后非零即命中任意一组范围。
+每 8 组范围占用一个 uint8 位平面。
+"""
+
+import threading
+from typing import List, Optional, Sequence, Tuple
+import numpy as np
+
+try:
+    import cv2
+    CV_AVAILABLE = True
+except ImportError:
+    CV_AVAILABLE = False
+
+from .types import Rect
+from .capture import clip_rect
+
+
+def _covers(outer: Rect, inner: Rect) -> bool:
+    return (outer.x <= inner.x and outer.y <= inner.y
+            and inner.x + inner.width <= outer.x + outer.width
+            and inner.y + inner.height <= outer.y + outer.height)
+
+
+class ColorClassifier:
+    """编译后的颜色分类器
+
+    示例:
+        >>> classifier = ColorClassifier([([0, 100, 100], [10, 255, 255]),
+        ...                               ([170, 100, 100], [180, 255, 255])])
+        >>> mask = classifier.classify(hsv_image)   # uint8, 命中为 255
+    """
+
+    # 范围数不超过该值时直接用 cv2.inRange（单个 inRange 本身就是一次遍历，比查表更快）
+    INRANGE_MAX_RANGES = 3
+
+    def __init__(self, ranges: Sequence[Tuple[Sequence[int], Sequence[int]]]):
+        """
+        Args:
+            ranges: 颜色范围列表 [(lower, upper), ...]，各组的通道数需一致
+
+        Raises:
+            ValueError: 通道数不一致或超出 1-4
+        """
+        self.ranges = [
+            (np.array(lower, dtype=np.uint8), np.array(upper, dtype=np.uint8))
+            for lower, upper in ranges
+        ]
+        channels = {len(lower) for lower, _ in self.ranges} | {len(upper) for _, upper in self.ranges}
+        if len(channels) > 1:
+            raise ValueError(f"颜色范围的通道数不一致: {sorted(channels)}")
+        self.channels = channels.pop() if channels else 0
+        if self.ranges and not 1 <= self.channels <= 4:
+            raise ValueError(f"不支持的通道数: {self.channels}")
+
+        # 位掩码查找表，每 8 组范围一张 (1, 256, channels)
+        self._luts: List[np.ndarray] = []
+        if len(self.ranges) > self.INRANGE_MAX_RANGES:
+            self._luts = self._build_luts()
+
+    def _build_luts(self) -> List[np.ndarray]:
+        luts = []
+        for group in range(0, len(self.ranges), 8):
+            lut = np.zeros((1, 256, self.channels), dtype=np.uint8)
+            for bit, (lower, upper) in enumerate(self.ranges[group:group + 8]):
+                for c in range(self.channels):
+                    lut[0, lower[c]:int(upper[c]) + 1, c] |= np.uint8(1 << bit)
+            luts.append(lut)
+        return luts
+
+    def classify(self, image: np.ndarray) -> Optional[np.ndarray]:
+        """计算颜色掩码
+
+        Args:
+            image: 已转换到目标颜色空间的图像，通道数需与范围一致
+
+        Returns:
+            uint8 掩码（命中为 255），未配置范围时返回 None
+        """
+        if not self.ranges:
+            return None
+
+        if not self._luts:
+            mask = None
+            for lower, upper in self.ranges:
+                current = cv2.inRange(image, lower, upper)
+                mask = current if mask is None else cv2.bitwise_or(mask, current, dst=mask)
+            return mask
+
+        mask = None
+        for lut in self._luts:
+            bits = cv2.LUT(image, lut)
+            if self.channels > 1:
+                hit = bits[:, :, 0]
+                for c in range(1, self.channels):
+                    hit = cv2.bitwise_and(hit, bits[:, :, c])
+            else:
+                hit = bits
+            current = cv2.compare(hit, 0, cv2.CMP_GT)
+            mask = current if mask is None else cv2.bitwise_or(mask, current, dst=mask)
+        return mask
+
+
+class ColorSpaceCache:
+    """同一帧内的颜色空间转换缓存
+
+    按 (转换方法) 保存已转换的区域；新的 ROI 落在已转换区域内时直接切片复用。
+    传入的画面对象变化（新的一帧）时自动清空，因此画面数组不应被原地改写。
+
+    示例:
+        >>> cache = ColorSpaceCache()
+        >>> hsv_roi = cache.convert(frame, cv2.COLOR_BGR2HSV, roi)
+    """
+
+    def __init__(self):
+        self._image: Optional[np.ndarray] = None
+        self._regions: dict = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def convert(self, image: np.ndarray, method: int, roi: Rect) -> np.ndarray:
+        """获取 ROI 区域转换到目标颜色空间后的图像
+
+        Args:
+            image: 整帧画面 (BGR)
+            method: cv2.cvtColor 的转换方法，0 表示不转换（直接返回 ROI 视图，不复制）
+            roi: 识别区域
+
+        Returns:
+            转换后的 ROI 图像（可能是缓存数组的视图，调用方不应修改）
+        """
+        roi = clip_rect(roi, image.shape[1], image.shape[0])
+        view = image[roi.y:roi.y + roi.height, roi.x:roi.x + roi.width]
+        if method == 0:
+            return view
+
+        with self._lock:
+            if self._image is not image:
+                self._image = image
+                self._regions = {}
+            for region, converted in self._regions.get(method, ()):
+                if _covers(region, roi):
+                    self.hits += 1
+                    dx, dy = roi.x - region.x, roi.y - region.y
+                    return converted[dy:dy + roi.height, dx:dx + roi.width]
+            self.misses += 1
+
+        converted = cv2.cvtColor(view, method)
+
+        with self._lock:
+            if self._image is image:
+                self._regions.setdefault(method, []).append((roi, converted))
+        return converted
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._image = None
+            self._regions = {}
@@ -5,7 +5,7 @@
 
 import time
 from dataclasses import dataclass, field
-from typing import List, Optional, Tuple
+from typing import List, Optional, Tuple, Union
 import numpy as np
 
 try:
@@ -16,6 +16,8 @@ except ImportError:
 
 from .types import Rect, RecoResult, MatchResult, OrderBy
 from .base import VisionBase
+from .color_classifier import ColorClassifier
+from .frame import Frame
 
 
 @dataclass
@@ -42,6 +44,18 @@ class ColorMatcherParam:
     
     # 返回第几个结果
     result_index: int = 0
+    
+    # 编译后的颜色分类器（按 ranges 懒构建）
+    _classifier: Optional[ColorClassifier] = field(default=None, init=False, repr=False, compare=False)
+    _classifier_key: Optional[tuple] = field(default=None, init=False, repr=False, compare=False)
+    
+    def classifier(self) -> ColorClassifier:
+        """获取编译后的颜色分类器，ranges 被修改后自动重建"""
+        key = tuple((tuple(lower), tuple(upper)) for lower, upper in self.ranges)
+        if self._classifier is None or self._classifier_key != key:
+            self._classifier = ColorClassifier(self.ranges)
+            self._classifier_key = key
+        return self._classifier
 
 
 class ColorMatcher(VisionBase):
@@ -62,7 +76,7 @@ class ColorMatcher(VisionBase):
     
     def __init__(
         self,
-        image: np.ndarray,
+        image: Union[np.ndarray, Frame],
         param: ColorMatcherParam,
         roi: Optional[Rect] = None,
         name: str = "ColorMatcher"
@@ -80,25 +94,15 @@ class ColorMatcher(VisionBase):
             result.cost_ms = (time.perf_counter() - start_time) * 1000
             return result
         
-        image_roi = self.image_with_roi()
+        # 颜色空间转换（同一 Frame 上只转换一次；0 表示不转换，直接使用 ROI 视图）
+        converted = self._frame.convert(self._param.method, self._roi)
         
-        # 颜色空间转换
-        if self._param.method != 0:  # 0 表示不转换
-            converted = cv2.cvtColor(image_roi, self._param.method)
-        else:
-            converted = image_roi.copy()
-        
-        # 合并所有颜色范围的掩码
-        combined_mask = None
-        for lower, upper in self._param.ranges:
-            lower_arr = np.array(lower, dtype=np.uint8)
-            upper_arr = np.array(upper, dtype=np.uint8)
-            mask = cv2.inRange(converted, lower_arr, upper_arr)
-            
-            if combined_mask is None:
-                combined_mask = mask
-            else:
-                combined_mask = cv2.bitwise_or(combined_mask, mask)
+        # 一次计算所有颜色范围的并集掩码
+        try:
+            combined_mask = self._param.classifier().classify(converted)
+        except (ValueError, cv2.error) as e:
+            print(f"[ColorMatcher] 颜色范围无效: {e}")
+            combined_mask = None
         
         if combined_mask is None:
             result.cost_ms = (time.perf_counter() - start_time) * 1000
@@ -0,0 +1,102 @@
+"""
+调试图片写入器 - 后台线程保存识别截图
+
+Pipeline 每个节点识别后都会保存一张标注了识别框的截图，
+PNG 编码和写盘较慢，放在后台线程中执行，不阻塞节点的执行。
+"""
+
+import queue
+import threading
+from pathlib import Path
+from typing import Optional, Tuple
+import numpy as np
+
+try:
+    import cv2
+    CV_AVAILABLE = True
+except ImportError:
+    CV_AVAILABLE = False
+
+from .types import Rect
+
+
+class DebugImageWriter:
+    """后台调试图片写入器
+
+    使用有界队列，队列满时丢弃新的图片而不是阻塞调用方。
+
+    示例:
+        >>> writer = DebugImageWriter()
+        >>> writer.submit("log/node_1.png", frame, box)
+        >>> writer.close()  # 等待全部写完
+    """
+
+    # 标注框颜色 (BGR 红色) 和线宽
+    BOX_COLOR: Tuple[int, int, int] = (0, 0, 255)
+    BOX_THICKNESS = 3
+
+    def __init__(self, max_queue: int = 16):
+        """
+        Args:
+            max_queue: 队列最多缓存的图片数量
+        """
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(
+            target=self._worker,
+            name="DebugImageWriter",
+            daemon=True
+        )
+        self._thread.start()
+        self.dropped = 0
+        self.errors = 0
+
+    def submit(self, path: str, image: np.ndarray, box: Optional[Rect] = None) -> bool:
+        """提交一张待保存的图片
+
+        标注在后台线程中基于副本进行，不会修改传入的 image。
+
+        Returns:
+            是否成功加入队列（队列已满时返回 False）
+        """
+        try:
+            self._queue.put_nowait((path, image, box))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def flush(self):
+        """等待队列中的图片全部写完"""
+        self._queue.join()
+
+    def close(self):
+        """写完剩余图片并停止后台线程"""
+        self._queue.put(None)
+        self._thread.join()
+
+    def _worker(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                path, image, box = item
+                self._write(path, image, box)
+            except Exception as e:
+                self.errors += 1
+                print(f"[DebugImageWriter] 截图保存失败: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _write(self, path: str, image: np.ndarray, box: Optional[Rect]):
+        if box:
+            image = image.copy()
+            cv2.rectangle(
+                image,
+                (box.x, box.y),
+                (box.x + box.width, box.y + box.height),
+                self.BOX_COLOR,
+                self.BOX_THICKNESS
+            )
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        cv2.imwrite(path, image)
@@ -0,0 +1,246 @@
+"""
+特征缓存 - 模板关键点/描述符缓存与线程级检测器复用
+
+模板图片不会变化，但 FeatureMatcher 每次识别都会对每个模板重新 detectAndCompute，
+并重新创建检测器和匹配器。AKAZE 上模板的特征提取往往和整屏提取一样耗时。
+
+本模块提供:
+- FeatureCache: 按 (模板路径, mtime, 检测器, green_mask) 缓存关键点和描述符，
+  并可持久化到磁盘（.npz），冷启动时跳过特征提取
+- get_detector: 每个线程持有一份检测器实例
+  （OpenCV 的 Feature2D 不能跨线程并发使用）
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Hashable, Optional, Tuple, Union
+import numpy as np
+
+try:
+    import cv2
+    CV_AVAILABLE = True
+except ImportError:
+    CV_AVAILABLE = False
+
+
+# 默认磁盘缓存目录（项目根目录下的 cache/features）
+DEFAULT_CACHE_DIR = Path(__file__).resolve().parent.parent.parent / 'cache' / 'features'
+
+
+@dataclass
+class TemplateFeatures:
+    """一组关键点特征（模板，或画面 ROI 见 Frame.features）"""
+    keypoints: Tuple['cv2.KeyPoint', ...]
+    descriptors: Optional[np.ndarray]
+    # 关键点坐标 (N, 2) float32，避免匹配时逐个访问 KeyPoint.pt
+    points: np.ndarray
+    # 模板尺寸 (width, height)
+    size: Tuple[int, int]
+
+    def __len__(self) -> int:
+        return len(self.keypoints)
+
+    @classmethod
+    def from_keypoints(
+        cls,
+        keypoints,
+        descriptors: Optional[np.ndarray],
+        size: Tuple[int, int]
+    ) -> 'TemplateFeatures':
+        keypoints = tuple(keypoints or ())
+        if keypoints:
+            points = cv2.KeyPoint_convert(keypoints).reshape(-1, 2).astype(np.float32, copy=False)
+        else:
+            points = np.empty((0, 2), dtype=np.float32)
+        return cls(keypoints=keypoints, descriptors=descriptors, points=points, size=size)
+
+
+def _keypoints_to_array(keypoints) -> np.ndarray:
+    return np.array(
+        [(kp.pt[0], kp.pt[1], kp.size, kp.angle, kp.response, kp.octave, kp.class_id)
+         for kp in keypoints],
+        dtype=np.float64
+    ).reshape(-1, 7)
+
+
+def _keypoints_from_array(arr: np.ndarray) -> Tuple['cv2.KeyPoint', ...]:
+    return tuple(
+        cv2.KeyPoint(
+            x=float(x), y=float(y), size=float(size), angle=float(angle),
+            response=float(response), octave=int(octave), class_id=int(class_id)
+        )
+        for x, y, size, angle, response, octave, class_id in arr
+    )
+
+
+def image_key(image: np.ndarray) -> Tuple[str, int]:
+    """内存模板的缓存键（基于像素内容的哈希）"""
+    digest = hashlib.blake2b(np.ascontiguousarray(image).tobytes(), digest_size=16)
+    digest.update(str(image.shape).encode())
+    return ("mem:" + digest.hexdigest(), 0)
+
+
+class FeatureCache:
+    """模板特征缓存
+
+    内存中按 LRU 保存，cache_dir 不为 None 时同时写入磁盘。
+
+    示例:
+        >>> cache = get_feature_cache()
+        >>> features = cache.get(entry.key, "AKAZE", False, lambda: extract(template))
+    """
+
+    def __init__(self, cache_dir: Optional[Union[str, Path]] = None, max_entries: int = 256):
+        """
+        Args:
+            cache_dir: 磁盘缓存目录，None 表示只在内存中缓存
+            max_entries: 内存中最多缓存的模板数
+        """
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[Hashable, TemplateFeatures]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def get(
+        self,
+        source_key: Tuple[str, int],
+        detector: str,
+        green_mask: bool,
+        compute: Callable[[], TemplateFeatures]
+    ) -> TemplateFeatures:
+        """获取模板特征，未命中时调用 compute 提取并缓存
+
+        Args:
+            source_key: 模板来源 (路径, mtime_ns)，内存模板使用 image_key()
+            detector: 检测器名称
+            green_mask: 是否使用绿色掩码
+            compute: 实际提取特征的函数
+        """
+        key = (source_key[0], source_key[1], detector, bool(green_mask))
+
+        with self._lock:
+            features = self._entries.get(key)
+            if features is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return features
+
+        features = self._load_from_disk(key)
+        if features is not None:
+            self.disk_hits += 1
+        else:
+            self.misses += 1
+            features = compute()
+            self._save_to_disk(key, features)
+
+        with self._lock:
+            self._entries[key] = features
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return features
+
+    def clear(self):
+        """清空内存缓存（磁盘缓存保留）"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.disk_hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        """缓存统计信息"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+            }
+
+    def _disk_path(self, key: Tuple) -> Optional[Path]:
+        # 内存模板只缓存在内存中；OpenCV 版本不同时描述符可能不同，版本号计入文件名
+        if self.cache_dir is None or key[0].startswith("mem:"):
+            return None
+        raw = "|".join(str(k) for k in key) + "|" + cv2.__version__
+        return self.cache_dir / (hashlib.sha1(raw.encode('utf-8')).hexdigest() + ".npz")
+
+    def _load_from_disk(self, key: Tuple) -> Optional[TemplateFeatures]:
+        path = self._disk_path(key)
+        if path is None or not path.exists():
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                keypoints = _keypoints_from_array(data['keypoints'])
+                descriptors = data['descriptors'] if data['has_descriptors'] else None
+                size = tuple(int(v) for v in data['size'])
+            return TemplateFeatures.from_keypoints(keypoints, descriptors, size)
+        except Exception as e:
+            print(f"[FeatureCache] 读取磁盘缓存失败: {path.name}: {e}")
+            return None
+
+    def _save_to_disk(self, key: Tuple, features: TemplateFeatures):
+        path = self._disk_path(key)
+        if path is None:
+            return
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            has_descriptors = features.descriptors is not None
+            # 先写临时文件再替换，避免并发读到写了一半的文件
+            tmp = path.with_name(path.stem + f".{threading.get_ident()}.tmp.npz")
+            np.savez(
+                tmp,
+                keypoints=_keypoints_to_array(features.keypoints),
+                descriptors=features.descriptors if has_descriptors else np.zeros((0,), np.uint8),
+                has_descriptors=np.array(has_descriptors),
+                size=np.array(features.size),
+            )
+            tmp.replace(path)
+        except Exception as e:
+            print(f"[FeatureCache] 写入磁盘缓存失败: {path.name}: {e}")
+
+
+_shared_cache = FeatureCache(cache_dir=DEFAULT_CACHE_DIR)
+
+
+def get_feature_cache() -> FeatureCache:
+    """获取进程级共享的特征缓存"""
+    return _shared_cache
+
+
+# ==================== 线程级检测器 ====================
+
+_local = threading.local()
+
+
+def create_detector(detector: str):
+    """创建特征检测器"""
+    if detector == "SIFT":
+        return cv2.SIFT_create()
+    elif detector == "ORB":
+        return cv2.ORB_create(nfeatures=1000)
+    elif detector == "BRISK":
+        return cv2.BRISK_create()
+    elif detector == "KAZE":
+        return cv2.KAZE_create()
+    elif detector == "AKAZE":
+        return cv2.AKAZE_create()
+    raise ValueError(f"Unknown detector: {detector}")
+
+
+def get_detector(detector: str):
+    """获取当前线程的特征检测器实例"""
+    detectors = getattr(_local, 'detectors', None)
+    if detectors is None:
+        detectors = _local.detectors = {}
+    instance = detectors.get(detector)
+    if instance is None:
+        instance = detectors[detector] = create_detector(detector)
+    return instance
+
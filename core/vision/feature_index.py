@@ -0,0 +1,227 @@
+"""
+特征索引 - 多个模板共享的 FLANN 索引
+
+逐模板匹配时，每个模板都要和画面描述符做一次 KNN 匹配，
+Pipeline 中特征匹配节点越多，暴力匹配的开销越大。
+
+FeatureIndex 将同一检测器下所有模板的描述符放入一个训练好的 FLANN 索引:
+- 浮点描述符 (SIFT/KAZE) 使用 KD-Tree
+- 二值描述符 (ORB/AKAZE/BRISK) 使用 LSH，代替 BFMatcher(NORM_HAMMING)
+
+画面描述符只查询一次，再按模板拆分投票，交给各模板分别计算单应性。
+
+knn_ratio_match 是逐模板匹配使用的同一套数组化 KNN + ratio test，
+直接得到序号和距离数组，不再经过 DMatch 对象。
+"""
+
+import threading
+from typing import Dict, Hashable, Iterable, Optional, Tuple
+import numpy as np
+
+try:
+    import cv2
+    CV_AVAILABLE = True
+except ImportError:
+    CV_AVAILABLE = False
+
+from .feature_cache import TemplateFeatures
+
+
+# 使用浮点描述符的检测器
+FLOAT_DETECTORS = ("SIFT", "KAZE")
+
+# FLANN 索引参数
+FLANN_INDEX_KDTREE = 1
+FLANN_INDEX_LSH = 6
+KDTREE_PARAMS = dict(algorithm=FLANN_INDEX_KDTREE, trees=5)
+LSH_PARAMS = dict(algorithm=FLANN_INDEX_LSH, table_number=6, key_size=12, multi_probe_level=1)
+SEARCH_PARAMS = dict(checks=50)
+
+
+def _ratio_mask(indices: np.ndarray, dists: np.ndarray, ratio: float, is_float: bool) -> np.ndarray:
+    """对 k=2 的查询结果做 Lowe's ratio test
+
+    KD-Tree 返回的是 L2 距离的平方，阈值取 ratio²；
+    LSH 找不到近邻时序号为 -1，未找到次近邻时不做 ratio test
+    """
+    r = ratio * ratio if is_float else ratio
+    valid = indices[:, 0] >= 0
+    return valid & ((indices[:, 1] < 0) | (dists[:, 0] < r * dists[:, 1]))
+
+
+def knn_ratio_match(
+    query: Optional[np.ndarray],
+    train: Optional[np.ndarray],
+    ratio: float = 0.75,
+    is_float: bool = False
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """为 query 的每个描述符在 train 中找最近的两个描述符并做 ratio test
+
+    浮点描述符使用 FLANN KD-Tree，二值描述符使用 cv2.batchDistance 暴力计算 Hamming 距离
+    （与 BFMatcher(NORM_HAMMING) 结果一致），两者都直接返回距离矩阵。
+
+    Args:
+        query: 查询描述符
+        train: 被查询的描述符
+        ratio: Lowe's ratio 阈值
+        is_float: 是否为浮点描述符
+
+    Returns:
+        (query 序号数组, train 序号数组, 最近邻距离数组)，均为 int64 / float64
+    """
+    empty = np.empty(0, dtype=np.int64)
+    if query is None or train is None or len(query) == 0 or len(train) < 2:
+        return empty, empty, np.empty(0, dtype=np.float64)
+
+    if is_float:
+        data = np.ascontiguousarray(train, dtype=np.float32)
+        index = cv2.flann_Index(data, KDTREE_PARAMS)
+        indices, dists = index.knnSearch(np.ascontiguousarray(query, dtype=np.float32), 2, params=SEARCH_PARAMS)
+    else:
+        dists, indices = cv2.batchDistance(
+            query, train, cv2.CV_32S,
+            normType=cv2.NORM_HAMMING, K=2, update=0, crosscheck=False
+        )
+    indices = indices.reshape(len(query), 2)
+    dists = dists.reshape(len(query), 2).astype(np.float64)
+
+    query_idx = np.nonzero(_ratio_mask(indices, dists, ratio, is_float))[0]
+    return query_idx, indices[query_idx, 0].astype(np.int64), dists[query_idx, 0]
+
+
+class FeatureIndex:
+    """多模板共享的 FLANN 特征索引
+
+    示例:
+        >>> index = FeatureIndex.build("ORB", [(entry.key, features), ...])
+        >>> votes = index.query(desc_image, ratio=0.75)
+        >>> template_idx, image_idx = votes[index.template_id(entry.key)]
+    """
+
+    def __init__(self, detector: str, green_mask: bool = False):
+        """
+        Args:
+            detector: 检测器名称，决定使用 KD-Tree 还是 LSH
+            green_mask: 模板特征是否使用了绿色掩码
+        """
+        self.detector = detector
+        self.green_mask = green_mask
+        self.is_float = detector in FLOAT_DETECTORS
+        self._ids: Dict[Hashable, int] = {}
+        self._descriptors = []
+        self._data: Optional[np.ndarray] = None
+        # 索引中每一行描述符所属的模板 id 和在模板中的关键点序号
+        self._owner: Optional[np.ndarray] = None
+        self._local: Optional[np.ndarray] = None
+        self._index = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def build(
+        cls,
+        detector: str,
+        templates: Iterable[Tuple[Hashable, TemplateFeatures]],
+        green_mask: bool = False
+    ) -> 'FeatureIndex':
+        """添加全部模板并训练索引"""
+        index = cls(detector, green_mask)
+        for key, features in templates:
+            index.add(key, features)
+        index.train()
+        return index
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._ids
+
+    def template_id(self, key: Hashable) -> Optional[int]:
+        """模板在索引中的 id，不在索引中时返回 None"""
+        return self._ids.get(key)
+
+    def add(self, key: Hashable, features: TemplateFeatures) -> Optional[int]:
+        """添加模板（重复添加同一模板会被忽略）
+
+        Returns:
+            模板 id，没有描述符的模板返回 None
+        """
+        if key in self._ids:
+            return self._ids[key]
+        if features.descriptors is None or len(features.descriptors) == 0:
+            return None
+        template_id = len(self._descriptors)
+        self._ids[key] = template_id
+        self._descriptors.append(features.descriptors)
+        self._index = None
+        return template_id
+
+    def train(self):
+        """合并描述符并训练 FLANN 索引"""
+        if not self._descriptors:
+            return
+        dtype = np.float32 if self.is_float else np.uint8
+        self._data = np.ascontiguousarray(np.vstack(self._descriptors), dtype=dtype)
+        counts = [len(d) for d in self._descriptors]
+        self._owner = np.repeat(np.arange(len(counts)), counts)
+        self._local = np.concatenate([np.arange(n) for n in counts])
+        # flann_Index 不一定复制数据，self._data 需要与索引同生命周期
+        self._index = cv2.flann_Index(self._data, KDTREE_PARAMS if self.is_float else LSH_PARAMS)
+
+    def query(
+        self,
+        descriptors: np.ndarray,
+        ratio: float = 0.75,
+        unique: bool = True
+    ) -> Dict[int, Tuple[np.ndarray, np.ndarray]]:
+        """用画面描述符查询索引，并按模板拆分匹配
+
+        每个画面关键点取索引中最近的两个描述符做 Lowe's ratio test
+        （次近邻可能来自其他模板，相似的模板之间会互相抑制），
+        通过的匹配投票给最近邻所属的模板；
+        unique 为 True 时，同一模板关键点被多个画面关键点匹配只保留距离最近的一个。
+
+        Args:
+            descriptors: 画面描述符
+            ratio: Lowe's ratio 阈值
+            unique: 是否一对一去重（查找多个实例时应为 False）
+
+        Returns:
+            {模板 id: (模板关键点序号数组, 画面关键点序号数组)}
+        """
+        if self._index is None or descriptors is None or len(descriptors) == 0:
+            return {}
+
+        dtype = np.float32 if self.is_float else np.uint8
+        query = np.ascontiguousarray(descriptors, dtype=dtype)
+        k = 2 if len(self._data) >= 2 else 1
+        with self._lock:
+            indices, dists = self._index.knnSearch(query, k, params=SEARCH_PARAMS)
+        indices = indices.reshape(len(query), k)
+        dists = dists.reshape(len(query), k).astype(np.float64)
+
+        if k == 2:
+            valid = _ratio_mask(indices, dists, ratio, self.is_float)
+        else:
+            # LSH 找不到近邻时返回 -1
+            valid = indices[:, 0] >= 0
+
+        image_idx = np.nonzero(valid)[0]
+        if len(image_idx) == 0:
+            return {}
+        rows = indices[image_idx, 0]
+        owner = self._owner[rows]
+
+        if unique:
+            # 同一模板关键点只保留距离最近的匹配
+            order = np.lexsort((dists[image_idx, 0], rows))
+            rows, owner, image_idx = rows[order], owner[order], image_idx[order]
+            first = np.ones(len(rows), dtype=bool)
+            first[1:] = rows[1:] != rows[:-1]
+            rows, owner, image_idx = rows[first], owner[first], image_idx[first]
+
+        votes: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}
+        for template_id in np.unique(owner):
+            sel = owner == template_id
+            votes[int(template_id)] = (self._local[rows[sel]], image_idx[sel])
+        return votes
@@ -25,6 +25,16 @@ except ImportError:
 
 from .types import Rect, RecoResult, MatchResult, OrderBy
 from .base import VisionBase
+from .frame import Frame
+from .template_cache import TemplateEntry, create_green_mask, get_template_cache
+from .feature_index import FLOAT_DETECTORS, FeatureIndex, knn_ratio_match
+from .feature_cache import (
+    TemplateFeatures,
+    create_detector,
+    get_detector,
+    get_feature_cache,
+    image_key,
+)
 
 
 class FeatureDetector(Enum):
@@ -42,8 +52,8 @@ class FeatureMatcherParam:
     
     参考 MAA 的 FeatureMatcherParam
     """
-    # 模板图片路径或numpy数组
-    templates: List[Union[str, np.ndarray]] = field(default_factory=list)
+    # 模板图片路径、numpy数组或预加载的模板缓存条目
+    templates: List[Union[str, np.ndarray, TemplateEntry]] = field(default_factory=list)
     
     # 特征检测器
     detector: FeatureDetector = FeatureDetector.AKAZE
@@ -62,6 +72,17 @@ class FeatureMatcherParam:
     
     # 返回第几个结果
     result_index: int = 0
+    
+    # 每个模板最多返回的实例数
+    # 大于 1 时改为画面→模板方向匹配，并在剩余匹配点上重复 RANSAC 查找多个目标
+    max_instances: int = 1
+    
+    # 是否缓存模板特征并复用线程级检测器/匹配器
+    use_cache: bool = True
+    
+    # 共享的 FLANN 特征索引（见 build_feature_index），
+    # 设置后画面描述符只查询一次，不在索引中的模板仍逐个匹配
+    index: Optional[FeatureIndex] = None
 
 
 class FeatureMatcher(VisionBase):
@@ -82,7 +103,7 @@ class FeatureMatcher(VisionBase):
     
     def __init__(
         self,
-        image: np.ndarray,
+        image: Union[np.ndarray, Frame],
         param: FeatureMatcherParam,
         roi: Optional[Rect] = None,
         name: str = "FeatureMatcher"
@@ -90,6 +111,8 @@ class FeatureMatcher(VisionBase):
         super().__init__(image, roi, name)
         self._param = param
         self._templates: List[np.ndarray] = []
+        # 模板来源 (路径, mtime_ns)，作为特征缓存键
+        self._template_keys: List[Optional[Tuple[str, int]]] = []
         
         # 加载模板
         self._load_templates()
@@ -100,65 +123,129 @@ class FeatureMatcher(VisionBase):
             if isinstance(tmpl, str):
                 path = Path(tmpl)
                 if path.exists():
-                    img = cv2.imread(str(path), cv2.IMREAD_COLOR)
-                    if img is not None:
-                        self._templates.append(img)
-                        print(f"[FeatureMatcher] 模板加载成功: {path} ({img.shape[1]}x{img.shape[0]})")
+                    entry = self._load_template_file(path)
+                    if entry is not None:
+                        self._templates.append(entry.image)
+                        self._template_keys.append(entry.key)
+                        print(f"[FeatureMatcher] 模板加载成功: {path} ({entry.shape[1]}x{entry.shape[0]})")
                     else:
                         print(f"[FeatureMatcher] 模板加载失败: {path}")
                 else:
                     print(f"[FeatureMatcher] 模板文件不存在: {path}")
+            elif isinstance(tmpl, TemplateEntry):
+                self._templates.append(tmpl.image)
+                self._template_keys.append(tmpl.key)
             elif isinstance(tmpl, np.ndarray):
                 self._templates.append(tmpl)
+                self._template_keys.append(None)
+    
+    def _load_template_file(self, path: Path) -> Optional[TemplateEntry]:
+        """从文件加载模板（优先使用共享缓存）"""
+        if self._param.use_cache:
+            return get_template_cache().get(path)
+        img = cv2.imread(str(path), cv2.IMREAD_COLOR)
+        return TemplateEntry(img, path=str(path)) if img is not None else None
     
     def _create_detector(self) -> Optional[cv2.Feature2D]:
-        """创建特征检测器"""
-        detector_type = self._param.detector
-        
+        """获取特征检测器（启用缓存时复用当前线程的实例）"""
         try:
-            if detector_type == FeatureDetector.SIFT:
-                return cv2.SIFT_create()
-            elif detector_type == FeatureDetector.ORB:
-                return cv2.ORB_create(nfeatures=1000)
-            elif detector_type == FeatureDetector.BRISK:
-                return cv2.BRISK_create()
-            elif detector_type == FeatureDetector.KAZE:
-                return cv2.KAZE_create()
-            elif detector_type == FeatureDetector.AKAZE:
-                return cv2.AKAZE_create()
+            if self._param.use_cache:
+                return get_detector(self._param.detector.name)
+            return create_detector(self._param.detector.name)
         except Exception as e:
             print(f"[FeatureMatcher] 创建检测器失败: {e}")
         
         return None
     
-    def _create_matcher(self) -> Optional[cv2.DescriptorMatcher]:
-        """创建特征匹配器"""
-        detector_type = self._param.detector
-        
-        # 根据检测器类型选择合适的匹配器
-        if detector_type in (FeatureDetector.SIFT, FeatureDetector.KAZE):
-            # 浮点描述符使用 FLANN
-            index_params = dict(algorithm=1, trees=5)  # FLANN_INDEX_KDTREE
-            search_params = dict(checks=50)
-            return cv2.FlannBasedMatcher(index_params, search_params)
-        else:
-            # 二值描述符使用 BFMatcher + Hamming
-            return cv2.BFMatcher(cv2.NORM_HAMMING)
-    
     def _create_mask(self, image: np.ndarray) -> Optional[np.ndarray]:
         """创建绿色掩码"""
         if not self._param.green_mask:
             return None
+        return create_green_mask(image)
+    
+    def _source_key(self, index: int) -> Tuple[str, int]:
+        """模板的来源键（文件模板为 (路径, mtime)，内存模板为内容哈希）"""
+        return self._template_keys[index] or image_key(self._templates[index])
+    
+    def _template_features(self, index: int) -> TemplateFeatures:
+        """获取模板的关键点和描述符"""
+        return template_features(
+            self._templates[index],
+            self._template_keys[index],
+            self._param.detector,
+            self._param.green_mask,
+            self._param.use_cache
+        )
+    
+    def _shared_index(self) -> Optional[FeatureIndex]:
+        """可用于本次匹配的共享索引（检测器和掩码设置需一致）"""
+        index = self._param.index
+        if index is None or not len(index):
+            return None
+        if index.detector != self._param.detector.name or index.green_mask != self._param.green_mask:
+            return None
+        return index
+    
+    def _find_homographies(self, src_pts: np.ndarray, dst_pts: np.ndarray) -> List[Tuple[np.ndarray, int]]:
+        """用 RANSAC 计算单应性矩阵
+        
+        max_instances 为 1 时只计算一次，分数为全部匹配点数；
+        否则每找到一个实例就移除它的内点，在剩余匹配点上继续 RANSAC，
+        每个实例的分数为其内点数，内点数低于 count 时停止。
         
-        if len(image.shape) < 3 or image.shape[2] < 3:
+        Returns:
+            [(单应性矩阵, 分数), ...]
+        """
+        max_instances = max(1, self._param.max_instances)
+        instances = []
+        remaining = np.arange(len(src_pts))
+        
+        while len(remaining) >= max(self._param.count, 4) and len(instances) < max_instances:
+            try:
+                H, mask = cv2.findHomography(src_pts[remaining], dst_pts[remaining], cv2.RANSAC, 5.0)
+            except Exception as e:
+                print(f"[FeatureMatcher] 单应性计算失败: {e}")
+                break
+            
+            if H is None or mask is None:
+                break
+            
+            if max_instances == 1:
+                instances.append((H, len(remaining)))
+                break
+            
+            inliers = mask.ravel().astype(bool)
+            inlier_count = int(np.count_nonzero(inliers))
+            if inlier_count < self._param.count:
+                break
+            instances.append((H, inlier_count))
+            remaining = remaining[~inliers]
+        
+        return instances
+    
+    def _homography_box(self, H: np.ndarray, w: int, h: int) -> Optional[Rect]:
+        """将模板四角经单应性变换后的外接矩形转换为全图坐标"""
+        corners = np.float32([[0, 0], [w, 0], [w, h], [0, h]]).reshape(-1, 1, 2)
+        
+        try:
+            transformed = cv2.perspectiveTransform(corners, H)
+        except Exception:
             return None
         
-        green_lower = np.array([0, 250, 0])
-        green_upper = np.array([10, 255, 10])
-        green_mask = cv2.inRange(image, green_lower, green_upper)
-        mask = cv2.bitwise_not(green_mask)
+        # 计算边界框
+        x_coords = transformed[:, 0, 0]
+        y_coords = transformed[:, 0, 1]
+        
+        x_min, x_max = int(np.min(x_coords)), int(np.max(x_coords))
+        y_min, y_max = int(np.min(y_coords)), int(np.max(y_coords))
         
-        return mask
+        # 转换为全图坐标
+        return Rect(
+            x=x_min + self._roi.x,
+            y=y_min + self._roi.y,
+            width=x_max - x_min,
+            height=y_max - y_min
+        )
     
     def analyze(self) -> RecoResult:
         """执行特征匹配分析"""
@@ -174,110 +261,99 @@ class FeatureMatcher(VisionBase):
         all_results: List[MatchResult] = []
         filtered_results: List[MatchResult] = []
         
-        # 创建检测器和匹配器
+        # 创建检测器
         detector = self._create_detector()
         if not detector:
             result.cost_ms = (time.perf_counter() - start_time) * 1000
             return result
         
-        matcher = self._create_matcher()
-        if not matcher:
-            result.cost_ms = (time.perf_counter() - start_time) * 1000
-            return result
-        
-        # 获取搜索图像的特征
-        image_roi = self.image_with_roi()
-        image_mask = self._create_mask(image_roi)
+        # 获取搜索图像的特征（同一 Frame 上相同 ROI 和检测器只提取一次）
+        def extract(image_roi: np.ndarray) -> TemplateFeatures:
+            kp, desc = detector.detectAndCompute(image_roi, self._create_mask(image_roi))
+            return TemplateFeatures.from_keypoints(kp, desc, (image_roi.shape[1], image_roi.shape[0]))
         
         try:
-            kp_image, desc_image = detector.detectAndCompute(image_roi, image_mask)
+            image_features = self._frame.features(
+                self._roi, self._param.detector.name, self._param.green_mask, extract
+            )
         except Exception as e:
             print(f"[FeatureMatcher] 图像特征提取失败: {e}")
             result.cost_ms = (time.perf_counter() - start_time) * 1000
             return result
         
-        if desc_image is None or len(kp_image) < self._param.count:
-            print(f"[FeatureMatcher] 图像特征点不足: {len(kp_image) if kp_image else 0}")
+        desc_image = image_features.descriptors
+        if desc_image is None or len(image_features) < self._param.count:
+            print(f"[FeatureMatcher] 图像特征点不足: {len(image_features)}")
             result.cost_ms = (time.perf_counter() - start_time) * 1000
             return result
         
+        # 画面关键点坐标数组，匹配结果直接按序号取点
+        image_points = image_features.points
+        is_float = self._param.detector.name in FLOAT_DETECTORS
+        multi_instance = self._param.max_instances > 1
+        
+        # 共享索引: 画面描述符只查询一次，按模板拆分匹配
+        shared_index = self._shared_index()
+        votes = None
+        if shared_index is not None:
+            votes = shared_index.query(desc_image, self._param.ratio, unique=not multi_instance)
+        
         # 对每个模板执行匹配
-        for template in self._templates:
-            template_mask = self._create_mask(template)
-            
+        for index, template in enumerate(self._templates):
             try:
-                kp_template, desc_template = detector.detectAndCompute(template, template_mask)
+                features = self._template_features(index)
             except Exception as e:
                 print(f"[FeatureMatcher] 模板特征提取失败: {e}")
                 continue
+            kp_template, desc_template = features.keypoints, features.descriptors
             
             if desc_template is None or len(kp_template) < 4:
                 print(f"[FeatureMatcher] 模板特征点不足: {len(kp_template) if kp_template else 0}")
                 continue
             
-            # 执行 KNN 匹配
-            try:
-                matches = matcher.knnMatch(desc_template, desc_image, k=2)
-            except Exception as e:
-                print(f"[FeatureMatcher] 匹配失败: {e}")
-                continue
-            
-            # Lowe's ratio test
-            good_matches = []
-            for m_pair in matches:
-                if len(m_pair) == 2:
-                    m, n = m_pair
-                    if m.distance < self._param.ratio * n.distance:
-                        good_matches.append(m)
-            
-            print(f"[FeatureMatcher] 匹配点数: {len(good_matches)}/{len(matches)}, 阈值: {self._param.count}")
-            
-            if len(good_matches) < self._param.count:
-                continue
-            
-            # 使用单应性矩阵找到目标区域
-            src_pts = np.float32([kp_template[m.queryIdx].pt for m in good_matches]).reshape(-1, 1, 2)
-            dst_pts = np.float32([kp_image[m.trainIdx].pt for m in good_matches]).reshape(-1, 1, 2)
+            template_id = shared_index.template_id(self._source_key(index)) if votes is not None else None
+            if template_id is not None:
+                # 从共享索引的查询结果中取出属于该模板的匹配
+                empty = np.empty(0, dtype=np.int64)
+                template_idx, image_idx = votes.get(template_id, (empty, empty))
+                print(f"[FeatureMatcher] 匹配点数(共享索引): {len(template_idx)}/{len(kp_template)}, 阈值: {self._param.count}")
+            else:
+                # KNN 匹配 + Lowe's ratio test（数组运算）
+                try:
+                    if multi_instance:
+                        # 画面→模板: 多个目标的关键点可以匹配到同一个模板关键点
+                        image_idx, template_idx, _ = knn_ratio_match(
+                            desc_image, desc_template, self._param.ratio, is_float
+                        )
+                    else:
+                        template_idx, image_idx, _ = knn_ratio_match(
+                            desc_template, desc_image, self._param.ratio, is_float
+                        )
+                except Exception as e:
+                    print(f"[FeatureMatcher] 匹配失败: {e}")
+                    continue
+                
+                print(f"[FeatureMatcher] 匹配点数: {len(template_idx)}/{len(kp_template)}, 阈值: {self._param.count}")
             
-            try:
-                H, mask = cv2.findHomography(src_pts, dst_pts, cv2.RANSAC, 5.0)
-            except Exception as e:
-                print(f"[FeatureMatcher] 单应性计算失败: {e}")
+            if len(template_idx) < self._param.count:
                 continue
             
-            if H is None:
-                continue
+            src_pts = features.points[template_idx]
+            dst_pts = image_points[image_idx]
             
-            # 计算目标边界框
+            # 使用单应性矩阵找到目标区域
             h, w = template.shape[:2]
-            corners = np.float32([[0, 0], [w, 0], [w, h], [0, h]]).reshape(-1, 1, 2)
-            
-            try:
-                transformed = cv2.perspectiveTransform(corners, H)
-            except Exception as e:
-                continue
-            
-            # 计算边界框
-            x_coords = transformed[:, 0, 0]
-            y_coords = transformed[:, 0, 1]
-            
-            x_min, x_max = int(np.min(x_coords)), int(np.max(x_coords))
-            y_min, y_max = int(np.min(y_coords)), int(np.max(y_coords))
-            
-            # 转换为全图坐标
-            box = Rect(
-                x=x_min + self._roi.x,
-                y=y_min + self._roi.y,
-                width=x_max - x_min,
-                height=y_max - y_min
-            )
-            
-            # 使用匹配点数作为分数
-            match_result = MatchResult(box=box, score=len(good_matches))
-            all_results.append(match_result)
-            
-            if len(good_matches) >= self._param.count:
-                filtered_results.append(match_result)
+            for H, score in self._find_homographies(src_pts, dst_pts):
+                box = self._homography_box(H, w, h)
+                if box is None:
+                    continue
+                
+                # 使用匹配点数作为分数
+                match_result = MatchResult(box=box, score=score)
+                all_results.append(match_result)
+                
+                if score >= self._param.count:
+                    filtered_results.append(match_result)
         
         # NMS 去重
         filtered_results = self.nms(filtered_results, iou_threshold=0.5)
@@ -304,6 +380,60 @@ class FeatureMatcher(VisionBase):
         return result
 
 
+def template_features(
+    template: np.ndarray,
+    source_key: Optional[Tuple[str, int]],
+    detector: FeatureDetector,
+    green_mask: bool = False,
+    use_cache: bool = True
+) -> TemplateFeatures:
+    """提取模板的关键点和描述符
+    
+    启用缓存时按 (模板路径, mtime, 检测器, green_mask) 缓存，内存模板 (source_key 为 None) 按像素内容哈希缓存
+    """
+    def extract() -> TemplateFeatures:
+        instance = get_detector(detector.name) if use_cache else create_detector(detector.name)
+        mask = create_green_mask(template) if green_mask else None
+        kp, desc = instance.detectAndCompute(template, mask)
+        return TemplateFeatures.from_keypoints(kp, desc, (template.shape[1], template.shape[0]))
+    
+    if not use_cache:
+        return extract()
+    
+    return get_feature_cache().get(
+        source_key or image_key(template),
+        detector.name,
+        green_mask,
+        extract
+    )
+
+
+def build_feature_index(
+    templates: List[Union[np.ndarray, TemplateEntry]],
+    detector: FeatureDetector = FeatureDetector.AKAZE,
+    green_mask: bool = False
+) -> FeatureIndex:
+    """为一组模板构建共享的 FLANN 特征索引
+    
+    Args:
+        templates: 模板缓存条目或 numpy 数组
+        detector: 特征检测器类型
+        green_mask: 是否使用绿色掩码
+        
+    Returns:
+        训练好的索引，可设置到 FeatureMatcherParam.index
+    """
+    items = []
+    for tmpl in templates:
+        if isinstance(tmpl, TemplateEntry):
+            image, source_key = tmpl.image, tmpl.key
+        else:
+            image, source_key = tmpl, None
+        features = template_features(image, source_key, detector, green_mask)
+        items.append((source_key or image_key(image), features))
+    return FeatureIndex.build(detector.name, items, green_mask)
+
+
 def find_feature(
     image: np.ndarray,
     template: Union[str, np.ndarray],
@@ -0,0 +1,158 @@
+"""
+画面帧 - 同一次截图上的预处理结果共享
+
+各识别器都从原始 BGR 画面开始计算: ColorMatcher 转 HSV，FeatureMatcher 提取 ROI 特征，
+TemplateMatcher 的金字塔搜索缩小 ROI。Pipeline 的一个 tick 里多个候选节点识别同一帧时，
+这些中间结果会被重复计算。
+
+Frame 包装一次截图，按需计算并缓存派生数据:
+- convert / gray / hsv: 颜色空间转换（落在已转换区域内的 ROI 直接切片复用）
+- resized: ROI 按比例缩小后的图像（金字塔粗匹配层）
+- features: ROI 的关键点和描述符（按检测器、掩码设置区分）
+
+识别器接受 np.ndarray 或 Frame，传入数组时内部创建一个只在本次识别中使用的 Frame。
+Frame 持有的画面数组不应被原地修改。
+"""
+
+import threading
+import time
+from typing import Callable, Dict, Hashable, Optional, Tuple
+import numpy as np
+
+try:
+    import cv2
+    CV_AVAILABLE = True
+except ImportError:
+    CV_AVAILABLE = False
+
+from .types import Rect
+from .capture import clip_rect
+from .color_classifier import ColorSpaceCache
+from .feature_cache import TemplateFeatures
+
+
+class Frame:
+    """一帧画面及其派生数据的缓存
+
+    示例:
+        >>> frame = Frame(screen)
+        >>> hsv = frame.hsv(roi)                       # 首次转换
+        >>> ColorMatcher(frame, param, roi).analyze()  # 复用同一份 HSV
+    """
+
+    def __init__(self, image: np.ndarray, timestamp: Optional[float] = None):
+        """
+        Args:
+            image: 截图 (BGR)
+            timestamp: 截图时刻（单调时钟），默认为创建时刻
+        """
+        self.image = image
+        self.timestamp = time.perf_counter() if timestamp is None else timestamp
+        self._colors = ColorSpaceCache()
+        self._derived: Dict[Hashable, object] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def wrap(cls, image) -> 'Frame':
+        """将 np.ndarray 包装为 Frame，已是 Frame 时原样返回"""
+        return image if isinstance(image, Frame) else cls(image)
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        return self.image.shape
+
+    @property
+    def width(self) -> int:
+        return self.image.shape[1]
+
+    @property
+    def height(self) -> int:
+        return self.image.shape[0]
+
+    def full_rect(self) -> Rect:
+        """整帧区域"""
+        return Rect(0, 0, self.width, self.height)
+
+    def clip(self, roi: Optional[Rect]) -> Rect:
+        """将 ROI 裁剪到画面范围内，None 表示整帧"""
+        return clip_rect(roi, self.width, self.height) if roi else self.full_rect()
+
+    def crop(self, roi: Optional[Rect] = None) -> np.ndarray:
+        """ROI 区域的视图（不复制）"""
+        roi = self.clip(roi)
+        return self.image[roi.y:roi.y + roi.height, roi.x:roi.x + roi.width]
+
+    # ==================== 颜色空间 ====================
+
+    def convert(self, method: int, roi: Optional[Rect] = None) -> np.ndarray:
+        """ROI 转换到指定颜色空间后的图像，0 表示不转换（返回视图）"""
+        return self._colors.convert(self.image, method, self.clip(roi))
+
+    def gray(self, roi: Optional[Rect] = None) -> np.ndarray:
+        """ROI 的灰度图"""
+        if self.image.ndim == 2:
+            return self.crop(roi)
+        return self.convert(cv2.COLOR_BGR2GRAY, roi)
+
+    def hsv(self, roi: Optional[Rect] = None) -> np.ndarray:
+        """ROI 的 HSV 图"""
+        return self.convert(cv2.COLOR_BGR2HSV, roi)
+
+    # ==================== 派生数据 ====================
+
+    def memoize(self, key: Hashable, compute: Callable[[], object]):
+        """按 key 缓存任意派生数据（并发时可能重复计算，但只保存第一份）"""
+        with self._lock:
+            if key in self._derived:
+                self.hits += 1
+                return self._derived[key]
+            self.misses += 1
+
+        value = compute()
+
+        with self._lock:
+            return self._derived.setdefault(key, value)
+
+    def resized(self, roi: Optional[Rect], factor: float, color_mode: int = 0) -> np.ndarray:
+        """ROI 按 factor 缩小后的图像（INTER_AREA），用作金字塔粗匹配层
+
+        Args:
+            roi: 区域，None 表示整帧
+            factor: 缩放比例
+            color_mode: 缩放前的颜色空间转换方法，0 表示原始 BGR
+        """
+        roi = self.clip(roi)
+
+        def compute() -> np.ndarray:
+            source = self.gray(roi) if color_mode == cv2.COLOR_BGR2GRAY else self.convert(color_mode, roi)
+            h, w = source.shape[:2]
+            return cv2.resize(
+                source,
+                (max(1, int(w * factor)), max(1, int(h * factor))),
+                interpolation=cv2.INTER_AREA
+            )
+
+        return self.memoize(('resized', roi.to_tuple(), round(float(factor), 4), color_mode), compute)
+
+    def features(
+        self,
+        roi: Optional[Rect],
+        detector: str,
+        green_mask: bool,
+        compute: Callable[[np.ndarray], TemplateFeatures]
+    ) -> TemplateFeatures:
+        """ROI 的关键点和描述符
+
+        Args:
+            roi: 区域，None 表示整帧
+            detector: 检测器名称
+            green_mask: 是否使用绿色掩码
+            compute: 对 ROI 图像提取特征的函数
+        """
+        roi = self.clip(roi)
+        return self.memoize(
+            ('features', roi.to_tuple(), detector, bool(green_mask)),
+            lambda: compute(self.crop(roi))
+        )
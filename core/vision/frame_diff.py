@@ -0,0 +1,135 @@
+"""
+画面变化检测 - 画面未变化时复用上一次的识别结果
+
+等待类操作（wait_for_template、Pipeline 的 rate_limit 重试）在静态界面上
+会反复对几乎相同的画面做多尺度匹配。识别结果只取决于 ROI 内的像素，
+因此这里为每个 (节点, 识别参数, ROI) 保存 ROI 的缩略图和上一次的 RecoResult，
+下一次识别前先比较缩略图，未变化时直接返回缓存结果。
+
+变化检测使用降采样后的逐像素绝对差:
+- 先按 downscale 做 INTER_AREA 缩小（对整数倍缩放 OpenCV 走快速路径）
+- 取最大绝对差，任意一块区域变化超过 tolerance 即视为画面已变化
+  （用最大值而不是平均值，避免一个小图标出现被大面积静态背景平均掉）
+- 缩略图保留 BGR 三个通道，取各通道差的最大值: 转灰度后亮度相近的不同颜色
+  （如红色 (0,0,255) 与绿色 (0,128,0) 灰度为 76 / 75）会被当作未变化，ColorMatch 会返回过时的结果
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Optional, Tuple
+import numpy as np
+
+try:
+    import cv2
+    CV_AVAILABLE = True
+except ImportError:
+    CV_AVAILABLE = False
+
+from .types import Rect, RecoResult
+
+
+class RecoResultCache:
+    """按 ROI 画面变化缓存识别结果
+
+    示例:
+        >>> cache = RecoResultCache()
+        >>> key = ("node", ("button.png",), (0, 0, 200, 100))
+        >>> result, cached = cache.get_or_compute(key, image, roi, lambda: matcher.analyze())
+    """
+
+    def __init__(self, downscale: int = 4, tolerance: int = 8, max_entries: int = 64):
+        """
+        Args:
+            downscale: 缩略图的降采样倍数
+            tolerance: 缩略图最大绝对差不超过该值时视为画面未变化 (0-255)
+            max_entries: 最多缓存的条目数（LRU 淘汰）
+        """
+        self.downscale = max(1, int(downscale))
+        self.tolerance = tolerance
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[Hashable, Tuple[np.ndarray, RecoResult]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def signature(self, image: np.ndarray, roi: Optional[Rect] = None) -> np.ndarray:
+        """计算 ROI 区域的缩略图"""
+        img_h, img_w = image.shape[:2]
+        if roi:
+            x1 = min(max(roi.x, 0), img_w)
+            y1 = min(max(roi.y, 0), img_h)
+            x2 = min(max(roi.x + roi.width, 0), img_w)
+            y2 = min(max(roi.y + roi.height, 0), img_h)
+            image = image[y1:y2, x1:x2]
+
+        h, w = image.shape[:2]
+        if h == 0 or w == 0:
+            return np.zeros((0, 0), dtype=np.uint8)
+
+        d = self.downscale
+        if d > 1 and h >= d and w >= d:
+            return cv2.resize(image, (w // d, h // d), interpolation=cv2.INTER_AREA)
+        # 未缩放时复制，避免缓存引用调用方的帧缓冲
+        return image.copy()
+
+    def is_same(self, a: np.ndarray, b: np.ndarray) -> bool:
+        """判断两张缩略图是否视为相同画面（多通道时取各通道差的最大值）"""
+        if a.shape != b.shape:
+            return False
+        if a.size == 0:
+            return True
+        return int(cv2.absdiff(a, b).max()) <= self.tolerance
+
+    def get_or_compute(
+        self,
+        key: Hashable,
+        image: np.ndarray,
+        roi: Optional[Rect],
+        compute: Callable[[], RecoResult]
+    ) -> Tuple[RecoResult, bool]:
+        """ROI 画面未变化时返回缓存结果，否则调用 compute 识别并缓存
+
+        Args:
+            key: 缓存键，应包含节点名、识别参数（模板集合等）和 ROI
+            image: 当前画面 (BGR)
+            roi: 识别区域，None 表示全图
+            compute: 实际执行识别的函数
+
+        Returns:
+            (识别结果, 是否来自缓存)
+        """
+        sig = self.signature(image, roi)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.is_same(entry[0], sig):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1], True
+            self.misses += 1
+
+        result = compute()
+
+        with self._lock:
+            self._entries[key] = (sig, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return result, False
+
+    def invalidate(self, key: Optional[Hashable] = None):
+        """使缓存失效，key 为 None 时清空全部"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self) -> Dict[str, int]:
+        """缓存统计信息"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+            }
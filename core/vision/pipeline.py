@@ -12,22 +12,32 @@
 import time
 import json
 from dataclasses import dataclass, field
-from typing import Dict, List, Optional, Any, Callable, Union
+from types import MappingProxyType
+from typing import Dict, Iterable, List, Optional, Any, Callable, Mapping, Sequence, Set, Tuple, Union
 from pathlib import Path
 from enum import Enum, auto
 import numpy as np
 
 try:
-    import cv2
     import pyautogui
     CV_AVAILABLE = True
 except ImportError:
     CV_AVAILABLE = False
 
 from .types import Rect, RecoResult, MatchResult, Point, OrderBy
-from .template_matcher import TemplateMatcher, TemplateMatcherParam
+from .template_matcher import TemplateMatcher, TemplateMatcherParam, ColorMode
+from .template_cache import TemplateEntry, get_template_cache
 from .color_matcher import ColorMatcher, ColorMatcherParam
-from .feature_matcher import FeatureMatcher, FeatureMatcherParam, FeatureDetector
+from .frame import Frame
+from .feature_matcher import FeatureMatcher, FeatureMatcherParam, FeatureDetector, build_feature_index
+from .debug_writer import DebugImageWriter
+from .capture import CaptureBackend, get_capture_backend
+from .frame_diff import RecoResultCache
+from .roi_history import LocationHistory
+
+
+# 调试截图目录（项目根目录下的 log）
+LOG_DIR = Path(__file__).resolve().parent.parent.parent / 'log'
 
 
 class RecognitionType(Enum):
@@ -49,6 +59,46 @@ class ActionType(Enum):
     WAIT = auto()            # 等待
 
 
+# JSON 中的名称 -> 枚举
+RECOGNITION_TYPES: Dict[str, RecognitionType] = {
+    'DirectHit': RecognitionType.DIRECT_HIT,
+    'TemplateMatch': RecognitionType.TEMPLATE_MATCH,
+    'FeatureMatch': RecognitionType.FEATURE_MATCH,
+    'ColorMatch': RecognitionType.COLOR_MATCH,
+}
+
+ACTION_TYPES: Dict[str, ActionType] = {
+    'DoNothing': ActionType.DO_NOTHING,
+    'Click': ActionType.CLICK,
+    'LongPress': ActionType.LONG_PRESS,
+    'Swipe': ActionType.SWIPE,
+    'InputText': ActionType.INPUT_TEXT,
+    'Wait': ActionType.WAIT,
+}
+
+ORDER_BY_TYPES: Dict[str, OrderBy] = {
+    'Horizontal': OrderBy.HORIZONTAL,
+    'Vertical': OrderBy.VERTICAL,
+    'Score': OrderBy.SCORE,
+    'Area': OrderBy.AREA,
+    'Random': OrderBy.RANDOM,
+}
+
+COLOR_MODE_TYPES: Dict[str, ColorMode] = {
+    'color': ColorMode.COLOR,
+    'gray': ColorMode.GRAY,
+    'auto': ColorMode.AUTO,
+}
+
+DETECTOR_TYPES: Dict[str, FeatureDetector] = {
+    'SIFT': FeatureDetector.SIFT,
+    'ORB': FeatureDetector.ORB,
+    'BRISK': FeatureDetector.BRISK,
+    'KAZE': FeatureDetector.KAZE,
+    'AKAZE': FeatureDetector.AKAZE,
+}
+
+
 @dataclass
 class PipelineNode:
     """流水线节点
@@ -88,29 +138,13 @@ class PipelineNode:
     @classmethod
     def from_dict(cls, name: str, data: Dict[str, Any]) -> 'PipelineNode':
         """从字典创建节点"""
-        # 解析识别类型
-        reco_type = RecognitionType.DIRECT_HIT
-        reco_str = data.get('recognition', 'DirectHit')
-        if reco_str == 'TemplateMatch':
-            reco_type = RecognitionType.TEMPLATE_MATCH
-        elif reco_str == 'FeatureMatch':
-            reco_type = RecognitionType.FEATURE_MATCH
-        elif reco_str == 'ColorMatch':
-            reco_type = RecognitionType.COLOR_MATCH
-        
-        # 解析动作类型
-        action_type = ActionType.DO_NOTHING
-        action_str = data.get('action', 'DoNothing')
-        if action_str == 'Click':
-            action_type = ActionType.CLICK
-        elif action_str == 'LongPress':
-            action_type = ActionType.LONG_PRESS
-        elif action_str == 'Swipe':
-            action_type = ActionType.SWIPE
-        elif action_str == 'InputText':
-            action_type = ActionType.INPUT_TEXT
-        elif action_str == 'Wait':
-            action_type = ActionType.WAIT
+        # 解析识别类型和动作类型（未知名称按默认值处理，由 compile_pipeline 报告）
+        reco_type = RECOGNITION_TYPES.get(
+            data.get('recognition', 'DirectHit'), RecognitionType.DIRECT_HIT
+        )
+        action_type = ACTION_TYPES.get(
+            data.get('action', 'DoNothing'), ActionType.DO_NOTHING
+        )
         
         # 提取识别参数
         reco_param = {}
@@ -123,7 +157,13 @@ class PipelineNode:
                 'multi_scale': data.get('multi_scale', True),
                 'scale_range': data.get('scale_range', [0.5, 1.5]),
                 'scale_step': data.get('scale_step', 0.1),
+                'adaptive_scale': data.get('adaptive_scale', False),
+                'pyramid': data.get('pyramid', False),
+                'pyramid_factor': data.get('pyramid_factor', 0.5),
+                'pyramid_top_k': data.get('pyramid_top_k', 5),
+                'max_workers': data.get('max_workers'),  # None 表示使用 Pipeline 默认值
                 'order_by': data.get('order_by', 'Score'),  # 默认按分数排序
+                'color_mode': data.get('color_mode', 'color'),
             }
         elif reco_type == RecognitionType.FEATURE_MATCH:
             reco_param = {
@@ -132,6 +172,7 @@ class PipelineNode:
                 'ratio': data.get('ratio', 0.75),
                 'count': data.get('count', 10),
                 'green_mask': data.get('green_mask', False),
+                'max_instances': data.get('max_instances', 1),
             }
         elif reco_type == RecognitionType.COLOR_MATCH:
             reco_param = {
@@ -186,6 +227,370 @@ class PipelineNode:
         )
 
 
+class PipelineCompileError(ValueError):
+    """Pipeline 配置校验失败"""
+
+    def __init__(self, errors: List[str]):
+        self.errors = list(errors)
+        super().__init__("Pipeline 配置错误:\n" + "\n".join(f"- {e}" for e in self.errors))
+
+
+@dataclass(frozen=True)
+class CompiledNode:
+    """编译后的节点（不可变）
+    
+    识别参数已转换为对应的 *MatcherParam，模板路径已解析并预加载，
+    枚举已解析，运行时不再做任何配置解析。
+    """
+    name: str
+    index: int                          # 在配置中的序号（从 1 开始，用于调试截图文件名）
+    recognition: RecognitionType
+    matcher_param: Any                  # Template/Feature/ColorMatcherParam，DirectHit 为 None
+    roi: Optional[Rect]
+    action: ActionType
+    action_param: Mapping[str, Any]
+    next: Tuple[str, ...]
+    timeout: int
+    rate_limit: int
+    pre_delay: int
+    post_delay: int
+    inverse: bool
+    enabled: bool
+    cache_key: Tuple[Any, ...]          # 识别结果缓存键 (节点名, 识别参数, ROI, 模板文件 (路径, mtime))
+    
+    @property
+    def needs_frame(self) -> bool:
+        """识别是否需要画面（指定了 ROI 的 DirectHit 不需要）"""
+        return not (self.recognition == RecognitionType.DIRECT_HIT and self.roi)
+
+
+@dataclass(frozen=True)
+class CompiledPipeline:
+    """编译后的 Pipeline（不可变、已校验的节点图）
+    
+    errors 为会导致节点无法正常识别或跳转的配置错误，
+    warnings 为不可达节点等不影响执行的问题。
+    """
+    nodes: Mapping[str, CompiledNode] = field(default_factory=lambda: MappingProxyType({}))
+    errors: Tuple[str, ...] = ()
+    warnings: Tuple[str, ...] = ()
+    
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+    
+    def reachable(self, entries: Sequence[str]) -> Set[str]:
+        """从入口节点出发沿 next 可达的节点集合"""
+        seen: Set[str] = set()
+        stack = [name for name in entries if name in self.nodes]
+        while stack:
+            name = stack.pop()
+            if name in seen:
+                continue
+            seen.add(name)
+            stack.extend(n for n in self.nodes[name].next if n in self.nodes and n not in seen)
+        return seen
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'ok': self.ok,
+            'errors': list(self.errors),
+            'warnings': list(self.warnings),
+            'nodes': list(self.nodes.keys()),
+        }
+
+
+def compile_pipeline(
+    config: Dict[str, Any],
+    resource_dir: Optional[Union[str, Path]] = None,
+    max_workers: int = 0,
+    entries: Optional[Sequence[str]] = None,
+    feature_index: bool = False
+) -> CompiledPipeline:
+    """将 Pipeline JSON 配置编译为不可变的节点图
+    
+    - 解析识别/动作/排序/检测器名称为枚举，未知名称报告为错误
+    - 补全模板路径并通过模板缓存预加载，文件不存在或无法解码报告为错误
+    - 构建各节点的 *MatcherParam
+    - 检查 next 中引用的节点是否存在，报告从入口不可达的节点
+    - feature_index 为 True 时，为全部 FeatureMatch 节点的模板构建共享的 FLANN 索引
+    
+    Args:
+        config: Pipeline 配置字典（$ 开头的字段会被跳过）
+        resource_dir: 资源目录，用于补全模板相对路径
+        max_workers: 模板匹配默认线程数（节点未配置 max_workers 时使用）
+        entries: 入口节点列表，None 表示以没有被任何节点引用的节点为入口
+        feature_index: 是否为特征匹配节点构建共享索引（同一检测器/掩码设置的模板共用一个索引）
+    """
+    resource_dir = Path(resource_dir) if resource_dir else None
+    errors: List[str] = []
+    warnings: List[str] = []
+    nodes: Dict[str, CompiledNode] = {}
+    
+    names = [name for name in config if not name.startswith('$')]
+    for index, name in enumerate(names, 1):
+        data = config[name]
+        if not isinstance(data, dict):
+            errors.append(f"节点 {name}: 配置必须是对象")
+            continue
+        nodes[name] = _compile_node(name, data, index, resource_dir, max_workers, errors)
+    
+    # 检查 next 引用
+    for node in nodes.values():
+        for next_name in node.next:
+            target = nodes.get(next_name)
+            if target is None:
+                errors.append(f"节点 {node.name}: next 引用了不存在的节点 {next_name}")
+            elif not target.enabled:
+                warnings.append(f"节点 {node.name}: next 中的节点 {next_name} 未启用，运行时会跳过")
+    
+    if feature_index:
+        _attach_feature_indexes(nodes.values(), warnings)
+    
+    compiled = CompiledPipeline(nodes=MappingProxyType(nodes))
+    
+    # 检查不可达节点
+    if entries is None:
+        referenced = {n for node in nodes.values() for n in node.next if n != node.name}
+        entries = [name for name in nodes if name not in referenced] or list(nodes)[:1]
+    else:
+        for entry in entries:
+            if entry not in nodes:
+                errors.append(f"入口节点不存在: {entry}")
+    reachable = compiled.reachable(entries)
+    for name in nodes:
+        if name not in reachable:
+            warnings.append(f"节点 {name}: 从入口 {', '.join(entries)} 不可达")
+    
+    return CompiledPipeline(
+        nodes=compiled.nodes,
+        errors=tuple(errors),
+        warnings=tuple(warnings)
+    )
+
+
+def _attach_feature_indexes(nodes: Iterable[CompiledNode], warnings: List[str]):
+    """按 (检测器, green_mask) 分组，为 FeatureMatch 节点的模板构建共享索引"""
+    groups: Dict[Tuple[FeatureDetector, bool], List[FeatureMatcherParam]] = {}
+    for node in nodes:
+        if node.recognition == RecognitionType.FEATURE_MATCH and node.matcher_param is not None:
+            param = node.matcher_param
+            groups.setdefault((param.detector, param.green_mask), []).append(param)
+    
+    for (detector, green_mask), params in groups.items():
+        templates = [t for param in params for t in param.templates]
+        try:
+            index = build_feature_index(templates, detector, green_mask)
+        except Exception as e:
+            warnings.append(f"{detector.name} 特征索引构建失败，改为逐模板匹配: {e}")
+            continue
+        for param in params:
+            param.index = index
+
+
+def _compile_node(
+    name: str,
+    data: Dict[str, Any],
+    index: int,
+    resource_dir: Optional[Path],
+    max_workers: int,
+    errors: List[str]
+) -> CompiledNode:
+    """编译单个节点，错误追加到 errors"""
+    prefix = f"节点 {name}"
+    node = PipelineNode.from_dict(name, data)
+    
+    reco_str = data.get('recognition', 'DirectHit')
+    if reco_str not in RECOGNITION_TYPES:
+        errors.append(f"{prefix}: 未知的识别类型 {reco_str}")
+    action_str = data.get('action', 'DoNothing')
+    if action_str not in ACTION_TYPES:
+        errors.append(f"{prefix}: 未知的动作类型 {action_str}")
+    
+    roi = None
+    if node.roi:
+        try:
+            roi = Rect.from_list([int(v) for v in node.roi])
+        except (TypeError, ValueError):
+            errors.append(f"{prefix}: roi 必须是 [x, y, width, height]")
+        else:
+            if not roi.is_valid():
+                errors.append(f"{prefix}: roi 的宽高必须大于 0")
+    
+    matcher_param = None
+    try:
+        if node.recognition == RecognitionType.TEMPLATE_MATCH:
+            matcher_param = _compile_template_param(node, resource_dir, max_workers, prefix, errors)
+        elif node.recognition == RecognitionType.FEATURE_MATCH:
+            matcher_param = _compile_feature_param(node, resource_dir, prefix, errors)
+        elif node.recognition == RecognitionType.COLOR_MATCH:
+            matcher_param = _compile_color_param(node, prefix, errors)
+    except (TypeError, ValueError) as e:
+        errors.append(f"{prefix}: 识别参数类型错误: {e}")
+    
+    return CompiledNode(
+        name=name,
+        index=index,
+        recognition=node.recognition,
+        matcher_param=matcher_param,
+        roi=roi,
+        action=node.action,
+        action_param=MappingProxyType(dict(node.action_param)),
+        next=tuple(node.next),
+        timeout=int(node.timeout),
+        rate_limit=int(node.rate_limit),
+        pre_delay=int(node.pre_delay),
+        post_delay=int(node.post_delay),
+        inverse=bool(node.inverse),
+        enabled=bool(node.enabled),
+        cache_key=(
+            name,
+            json.dumps(node.recognition_param, sort_keys=True, default=str),
+            roi.to_tuple() if roi else None,
+            # 模板文件被替换后不再复用旧模板的识别结果
+            tuple(entry.key for entry in getattr(matcher_param, 'templates', None) or ()),
+        ),
+    )
+
+
+def _resolve_templates(
+    templates: Union[str, List[str]],
+    resource_dir: Optional[Path],
+    prefix: str,
+    errors: List[str]
+) -> List[Tuple[int, TemplateEntry]]:
+    """补全模板路径并预加载，返回 (配置中的序号, 模板) 列表"""
+    if isinstance(templates, str):
+        templates = [templates]
+    if not templates:
+        errors.append(f"{prefix}: 未配置模板")
+    
+    cache = get_template_cache()
+    loaded = []
+    for i, t in enumerate(templates):
+        path = Path(t)
+        if resource_dir and not path.is_absolute():
+            path = resource_dir / path
+        entry = cache.get(path)
+        if entry is None:
+            errors.append(f"{prefix}: 模板文件不存在或无法读取: {path}")
+            continue
+        loaded.append((i, entry))
+    return loaded
+
+
+def _compile_template_param(
+    node: PipelineNode,
+    resource_dir: Optional[Path],
+    max_workers: int,
+    prefix: str,
+    errors: List[str]
+) -> TemplateMatcherParam:
+    param = node.recognition_param
+    
+    thresholds = param.get('threshold', [0.7])
+    if isinstance(thresholds, (int, float)):
+        thresholds = [thresholds]
+    thresholds = [float(t) for t in thresholds] or [0.7]
+    
+    # 阈值与模板按配置中的序号对应，跳过加载失败的模板时不会错位
+    loaded = _resolve_templates(param.get('template', []), resource_dir, prefix, errors)
+    templates = [entry for _, entry in loaded]
+    if loaded:
+        thresholds = [thresholds[min(i, len(thresholds) - 1)] for i, _ in loaded]
+    
+    order_by_str = param.get('order_by', 'Score')
+    if order_by_str not in ORDER_BY_TYPES:
+        errors.append(f"{prefix}: 未知的排序方式 {order_by_str}")
+    
+    color_mode_str = str(param.get('color_mode', 'color')).lower()
+    if color_mode_str not in COLOR_MODE_TYPES:
+        errors.append(f"{prefix}: 未知的颜色模式 {color_mode_str}")
+    
+    # 并行线程数: 节点未配置时使用 Pipeline 级默认值
+    node_workers = param.get('max_workers')
+    
+    return TemplateMatcherParam(
+        templates=templates,
+        thresholds=thresholds,
+        method=int(param.get('method', 5)),
+        green_mask=bool(param.get('green_mask', False)),
+        color_mode=COLOR_MODE_TYPES.get(color_mode_str, ColorMode.COLOR),
+        multi_scale=bool(param.get('multi_scale', True)),
+        scale_range=[float(v) for v in param.get('scale_range', [0.5, 1.5])],
+        scale_step=float(param.get('scale_step', 0.1)),
+        adaptive_scale=bool(param.get('adaptive_scale', False)),
+        pyramid=bool(param.get('pyramid', False)),
+        pyramid_factor=float(param.get('pyramid_factor', 0.5)),
+        pyramid_top_k=int(param.get('pyramid_top_k', 5)),
+        max_workers=int(max_workers if node_workers is None else node_workers),
+        order_by=ORDER_BY_TYPES.get(order_by_str, OrderBy.SCORE),
+    )
+
+
+def _compile_feature_param(
+    node: PipelineNode,
+    resource_dir: Optional[Path],
+    prefix: str,
+    errors: List[str]
+) -> FeatureMatcherParam:
+    param = node.recognition_param
+    
+    loaded = _resolve_templates(param.get('template', []), resource_dir, prefix, errors)
+    
+    detector_str = str(param.get('detector', 'AKAZE')).upper()
+    if detector_str not in DETECTOR_TYPES:
+        errors.append(f"{prefix}: 未知的特征检测器 {detector_str}")
+    
+    return FeatureMatcherParam(
+        templates=[entry for _, entry in loaded],
+        detector=DETECTOR_TYPES.get(detector_str, FeatureDetector.AKAZE),
+        ratio=float(param.get('ratio', 0.75)),
+        count=int(param.get('count', 10)),
+        green_mask=bool(param.get('green_mask', False)),
+        max_instances=int(param.get('max_instances', 1)),
+    )
+
+
+def _compile_color_param(
+    node: PipelineNode,
+    prefix: str,
+    errors: List[str]
+) -> ColorMatcherParam:
+    param = node.recognition_param
+    
+    lower = param.get('lower', [])
+    upper = param.get('upper', [])
+    
+    # 支持多组颜色范围
+    if lower and isinstance(lower[0], int):
+        ranges = [(lower, upper)]
+    else:
+        ranges = list(zip(lower, upper))
+        if len(lower) != len(upper):
+            errors.append(f"{prefix}: lower 和 upper 的颜色范围组数不一致")
+    
+    if not ranges:
+        errors.append(f"{prefix}: 未配置颜色范围 lower/upper")
+    for lo, up in ranges:
+        if len(lo) != len(up):
+            errors.append(f"{prefix}: 颜色范围 {lo} / {up} 的通道数不一致")
+    
+    compiled = ColorMatcherParam(
+        ranges=[([int(v) for v in lo], [int(v) for v in up]) for lo, up in ranges],
+        method=int(param.get('method', 4)),
+        count=int(param.get('count', 1)),
+        connected=bool(param.get('connected', False)),
+    )
+    
+    # 预先编译颜色分类器，运行时不再构建查找表
+    try:
+        compiled.classifier()
+    except ValueError as e:
+        errors.append(f"{prefix}: {e}")
+    return compiled
+
+
 @dataclass
 class PipelineResult:
     """流水线执行结果"""
@@ -197,6 +602,8 @@ class PipelineResult:
     error: Optional[str] = None
     cost_ms: float = 0.0
     logs: List[str] = field(default_factory=list)
+    # 每次识别尝试的记录: node / attempt / success / capture_ms / cost_ms / cached / narrowed / elapsed_ms
+    attempts: List[Dict[str, Any]] = field(default_factory=list)
     
     def to_dict(self) -> Dict[str, Any]:
         return {
@@ -208,6 +615,7 @@ class PipelineResult:
             'error': self.error,
             'cost_ms': self.cost_ms,
             'logs': self.logs,
+            'attempts': self.attempts,
         }
 
 
@@ -239,36 +647,99 @@ class Pipeline:
     def __init__(
         self,
         screen_capture_func: Optional[Callable[[], np.ndarray]] = None,
-        resource_dir: Optional[str] = None
+        resource_dir: Optional[str] = None,
+        max_workers: int = 0,
+        save_debug_images: bool = True,
+        capture_backend: Optional[CaptureBackend] = None,
+        feature_index: bool = False,
+        location_history: Optional[LocationHistory] = None,
+        adaptive_roi: bool = False
     ):
         """
         Args:
-            screen_capture_func: 屏幕截图函数，返回 BGR 格式的 numpy 数组
+            screen_capture_func: 屏幕截图函数，返回 BGR 格式的 numpy 数组（优先于 capture_backend）
             resource_dir: 资源目录（模板图片等）
+            max_workers: 模板匹配默认线程数，<= 1 表示串行（节点可用 max_workers 覆盖）
+            save_debug_images: 是否将每个节点的调试截图保存到 log 目录
+            capture_backend: 截图后端，None 表示使用进程级默认后端（支持只截取 ROI）
+            feature_index: 加载时为全部 FeatureMatch 模板构建共享的 FLANN 索引，识别时画面描述符只查询一次
+            location_history: 节点命中位置历史，命中时记录位置（需加载时提供 Pipeline 名称）
+            adaptive_roi: 未配置 roi 的节点先在历史命中位置附近识别，未命中再扩大到全屏
         """
-        self._nodes: Dict[str, PipelineNode] = {}
+        self._compiled = CompiledPipeline()
+        self._screen_capture_func = screen_capture_func
         self._screen_capture = screen_capture_func or self._default_screen_capture
+        self._capture_backend = capture_backend
         self._resource_dir = Path(resource_dir) if resource_dir else None
+        self._max_workers = max_workers
+        self._feature_index = feature_index
+        self._location_history = location_history
+        self._adaptive_roi = adaptive_roi
+        self._name: Optional[str] = None
+        self._save_debug_images = save_debug_images
+        self._debug_writer: Optional[DebugImageWriter] = None
         self._running = False
         self._last_reco_results: Dict[str, RecoResult] = {}
+        # ROI 画面未变化时复用上一次的识别结果
+        self._reco_cache = RecoResultCache()
         self._logs: List[str] = []
     
+    def _get_capture_backend(self) -> CaptureBackend:
+        if self._capture_backend is None:
+            self._capture_backend = get_capture_backend()
+        return self._capture_backend
+    
     def _default_screen_capture(self) -> np.ndarray:
-        """默认屏幕截图"""
-        if not CV_AVAILABLE:
-            raise ImportError("OpenCV and pyautogui required")
-        screenshot = pyautogui.screenshot()
-        return cv2.cvtColor(np.array(screenshot), cv2.COLOR_RGB2BGR)
-    
-    def load_from_dict(self, config: Dict[str, Any]):
-        """从字典加载配置"""
-        self._nodes.clear()
-        for name, data in config.items():
-            if not name.startswith('$'):  # 跳过 $ 开头的字段
-                node = PipelineNode.from_dict(name, data)
-                self._nodes[name] = node
-    
-    def load_from_json(self, json_path: str):
+        """默认屏幕截图（全屏）"""
+        return self._get_capture_backend().grab()
+    
+    def _capture_frame(self, nodes: List[CompiledNode]) -> np.ndarray:
+        """截取本 tick 识别所需的画面
+        
+        所有需要画面的节点都指定了 ROI 时，只截取 ROI 的并集，
+        返回的画面坐标与全屏一致；自定义截图函数总是截全屏。
+        """
+        if self._screen_capture_func is not None:
+            return self._screen_capture_func()
+        
+        rois: Optional[List[Rect]] = []
+        for node in nodes:
+            if not node.needs_frame:
+                continue
+            if not node.roi:
+                rois = None
+                break
+            rois.append(node.roi)
+        return self._get_capture_backend().grab_rois(rois)
+    
+    @property
+    def compiled(self) -> CompiledPipeline:
+        """当前加载的编译结果"""
+        return self._compiled
+    
+    def load_from_dict(self, config: Dict[str, Any], strict: bool = False, name: Optional[str] = None):
+        """从字典加载配置
+        
+        配置在加载时编译（见 compile_pipeline），运行时只使用编译结果。
+        
+        Args:
+            config: Pipeline 配置
+            strict: 为 True 时配置有错误则抛出 PipelineCompileError，
+                    否则错误和警告会在运行时写入日志
+            name: Pipeline 名称（节点位置历史的键），None 表示不记录位置历史
+        """
+        compiled = compile_pipeline(
+            config,
+            self._resource_dir,
+            self._max_workers,
+            feature_index=self._feature_index
+        )
+        if strict and compiled.errors:
+            raise PipelineCompileError(list(compiled.errors))
+        self._compiled = compiled
+        self._name = name
+    
+    def load_from_json(self, json_path: str, strict: bool = False):
         """从 JSON 文件加载配置"""
         path = Path(json_path)
         if not path.exists():
@@ -277,87 +748,67 @@ class Pipeline:
         with open(path, 'r', encoding='utf-8') as f:
             config = json.load(f)
         
-        self.load_from_dict(config)
+        self.load_from_dict(config, strict=strict, name=str(path.resolve()))
+    
+    def load_compiled(self, compiled: CompiledPipeline, name: Optional[str] = None):
+        """直接加载编译结果（多个 Pipeline 可共享同一份编译结果）"""
+        self._compiled = compiled
+        self._name = name
     
-    def run(self, entry: str) -> PipelineResult:
+    def run(self, entry: str, save_debug_images: Optional[bool] = None) -> PipelineResult:
         """运行流水线
         
         Args:
             entry: 入口节点名
+            save_debug_images: 是否保存每个节点的调试截图，None 表示使用构造时的设置
             
         Returns:
             执行结果
         """
 
-        # 清空 log 文件夹
-        import os, shutil
-        log_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'log')
-        if os.path.exists(log_dir):
-            for f in os.listdir(log_dir):
-                fp = os.path.join(log_dir, f)
-                try:
-                    if os.path.isfile(fp):
-                        os.remove(fp)
-                except Exception:
-                    pass
+        if save_debug_images is None:
+            save_debug_images = self._save_debug_images
 
         start_time = time.perf_counter()
-        self._running = True
-        self._logs = []
-
         result = PipelineResult(entry=entry)
 
-        if entry not in self._nodes:
+        nodes = self._compiled.nodes
+        if entry not in nodes:
             result.error = f"Entry node not found: {entry}"
             result.cost_ms = (time.perf_counter() - start_time) * 1000
             return result
-        
+
+        if save_debug_images:
+            # 清空 log 文件夹
+            if LOG_DIR.exists():
+                for fp in LOG_DIR.iterdir():
+                    try:
+                        if fp.is_file():
+                            fp.unlink()
+                    except Exception:
+                        pass
+            self._debug_writer = DebugImageWriter()
+
+        self._running = True
+        self._logs = []
+        self._reco_cache.invalidate()
+        for error in self._compiled.errors:
+            self._log(f"配置错误: {error}")
+        for warning in self._compiled.warnings:
+            self._log(f"配置警告: {warning}")
 
         try:
-            current_node = entry
-            # 截图文件名用节点名
-            while self._running and current_node:
-                node = self._nodes.get(current_node)
-                if not node or not node.enabled:
+            candidates = [entry] if nodes[entry].enabled else []
+            while self._running and candidates:
+                # 按 rate_limit 节奏反复识别候选节点，直到命中或超时
+                hit = self._wait_for_candidates(candidates, result)
+                if hit is None:
+                    if self._running:
+                        self._log(f"节点 {', '.join(candidates)} 识别超时")
                     break
-                self._log(f"执行节点: {current_node}")
-                # 执行识别
-                reco_result = self._recognize(node)
-                self._last_reco_results[current_node] = reco_result
-                result.last_reco_result = reco_result
-                # 检查识别结果
-                success = reco_result.success
-                if node.inverse:
-                    success = not success
-                # 识别失败也截图，文件名加_fail
-                import cv2, pyautogui, os, re
-                img = pyautogui.screenshot()
-                img = cv2.cvtColor(np.array(img), cv2.COLOR_RGB2BGR)
-                if reco_result.box:
-                    box = reco_result.box
-                    cv2.rectangle(img, (box.x, box.y), (box.x + box.width, box.y + box.height), (0,0,255), 3)
-                log_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'log')
-                os.makedirs(log_dir, exist_ok=True)
-                idx = list(self._nodes.keys()).index(str(current_node)) + 1
-                # 文件名加_fail后缀表示失败
-                if not success:
-                    save_path = os.path.join(log_dir, f"node_{idx}_fail.png")
-                else:
-                    save_path = os.path.join(log_dir, f"node_{idx}.png")
-                try:
-                    cv2.imwrite(save_path, img)
-                except Exception as e:
-                    self._log(f"截图保存失败: {e}")
-                if not success:
-                    # 识别失败，尝试下一个 next 节点
-                    next_node = self._find_next_node(node)
-                    if next_node:
-                        current_node = next_node
-                        continue
-                    else:
-                        # 超时处理
-                        self._log(f"节点 {current_node} 识别超时")
-                        break
+                
+                current_node, reco_result = hit
+                node = nodes[current_node]
                 self._log(f"识别成功，分数: {reco_result.score:.3f}")
                 result.executed_nodes.append(current_node)
                 result.last_node = current_node
@@ -368,21 +819,150 @@ class Pipeline:
                 # 动作后延迟
                 if node.post_delay > 0:
                     time.sleep(node.post_delay / 1000)
-                # 进入下一个节点
-                if node.next:
-                    current_node = node.next[0]  # 简化：取第一个
-                else:
-                    current_node = None
+                # 进入下一组候选节点
+                candidates = self._next_candidates(node)
             result.success = len(result.executed_nodes) > 0
         except Exception as e:
             result.error = str(e)
             self._log(f"执行错误: {e}")
         finally:
             self._running = False
+            if self._debug_writer:
+                self._debug_writer.close()
+                self._debug_writer = None
+            if self._location_history is not None:
+                self._location_history.flush()
             result.cost_ms = (time.perf_counter() - start_time) * 1000
             result.logs = self._logs.copy()
         return result
     
+    def _wait_for_candidates(
+        self,
+        candidates: List[str],
+        result: PipelineResult
+    ) -> Optional[Tuple[str, RecoResult]]:
+        """重试识别循环
+        
+        每个 tick 只截图一次，所有候选节点在同一帧上按 next 顺序识别，
+        命中第一个即返回（参考 MAA 的做法）；
+        未命中则按候选节点中最小的 rate_limit 等待下一个 tick。
+        每个候选节点在超过自己的 timeout 后不再参与识别。
+        时间统一使用单调时钟 (perf_counter)。
+        
+        Returns:
+            (命中的节点名, 识别结果)，全部超时或被停止时返回 None
+        """
+        start = time.perf_counter()
+        nodes = [self._compiled.nodes[name] for name in candidates]
+        last_results: Dict[str, Tuple[RecoResult, Optional[np.ndarray]]] = {}
+        attempt = 0
+        
+        while self._running:
+            tick_start = time.perf_counter()
+            elapsed_ms = (tick_start - start) * 1000
+            active = [n for n in nodes if attempt == 0 or elapsed_ms < n.timeout]
+            if not active:
+                break
+            attempt += 1
+            
+            # 本 tick 共享的画面（仅在有节点需要识别时截图），
+            # 各节点的颜色转换、金字塔层和特征提取结果在 Frame 上复用
+            frame: Optional[Frame] = None
+            capture_ms = 0.0
+            
+            for node in active:
+                # DirectHit 且指定了 ROI 时无需画面
+                if frame is None and node.needs_frame:
+                    capture_start = time.perf_counter()
+                    frame = Frame(self._capture_frame(active), timestamp=capture_start)
+                    capture_ms = (time.perf_counter() - capture_start) * 1000
+                
+                self._log(f"执行节点: {node.name} (第 {attempt} 次识别)")
+                reco_start = time.perf_counter()
+                search_roi = self._history_roi(node, frame)
+                reco_result, cached = self._recognize_cached(node, frame, search_roi)
+                narrowed = search_roi is not None and reco_result.success
+                if search_roi is not None and not reco_result.success:
+                    # 历史位置附近未命中，扩大到全屏
+                    reco_result, cached = self._recognize_cached(node, frame)
+                reco_ms = (time.perf_counter() - reco_start) * 1000
+                
+                self._last_reco_results[node.name] = reco_result
+                result.last_reco_result = reco_result
+                last_results[node.name] = (reco_result, frame.image if frame else None)
+                
+                # 检查识别结果
+                success = reco_result.success
+                if node.inverse:
+                    success = not success
+                
+                result.attempts.append({
+                    'node': node.name,
+                    'attempt': attempt,
+                    'success': success,
+                    'capture_ms': capture_ms,
+                    'cost_ms': reco_ms,
+                    'cached': cached,
+                    'narrowed': narrowed,
+                    'elapsed_ms': (time.perf_counter() - start) * 1000,
+                })
+                self._log(
+                    f"识别{'命中' if success else '未命中'}: {node.name}, 耗时 {reco_ms:.1f}ms"
+                    + ("（画面未变化，复用上次结果）" if cached else "")
+                    + ("（历史位置附近命中）" if narrowed else "")
+                )
+                
+                if success:
+                    self._record_location(node, reco_result, frame)
+                    self._save_debug_screenshot(node.name, reco_result, True, frame.image if frame else None)
+                    return node.name, reco_result
+            
+            # 按 rate_limit 节奏等待下一次识别
+            rate_limit = min(n.rate_limit for n in active)
+            next_tick = tick_start + rate_limit / 1000
+            deadline = start + max(n.timeout for n in active) / 1000
+            if next_tick >= deadline:
+                break
+            self._sleep_until(next_tick)
+        
+        # 识别失败也截图，文件名加_fail
+        for name, (reco_result, frame) in last_results.items():
+            self._save_debug_screenshot(name, reco_result, False, frame)
+        return None
+    
+    def _sleep_until(self, target: float):
+        """精确休眠到单调时钟的 target 时刻（可被 stop 打断）"""
+        while self._running:
+            remaining = target - time.perf_counter()
+            if remaining <= 0:
+                return
+            # 大段时间交给 sleep，最后 1ms 自旋以减少调度误差
+            if remaining > 0.002:
+                time.sleep(min(remaining - 0.001, 0.05))
+    
+    def _save_debug_screenshot(
+        self,
+        node_name: str,
+        reco_result: RecoResult,
+        success: bool,
+        frame: Optional[np.ndarray]
+    ):
+        """保存节点识别结果的调试截图
+        
+        直接使用识别时的画面标注识别框，由后台线程编码写盘。
+        未截图的节点（如指定了 ROI 的 DirectHit）不保存。
+        """
+        if self._debug_writer is None or frame is None:
+            return
+        idx = self._compiled.nodes[node_name].index
+        # 文件名加_fail后缀表示失败
+        if not success:
+            save_path = LOG_DIR / f"node_{idx}_fail.png"
+        else:
+            save_path = LOG_DIR / f"node_{idx}.png"
+        if not self._debug_writer.submit(str(save_path), frame, reco_result.box):
+            self._log(f"截图队列已满，丢弃: {save_path.name}")
+    
     def stop(self):
         """停止流水线"""
         self._running = False
@@ -394,171 +974,104 @@ class Pipeline:
         self._logs.append(log)
         print(log)  # 也输出到控制台
     
-    def _recognize(self, node: PipelineNode) -> RecoResult:
-        """执行识别"""
-        # 截图
-        image = self._screen_capture()
+    def _history_roi(self, node: CompiledNode, frame: Optional[Frame]) -> Optional[Rect]:
+        """adaptive_roi 模式下节点的历史搜索区域
         
-        # 构建 ROI
-        roi = None
-        if node.roi:
-            roi = Rect.from_list(node.roi)
+        只用于未配置 roi 的普通识别节点（inverse 节点要确认目标不在全屏任何位置，不收窄）
+        """
+        if (not self._adaptive_roi or self._location_history is None or self._name is None
+                or frame is None or node.roi or node.inverse
+                or node.recognition == RecognitionType.DIRECT_HIT):
+            return None
+        return self._location_history.search_roi(self._name, node.name, frame.width, frame.height)
+    
+    def _record_location(self, node: CompiledNode, reco_result: RecoResult, frame: Optional[Frame]):
+        """记录节点的命中位置"""
+        if (self._location_history is None or self._name is None or frame is None
+                or node.inverse or node.recognition == RecognitionType.DIRECT_HIT
+                or reco_result.best_result is None):
+            return
+        self._location_history.record(
+            self._name, node.name, reco_result.best_result.box, frame.width, frame.height
+        )
+    
+    def location_report(self, min_hits: int = LocationHistory.REPORT_MIN_HITS) -> List[Dict[str, Any]]:
+        """当前 Pipeline 各节点的建议 ROI（见 LocationHistory.report），已配置 roi 的节点附带 current_roi"""
+        if self._location_history is None or self._name is None:
+            return []
+        report = self._location_history.report(self._name, min_hits)
+        for item in report:
+            node = self._compiled.nodes.get(item['node'])
+            item['current_roi'] = node.roi.to_list() if node and node.roi else None
+        return report
+    
+    def _recognize(
+        self,
+        node: CompiledNode,
+        image: Optional[Union[np.ndarray, Frame]] = None,
+        roi: Optional[Rect] = None
+    ) -> RecoResult:
+        """执行识别
+        
+        节点的识别参数已在编译时构建，这里只创建识别器并分析。
+        
+        Args:
+            node: 要识别的节点
+            image: 已截取的画面或 Frame，None 时重新截图
+            roi: 覆盖节点 roi 的搜索区域（adaptive_roi 的历史区域）
+        """
+        # 截图（DirectHit 且指定了 ROI 时无需画面）
+        if image is None and node.needs_frame:
+            image = self._screen_capture()
         
         # 根据类型执行识别
         if node.recognition == RecognitionType.DIRECT_HIT:
             # 直接命中
             result = RecoResult(algorithm="DirectHit")
             result.best_result = MatchResult(
-                box=roi or Rect(0, 0, image.shape[1], image.shape[0]),
+                box=node.roi or Rect(0, 0, image.shape[1], image.shape[0]),
                 score=1.0
             )
             return result
         
-        elif node.recognition == RecognitionType.TEMPLATE_MATCH:
-            return self._template_match(image, node, roi)
+        if node.matcher_param is None:
+            # 识别参数编译失败（错误已在运行开始时写入日志）
+            return RecoResult(algorithm="Invalid")
         
+        roi = roi or node.roi
+        if node.recognition == RecognitionType.TEMPLATE_MATCH:
+            matcher = TemplateMatcher(image, node.matcher_param, roi, name=node.name)
         elif node.recognition == RecognitionType.FEATURE_MATCH:
-            return self._feature_match(image, node, roi)
-        
+            matcher = FeatureMatcher(image, node.matcher_param, roi, name=node.name)
         elif node.recognition == RecognitionType.COLOR_MATCH:
-            return self._color_match(image, node, roi)
-        
+            matcher = ColorMatcher(image, node.matcher_param, roi, name=node.name)
         else:
             return RecoResult(algorithm="Unknown")
-    
-    def _template_match(
-        self, 
-        image: np.ndarray, 
-        node: PipelineNode,
-        roi: Optional[Rect]
-    ) -> RecoResult:
-        """模板匹配 (支持多尺度)"""
-        param = node.recognition_param
-        
-        # 处理模板路径
-        templates = param.get('template', [])
-        if isinstance(templates, str):
-            templates = [templates]
-        
-        # 如果设置了资源目录，补全路径
-        if self._resource_dir:
-            templates = [
-                str(self._resource_dir / t) if not Path(t).is_absolute() else t
-                for t in templates
-            ]
-        
-        # 验证模板文件是否存在
-        for t in templates:
-            if not Path(t).exists():
-                self._log(f"警告: 模板文件不存在: {t}")
-        
-        # 处理阈值
-        thresholds = param.get('threshold', [0.7])
-        if isinstance(thresholds, (int, float)):
-            thresholds = [thresholds]
-        
-        # 解析排序方式
-        order_by_str = param.get('order_by', 'Score')
-        order_by_map = {
-            'Horizontal': OrderBy.HORIZONTAL,
-            'Vertical': OrderBy.VERTICAL,
-            'Score': OrderBy.SCORE,
-            'Area': OrderBy.AREA,
-            'Random': OrderBy.RANDOM,
-        }
-        order_by = order_by_map.get(order_by_str, OrderBy.SCORE)
-        
-        matcher_param = TemplateMatcherParam(
-            templates=templates,
-            thresholds=thresholds,
-            method=param.get('method', 5),
-            green_mask=param.get('green_mask', False),
-            multi_scale=param.get('multi_scale', True),
-            scale_range=param.get('scale_range', [0.5, 1.5]),
-            scale_step=param.get('scale_step', 0.1),
-            order_by=order_by,
-        )
-        
-        matcher = TemplateMatcher(image, matcher_param, roi, name=node.name)
-        return matcher.analyze()
-    
-    def _feature_match(
-        self,
-        image: np.ndarray,
-        node: PipelineNode,
-        roi: Optional[Rect]
-    ) -> RecoResult:
-        """特征匹配 (抗透视/旋转)"""
-        param = node.recognition_param
-        
-        # 处理模板路径
-        templates = param.get('template', [])
-        if isinstance(templates, str):
-            templates = [templates]
-        
-        # 如果设置了资源目录，补全路径
-        if self._resource_dir:
-            templates = [
-                str(self._resource_dir / t) if not Path(t).is_absolute() else t
-                for t in templates
-            ]
-        
-        # 验证模板文件是否存在
-        for t in templates:
-            if not Path(t).exists():
-                self._log(f"警告: 模板文件不存在: {t}")
-        
-        # 解析检测器类型
-        detector_str = param.get('detector', 'AKAZE')
-        detector_map = {
-            'SIFT': FeatureDetector.SIFT,
-            'ORB': FeatureDetector.ORB,
-            'BRISK': FeatureDetector.BRISK,
-            'KAZE': FeatureDetector.KAZE,
-            'AKAZE': FeatureDetector.AKAZE,
-        }
-        detector = detector_map.get(detector_str.upper(), FeatureDetector.AKAZE)
-        
-        matcher_param = FeatureMatcherParam(
-            templates=templates,
-            detector=detector,
-            ratio=param.get('ratio', 0.75),
-            count=param.get('count', 10),
-            green_mask=param.get('green_mask', False),
-        )
-        
-        matcher = FeatureMatcher(image, matcher_param, roi, name=node.name)
         return matcher.analyze()
     
-    def _color_match(
+    def _recognize_cached(
         self,
-        image: np.ndarray,
-        node: PipelineNode,
-        roi: Optional[Rect]
-    ) -> RecoResult:
-        """颜色匹配"""
-        param = node.recognition_param
+        node: CompiledNode,
+        frame: Optional[Frame],
+        roi: Optional[Rect] = None
+    ) -> Tuple[RecoResult, bool]:
+        """执行识别，节点 ROI 内画面与上次识别时相同则复用上次结果
         
-        lower = param.get('lower', [])
-        upper = param.get('upper', [])
+        Args:
+            roi: 覆盖节点 roi 的搜索区域，None 表示使用节点配置
         
-        # 支持多组颜色范围
-        if lower and isinstance(lower[0], int):
-            ranges = [(lower, upper)]
-        else:
-            ranges = list(zip(lower, upper))
+        Returns:
+            (识别结果, 是否来自缓存)
+        """
+        if frame is None or node.recognition == RecognitionType.DIRECT_HIT:
+            return self._recognize(node, frame, roi), False
         
-        matcher_param = ColorMatcherParam(
-            ranges=ranges,
-            method=param.get('method', 4),
-            count=param.get('count', 1),
-            connected=param.get('connected', False),
+        key = node.cache_key if roi is None else node.cache_key + (roi.to_tuple(),)
+        return self._reco_cache.get_or_compute(
+            key, frame.image, roi or node.roi, lambda: self._recognize(node, frame, roi)
         )
-        
-        matcher = ColorMatcher(image, matcher_param, roi, name=node.name)
-        return matcher.analyze()
     
-    def _execute_action(self, node: PipelineNode, reco_result: RecoResult):
+    def _execute_action(self, node: CompiledNode, reco_result: RecoResult):
         """执行动作"""
         if node.action == ActionType.DO_NOTHING:
             return
@@ -579,7 +1092,7 @@ class Pipeline:
     def _get_click_point(
         self, 
         reco_result: RecoResult, 
-        param: Dict[str, Any]
+        param: Mapping[str, Any]
     ) -> Point:
         """获取点击点"""
         target = param.get('target', True)
@@ -602,13 +1115,13 @@ class Pipeline:
             # 默认屏幕中心
             return Point(x=960 + offset[0], y=540 + offset[1])
     
-    def _action_click(self, reco_result: RecoResult, param: Dict[str, Any]):
+    def _action_click(self, reco_result: RecoResult, param: Mapping[str, Any]):
         """点击动作"""
         point = self._get_click_point(reco_result, param)
         self._log(f"点击: ({point.x}, {point.y})")
         pyautogui.click(point.x, point.y)
     
-    def _action_long_press(self, reco_result: RecoResult, param: Dict[str, Any]):
+    def _action_long_press(self, reco_result: RecoResult, param: Mapping[str, Any]):
         """长按动作"""
         point = self._get_click_point(reco_result, param)
         duration = param.get('duration', 1000) / 1000
@@ -617,7 +1130,7 @@ class Pipeline:
         time.sleep(duration)
         pyautogui.mouseUp()
     
-    def _action_swipe(self, reco_result: RecoResult, param: Dict[str, Any]):
+    def _action_swipe(self, reco_result: RecoResult, param: Mapping[str, Any]):
         """滑动动作"""
         # 起点
         begin = param.get('begin', True)
@@ -642,23 +1155,26 @@ class Pipeline:
             duration=duration
         )
     
-    def _action_input_text(self, param: Dict[str, Any]):
+    def _action_input_text(self, param: Mapping[str, Any]):
         """输入文本"""
         text = param.get('input_text', '')
         self._log(f"输入: {text}")
         pyautogui.write(text)
     
-    def _action_wait(self, param: Dict[str, Any]):
+    def _action_wait(self, param: Mapping[str, Any]):
         """等待"""
         duration = param.get('duration', 1000) / 1000
         self._log(f"等待: {duration}s")
         time.sleep(duration)
     
-    def _find_next_node(self, node: PipelineNode) -> Optional[str]:
-        """查找下一个可执行的节点"""
+    def _next_candidates(self, node: CompiledNode) -> List[str]:
+        """获取节点的后续候选节点（按 next 顺序，跳过不存在和未启用的节点）"""
+        candidates = []
         for next_name in node.next:
-            next_node = self._nodes.get(next_name)
+            next_node = self._compiled.nodes.get(next_name)
             if next_node and next_node.enabled:
-                return next_name
-        return None
+                candidates.append(next_name)
+            else:
+                self._log(f"跳过节点: {next_name} (不存在或未启用)")
+        return candidates
 
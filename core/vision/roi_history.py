@@ -0,0 +1,221 @@
+"""
+ROI 自动收窄 - 根据节点的历史命中位置缩小搜索区域
+
+Pipeline 节点经常不配置 roi（全屏搜索），因为编写时并不知道控件在屏幕上的位置。
+而 matchTemplate 的耗时与搜索面积成正比，缩小搜索区域是最有效的加速手段。
+
+LocationHistory 按 (Pipeline, 节点) 记录历次命中框:
+- 命中次数、全部命中框的外接矩形、最近一次命中框、截图尺寸
+- 存储后端可选（TestDatabase 实现了 get_node_locations / save_node_locations，
+  与测试历史保存在同一个数据库中），运行中只更新内存，Pipeline 结束时一次写入
+- search_roi: 外接矩形按比例外扩后的搜索区域，Pipeline 启用 adaptive_roi 时先在该区域内识别，
+  未命中再扩大到全屏
+- report: 各节点的建议 ROI，可直接写回 Pipeline 配置
+"""
+
+import threading
+from dataclasses import dataclass, fields
+from typing import Any, Dict, List, Optional, Tuple
+
+from .types import Rect
+from .capture import clip_rect
+
+
+@dataclass
+class NodeLocationStats:
+    """单个节点的历史命中位置统计（字段与 core.database.NodeLocation 一致）"""
+    pipeline: str
+    node: str
+    hits: int = 0
+    frame_width: int = 0
+    frame_height: int = 0
+    min_x: int = 0
+    min_y: int = 0
+    max_x: int = 0
+    max_y: int = 0
+    last_x: int = 0
+    last_y: int = 0
+    last_width: int = 0
+    last_height: int = 0
+
+    @classmethod
+    def from_record(cls, record: Any) -> 'NodeLocationStats':
+        """从存储后端的记录（具有同名属性的对象）创建"""
+        return cls(**{f.name: getattr(record, f.name) for f in fields(cls)})
+
+    def observe(self, box: Rect, frame_width: int, frame_height: int):
+        """记录一次命中，截图尺寸变化（分辨率/缩放改变）时重新统计"""
+        if (frame_width, frame_height) != (self.frame_width, self.frame_height):
+            self.hits = 0
+            self.frame_width, self.frame_height = frame_width, frame_height
+        x2, y2 = box.x + box.width, box.y + box.height
+        if self.hits == 0:
+            self.min_x, self.min_y, self.max_x, self.max_y = box.x, box.y, x2, y2
+        else:
+            self.min_x, self.min_y = min(self.min_x, box.x), min(self.min_y, box.y)
+            self.max_x, self.max_y = max(self.max_x, x2), max(self.max_y, y2)
+        self.last_x, self.last_y, self.last_width, self.last_height = box.to_tuple()
+        self.hits += 1
+
+    def bounds(self) -> Rect:
+        """全部命中框的外接矩形"""
+        return Rect(self.min_x, self.min_y, self.max_x - self.min_x, self.max_y - self.min_y)
+
+    def last_box(self) -> Rect:
+        """最近一次命中框"""
+        return Rect(self.last_x, self.last_y, self.last_width, self.last_height)
+
+    def padded_bounds(self, padding_ratio: float, min_padding: int) -> Rect:
+        """外接矩形按自身尺寸的 padding_ratio 外扩（至少 min_padding 像素），并裁剪到截图范围内"""
+        bounds = self.bounds()
+        pad_x = max(min_padding, int(bounds.width * padding_ratio))
+        pad_y = max(min_padding, int(bounds.height * padding_ratio))
+        return clip_rect(
+            Rect(bounds.x - pad_x, bounds.y - pad_y, bounds.width + 2 * pad_x, bounds.height + 2 * pad_y),
+            self.frame_width, self.frame_height
+        )
+
+
+class LocationHistory:
+    """Pipeline 节点命中位置历史
+
+    示例:
+        >>> history = LocationHistory(TestDatabase())
+        >>> history.record("login.json", "登录按钮", box, 1920, 1080)
+        >>> history.search_roi("login.json", "登录按钮", 1920, 1080)
+        Rect(x=..., y=..., width=..., height=...)
+        >>> history.flush()
+    """
+
+    # 外接矩形外扩比例（相对外接矩形尺寸）和最小外扩像素
+    PADDING_RATIO = 0.5
+    MIN_PADDING = 32
+
+    # 生成建议 ROI 所需的最少命中次数（自适应搜索命中一次即可使用，失败会回退到全屏）
+    REPORT_MIN_HITS = 3
+
+    def __init__(
+        self,
+        store: Any = None,
+        padding_ratio: float = PADDING_RATIO,
+        min_padding: int = MIN_PADDING
+    ):
+        """
+        Args:
+            store: 持久化后端，需提供 get_node_locations(pipeline) 和 save_node_locations(records)，
+                   None 表示只保存在内存中
+            padding_ratio: 外接矩形外扩比例
+            min_padding: 最小外扩像素
+        """
+        self.store = store
+        self.padding_ratio = padding_ratio
+        self.min_padding = min_padding
+        self._pipelines: Dict[str, Dict[str, NodeLocationStats]] = {}
+        self._dirty: Dict[Tuple[str, str], NodeLocationStats] = {}
+        self._lock = threading.Lock()
+
+    def _nodes(self, pipeline: str) -> Dict[str, NodeLocationStats]:
+        """加载（首次）并返回 Pipeline 的节点统计，调用方需持有锁"""
+        nodes = self._pipelines.get(pipeline)
+        if nodes is not None:
+            return nodes
+        nodes = self._pipelines[pipeline] = {}
+        if self.store is not None:
+            try:
+                for record in self.store.get_node_locations(pipeline):
+                    stats = NodeLocationStats.from_record(record)
+                    nodes[stats.node] = stats
+            except Exception as e:
+                print(f"[LocationHistory] 读取节点位置统计失败: {pipeline}: {e}")
+        return nodes
+
+    def get(self, pipeline: str, node: str) -> Optional[NodeLocationStats]:
+        """获取节点的位置统计，没有记录时返回 None"""
+        with self._lock:
+            return self._nodes(pipeline).get(node)
+
+    def record(self, pipeline: str, node: str, box: Rect, frame_width: int, frame_height: int):
+        """记录节点的一次命中（只更新内存，flush 时写入存储）"""
+        if not box:
+            return
+        with self._lock:
+            nodes = self._nodes(pipeline)
+            stats = nodes.get(node)
+            if stats is None:
+                stats = nodes[node] = NodeLocationStats(pipeline=pipeline, node=node)
+            stats.observe(box, frame_width, frame_height)
+            self._dirty[(pipeline, node)] = stats
+
+    def search_roi(self, pipeline: str, node: str, frame_width: int, frame_height: int) -> Optional[Rect]:
+        """节点的自适应搜索区域
+
+        Returns:
+            外扩后的历史外接矩形；没有命中记录或截图尺寸与记录不同时返回 None
+        """
+        stats = self.get(pipeline, node)
+        if stats is None or stats.hits == 0:
+            return None
+        if (stats.frame_width, stats.frame_height) != (frame_width, frame_height):
+            return None
+        roi = stats.padded_bounds(self.padding_ratio, self.min_padding)
+        return roi or None
+
+    def flush(self):
+        """将运行中更新的统计一次写入存储（单个事务）"""
+        with self._lock:
+            dirty = list(self._dirty.values())
+            self._dirty = {}
+        if self.store is None or not dirty:
+            return
+        try:
+            self.store.save_node_locations(dirty)
+        except Exception as e:
+            print(f"[LocationHistory] 保存节点位置统计失败: {e}")
+
+    def forget(self, pipeline: str, node: Optional[str] = None):
+        """清除节点（node 为 None 时为整个 Pipeline）的统计，界面布局变化后使用"""
+        with self._lock:
+            nodes = self._nodes(pipeline)
+            names = list(nodes) if node is None else [node]
+            for name in names:
+                nodes.pop(name, None)
+                self._dirty.pop((pipeline, name), None)
+        if self.store is not None and hasattr(self.store, 'delete_node_locations'):
+            try:
+                self.store.delete_node_locations(pipeline, node)
+            except Exception as e:
+                print(f"[LocationHistory] 删除节点位置统计失败: {e}")
+
+    def report(self, pipeline: str, min_hits: int = REPORT_MIN_HITS) -> List[Dict[str, Any]]:
+        """各节点的建议 ROI
+
+        Args:
+            pipeline: Pipeline 标识
+            min_hits: 命中次数少于该值的节点不给出建议
+
+        Returns:
+            [{node, hits, frame, bounds, last, suggested_roi, area_ratio}, ...]，
+            area_ratio 为建议 ROI 占整个截图的面积比例；按节点名排序
+        """
+        with self._lock:
+            nodes = sorted(self._nodes(pipeline).values(), key=lambda s: s.node)
+
+        report = []
+        for stats in nodes:
+            suggested = None
+            area_ratio = None
+            if stats.hits >= min_hits:
+                roi = stats.padded_bounds(self.padding_ratio, self.min_padding)
+                suggested = roi.to_list()
+                frame_area = stats.frame_width * stats.frame_height
+                area_ratio = round(roi.area() / frame_area, 4) if frame_area else None
+            report.append({
+                'node': stats.node,
+                'hits': stats.hits,
+                'frame': [stats.frame_width, stats.frame_height],
+                'bounds': stats.bounds().to_list(),
+                'last': stats.last_box().to_list(),
+                'suggested_roi': suggested,
+                'area_ratio': area_ratio,
+            })
+        return report
@@ -0,0 +1,101 @@
+"""
+尺度先验 - 记录每个模板上次命中的缩放比例
+
+同一个应用在同一台显示器上的 DPI 缩放是固定的，多尺度匹配却每次都遍历 scale_range 中的全部尺度。
+ScalePriorStore 按模板路径记录最近一次命中的尺度，并持久化到磁盘:
+TemplateMatcher 启用 adaptive_scale 时先只在该尺度上匹配，通过阈值即提前结束，
+未通过时才回退到完整的多尺度搜索。
+"""
+
+import json
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+
+# 默认持久化文件（项目根目录下的 cache/scale_priors.json）
+DEFAULT_PRIOR_PATH = Path(__file__).resolve().parent.parent.parent / 'cache' / 'scale_priors.json'
+
+
+class ScalePriorStore:
+    """模板尺度先验存储
+
+    示例:
+        >>> store = get_scale_prior_store()
+        >>> store.record("/path/to/button.png", 1.25)
+        >>> store.get("/path/to/button.png")
+        1.25
+    """
+
+    def __init__(self, path: Optional[Union[str, Path]] = None):
+        """
+        Args:
+            path: JSON 持久化文件，None 表示只保存在内存中
+        """
+        self.path = Path(path) if path else None
+        self._priors: Dict[str, float] = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        if self.path is None or not self.path.exists():
+            return
+        try:
+            data = json.loads(self.path.read_text(encoding='utf-8'))
+            self._priors = {str(k): float(v) for k, v in data.items()}
+        except Exception as e:
+            print(f"[ScalePriorStore] 读取尺度先验失败: {self.path}: {e}")
+
+    def get(self, key: str) -> Optional[float]:
+        """获取模板的尺度先验，没有记录时返回 None"""
+        with self._lock:
+            self._ensure_loaded()
+            return self._priors.get(key)
+
+    def record(self, key: str, scale: float):
+        """记录模板命中的尺度（与已有记录相同时不写盘）"""
+        scale = round(float(scale), 4)
+        with self._lock:
+            self._ensure_loaded()
+            if self._priors.get(key) == scale:
+                return
+            self._priors[key] = scale
+            self._save()
+
+    def forget(self, key: Optional[str] = None):
+        """删除模板的尺度先验，key 为 None 时清空全部"""
+        with self._lock:
+            self._ensure_loaded()
+            if key is None:
+                self._priors.clear()
+            else:
+                self._priors.pop(key, None)
+            self._save()
+
+    def to_dict(self) -> Dict[str, float]:
+        with self._lock:
+            self._ensure_loaded()
+            return dict(self._priors)
+
+    def _save(self):
+        if self.path is None:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # 先写临时文件再替换，避免并发读到写了一半的文件
+            tmp = self.path.with_name(self.path.name + f".{threading.get_ident()}.tmp")
+            tmp.write_text(json.dumps(self._priors, ensure_ascii=False, indent=2), encoding='utf-8')
+            tmp.replace(self.path)
+        except Exception as e:
+            print(f"[ScalePriorStore] 写入尺度先验失败: {self.path}: {e}")
+
+
+_shared_store = ScalePriorStore(DEFAULT_PRIOR_PATH)
+
+
+def get_scale_prior_store() -> ScalePriorStore:
+    """获取进程级共享的尺度先验存储"""
+    return _shared_store
@@ -0,0 +1,299 @@
+"""
+模板缓存 - 进程级共享的模板存储
+
+同一批图标在一次 Pipeline 运行中会被反复匹配，
+每次重新 imread 解码、重新 resize 各个尺度的开销不可忽略。
+
+本模块按 (路径, mtime) 缓存:
+- 解码后的模板图像
+- 各缩放比例下的模板（彩色和灰度）
+- 各缩放比例下的绿色掩码
+
+采用 LRU 淘汰策略，并限制缓存的总内存占用。
+"""
+
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+import numpy as np
+
+try:
+    import cv2
+    CV_AVAILABLE = True
+except ImportError:
+    CV_AVAILABLE = False
+
+
+# 默认内存预算 (256 MB)
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def create_green_mask(template: np.ndarray) -> Optional[np.ndarray]:
+    """创建绿色掩码
+
+    将模板中纯绿色 RGB(0, 255, 0) 的区域设为掩码（不参与匹配）
+    """
+    if len(template.shape) < 3 or template.shape[2] < 3:
+        return None
+
+    # BGR 格式中绿色是 (0, 255, 0)
+    green_lower = np.array([0, 250, 0])
+    green_upper = np.array([10, 255, 10])
+
+    # 找到绿色区域
+    green_mask = cv2.inRange(template, green_lower, green_upper)
+
+    # 反转（绿色区域为0，其他为255）
+    return cv2.bitwise_not(green_mask)
+
+
+def _scale_key(scale: float) -> float:
+    """缩放比例的缓存键
+
+    消除 np.arange 的浮点误差，避免 0.9999999 这类比例把模板缩小一个像素
+    """
+    return round(float(scale), 4)
+
+
+class TemplateEntry:
+    """单个模板的缓存条目
+
+    原图在创建时解码，各尺度的缩放图和掩码在首次使用时计算并保存。
+    """
+
+    def __init__(
+        self,
+        image: np.ndarray,
+        path: Optional[str] = None,
+        on_grow: Optional[Callable[['TemplateEntry', int], None]] = None
+    ):
+        """
+        Args:
+            image: 解码后的模板图像 (BGR)
+            path: 模板文件路径，内存模板为 None
+            on_grow: 条目占用内存增加时的回调（用于缓存统计预算）
+        """
+        self.image = image
+        self.path = path
+        self.key: Optional[Tuple[str, int]] = None
+        self.nbytes = image.nbytes
+        self._scaled: Dict[float, np.ndarray] = {}
+        self._scaled_gray: Dict[float, np.ndarray] = {}
+        self._masks: Dict[float, Optional[np.ndarray]] = {}
+        self._on_grow = on_grow
+        self._lock = threading.Lock()
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        return self.image.shape
+
+    def _grow(self, delta: int):
+        on_grow = self._on_grow
+        if on_grow:
+            on_grow(self, delta)
+        else:
+            self.nbytes += delta
+
+    def scaled(self, scale: float) -> np.ndarray:
+        """获取指定缩放比例的模板"""
+        key = _scale_key(scale)
+        if key == 1.0:
+            return self.image
+
+        cached = self._scaled.get(key)
+        if cached is not None:
+            return cached
+
+        new_w = max(1, int(self.image.shape[1] * key))
+        new_h = max(1, int(self.image.shape[0] * key))
+        resized = cv2.resize(self.image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+
+        with self._lock:
+            if key in self._scaled:
+                return self._scaled[key]
+            self._scaled[key] = resized
+        self._grow(resized.nbytes)
+        return resized
+
+    def scaled_gray(self, scale: float) -> np.ndarray:
+        """获取指定缩放比例模板的灰度图（由缩放后的彩色模板转换）"""
+        key = _scale_key(scale)
+        cached = self._scaled_gray.get(key)
+        if cached is not None:
+            return cached
+
+        scaled = self.scaled(scale)
+        gray = scaled if scaled.ndim == 2 else cv2.cvtColor(scaled, cv2.COLOR_BGR2GRAY)
+
+        with self._lock:
+            if key in self._scaled_gray:
+                return self._scaled_gray[key]
+            self._scaled_gray[key] = gray
+        self._grow(gray.nbytes if gray is not scaled else 0)
+        return gray
+
+    def mask(self, scale: float) -> Optional[np.ndarray]:
+        """获取指定缩放比例模板的绿色掩码"""
+        key = _scale_key(scale)
+        if key in self._masks:
+            return self._masks[key]
+
+        mask = create_green_mask(self.scaled(scale))
+
+        with self._lock:
+            if key in self._masks:
+                return self._masks[key]
+            self._masks[key] = mask
+        self._grow(mask.nbytes if mask is not None else 0)
+        return mask
+
+    def pyramid(
+        self,
+        scales: Sequence[float],
+        green_mask: bool = False
+    ) -> List[Tuple[float, np.ndarray, Optional[np.ndarray]]]:
+        """获取全部尺度的 (scale, 模板, 掩码) 列表"""
+        return [
+            (scale, self.scaled(scale), self.mask(scale) if green_mask else None)
+            for scale in scales
+        ]
+
+
+class TemplateCache:
+    """进程级模板缓存
+
+    示例:
+        >>> cache = get_template_cache()
+        >>> entry = cache.get("button.png")
+        >>> for scale, tmpl, mask in entry.pyramid([0.9, 1.0, 1.1]):
+        ...     ...
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        """
+        Args:
+            max_bytes: 缓存占用内存上限（字节）
+        """
+        self._entries: 'OrderedDict[Tuple[str, int], TemplateEntry]' = OrderedDict()
+        self._max_bytes = max_bytes
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def max_bytes(self) -> int:
+        return self._max_bytes
+
+    @max_bytes.setter
+    def max_bytes(self, value: int):
+        with self._lock:
+            self._max_bytes = value
+            self._evict()
+
+    @property
+    def total_bytes(self) -> int:
+        return self._bytes
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, path: Union[str, Path]) -> Optional[TemplateEntry]:
+        """获取模板条目，未命中时从文件加载
+
+        文件修改后 (mtime 变化) 会重新加载。
+
+        Returns:
+            缓存条目，文件不存在或无法解码时返回 None
+        """
+        path = Path(path)
+        try:
+            mtime = path.stat().st_mtime_ns
+        except OSError:
+            return None
+
+        path_str = str(path.resolve())
+        key = (path_str, mtime)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+
+        img = cv2.imread(str(path), cv2.IMREAD_COLOR)
+        if img is None:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+
+            self.misses += 1
+
+            # 同一路径的旧版本已失效
+            for stale in [k for k in self._entries if k[0] == path_str]:
+                self._remove(stale)
+
+            entry = TemplateEntry(img, path=path_str, on_grow=self._on_grow)
+            entry.key = key
+            self._entries[key] = entry
+            self._bytes += entry.nbytes
+            self._evict(keep=key)
+            return entry
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            for entry in self._entries.values():
+                entry._on_grow = None
+            self._entries.clear()
+            self._bytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        """缓存统计信息"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self._max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+    def _on_grow(self, entry: TemplateEntry, delta: int):
+        with self._lock:
+            entry.nbytes += delta
+            if self._entries.get(entry.key) is not entry:
+                # 已被淘汰的条目不再计入预算
+                return
+            self._bytes += delta
+            self._evict(keep=entry.key)
+
+    def _remove(self, key: Tuple[str, int]):
+        entry = self._entries.pop(key)
+        entry._on_grow = None
+        self._bytes -= entry.nbytes
+
+    def _evict(self, keep: Optional[Tuple[str, int]] = None):
+        """按 LRU 顺序淘汰，直到满足内存预算"""
+        while self._bytes > self._max_bytes:
+            victim = next((k for k in self._entries if k != keep), None)
+            if victim is None:
+                break
+            self._remove(victim)
+
+
+_shared_cache = TemplateCache()
+
+
+def get_template_cache() -> TemplateCache:
+    """获取进程级共享的模板缓存"""
+    return _shared_cache
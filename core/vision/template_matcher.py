@@ -4,8 +4,11 @@
 """
 
 import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field
-from typing import List, Optional, Union
+from enum import Enum, auto
+from typing import Dict, List, Optional, Tuple, Union
 from pathlib import Path
 import numpy as np
 
@@ -17,6 +20,36 @@ except ImportError:
 
 from .types import Rect, RecoResult, MatchResult, OrderBy
 from .base import VisionBase
+from .frame import Frame
+from .template_cache import TemplateEntry, get_template_cache, create_green_mask
+from .scale_prior import ScalePriorStore, get_scale_prior_store
+
+
+# 按线程数共享的线程池，避免每次识别都创建线程
+_executors: Dict[int, ThreadPoolExecutor] = {}
+_executors_lock = threading.Lock()
+
+
+def _get_executor(max_workers: int) -> Optional[ThreadPoolExecutor]:
+    """获取指定大小的共享线程池，max_workers <= 1 时返回 None（串行）"""
+    if max_workers <= 1:
+        return None
+    with _executors_lock:
+        executor = _executors.get(max_workers)
+        if executor is None:
+            executor = ThreadPoolExecutor(
+                max_workers=max_workers,
+                thread_name_prefix="TemplateMatcher"
+            )
+            _executors[max_workers] = executor
+        return executor
+
+
+class ColorMode(Enum):
+    """模板匹配的颜色模式"""
+    COLOR = auto()   # 三通道彩色匹配
+    GRAY = auto()    # 灰度匹配（matchTemplate 耗时约为彩色的 1/3）
+    AUTO = auto()    # 灰度匹配，最终选中的结果再用彩色复核，排除亮度相同但颜色不同的误检
 
 
 @dataclass
@@ -25,8 +58,8 @@ class TemplateMatcherParam:
     
     参考 MAA 的 TemplateMatcherParam
     """
-    # 模板图片路径或numpy数组
-    templates: List[Union[str, np.ndarray]] = field(default_factory=list)
+    # 模板图片路径、numpy数组或预加载的模板缓存条目
+    templates: List[Union[str, np.ndarray, TemplateEntry]] = field(default_factory=list)
     
     # 匹配阈值 (0-1)，可以为每个模板设置不同阈值
     thresholds: List[float] = field(default_factory=lambda: [1])
@@ -37,6 +70,9 @@ class TemplateMatcherParam:
     # 绿色掩码（将模板中绿色部分排除匹配）
     green_mask: bool = False
     
+    # 颜色模式
+    color_mode: ColorMode = ColorMode.COLOR
+    
     # 结果排序方式
     order_by: OrderBy = OrderBy.HORIZONTAL
     
@@ -52,6 +88,29 @@ class TemplateMatcherParam:
     
     # 缩放步长
     scale_step: float = 0.1
+    
+    # 自适应尺度: 先在该模板上次命中的尺度上匹配，通过阈值即结束，否则再遍历其余尺度
+    adaptive_scale: bool = False
+    
+    # 尺度先验存储，None 表示使用进程级共享的存储（持久化到 cache/scale_priors.json）
+    scale_priors: Optional[ScalePriorStore] = None
+    
+    # ===== 金字塔搜索参数 =====
+    # 是否启用由粗到精的图像金字塔搜索
+    pyramid: bool = False
+    
+    # 粗匹配时图像和模板的缩小比例
+    pyramid_factor: float = 0.5
+    
+    # 粗匹配保留的峰值数量（在原分辨率下精修）
+    pyramid_top_k: int = 5
+    
+    # ===== 并行参数 =====
+    # 线程池大小，<= 1 表示串行；> 1 时将 (模板, 尺度) 任务并行执行
+    max_workers: int = 0
+    
+    # 是否使用进程级模板缓存（复用解码和缩放结果）
+    use_cache: bool = True
 
 
 class TemplateMatcher(VisionBase):
@@ -73,16 +132,32 @@ class TemplateMatcher(VisionBase):
     # 反转分数基数（用于 TM_SQDIFF 系列方法）
     METHOD_INVERT_BASE = 10000
     
+    # 金字塔搜索: 缩小后模板的最小边长，低于此值该尺度退化为全分辨率匹配
+    PYRAMID_MIN_TEMPLATE_SIZE = 8
+    
+    # 金字塔搜索: 精修窗口在粗匹配位置基础上额外扩展的像素
+    PYRAMID_REFINE_MARGIN = 4
+    
+    # 每个尺度保留的候选峰值数量
+    MAX_CANDIDATES = 50
+    
+    # 候选预过滤阈值（低分更优的方法为上限）
+    PRE_FILTER_THRESHOLD = 0.5
+    
+    # 局部极大值的抑制半径（占模板边长的比例）
+    # 同尺寸框的 IoU 达到 0.7 时中心偏移约为边长的 0.18，半径内的次峰本来也会被 NMS 去掉
+    PEAK_SUPPRESS_RATIO = 0.15
+    
     def __init__(
         self,
-        image: np.ndarray,
+        image: Union[np.ndarray, Frame],
         param: TemplateMatcherParam,
         roi: Optional[Rect] = None,
         name: str = "TemplateMatcher"
     ):
         super().__init__(image, roi, name)
         self._param = param
-        self._templates: List[np.ndarray] = []
+        self._templates: List[TemplateEntry] = []
         self._low_score_better = param.method in (
             cv2.TM_SQDIFF, 
             cv2.TM_SQDIFF_NORMED
@@ -98,18 +173,55 @@ class TemplateMatcher(VisionBase):
                 # 从文件加载
                 path = Path(tmpl)
                 if path.exists():
-                    img = cv2.imread(str(path), cv2.IMREAD_COLOR)
-                    if img is not None:
-                        self._templates.append(img)
-                        print(f"[TemplateMatcher] 模板加载成功: {path} ({img.shape[1]}x{img.shape[0]})")
+                    entry = self._load_template_file(path)
+                    if entry is not None:
+                        self._templates.append(entry)
+                        print(f"[TemplateMatcher] 模板加载成功: {path} ({entry.shape[1]}x{entry.shape[0]})")
                     else:
                         print(f"[TemplateMatcher] 模板加载失败 (无法读取): {path}")
                 else:
                     print(f"[TemplateMatcher] 模板文件不存在: {path}")
-            elif isinstance(tmpl, np.ndarray):
+            elif isinstance(tmpl, TemplateEntry):
                 self._templates.append(tmpl)
+            elif isinstance(tmpl, np.ndarray):
+                self._templates.append(TemplateEntry(tmpl))
                 print(f"[TemplateMatcher] 使用内存模板: {tmpl.shape[1]}x{tmpl.shape[0]}")
     
+    def _load_template_file(self, path: Path) -> Optional[TemplateEntry]:
+        """从文件加载模板（优先使用共享缓存）"""
+        if self._param.use_cache:
+            return get_template_cache().get(path)
+        img = cv2.imread(str(path), cv2.IMREAD_COLOR)
+        return TemplateEntry(img, path=str(path)) if img is not None else None
+    
+    def _scales(self) -> List[float]:
+        """计算多尺度匹配的缩放比例列表"""
+        if not self._param.multi_scale:
+            return [1.0]
+        return [
+            float(s) for s in np.arange(
+                self._param.scale_range[0],
+                self._param.scale_range[1] + self._param.scale_step,
+                self._param.scale_step
+            )
+        ]
+    
+    def _use_gray(self) -> bool:
+        """是否在灰度图上匹配"""
+        return self._param.color_mode != ColorMode.COLOR
+    
+    def _search_image(self) -> np.ndarray:
+        """匹配使用的 ROI 图像（灰度图由 Frame 缓存，同一帧上的节点共享）"""
+        if self._use_gray():
+            return self._frame.gray(self._roi)
+        return self.image_with_roi()
+    
+    def _template_image(self, template: TemplateEntry, scale: float) -> np.ndarray:
+        """匹配使用的缩放模板（灰度模式下为缓存的灰度模板）"""
+        if self._use_gray():
+            return template.scaled_gray(scale)
+        return template.scaled(scale)
+    
     def analyze(self) -> RecoResult:
         """执行模板匹配分析"""
         start_time = time.perf_counter()
@@ -123,11 +235,14 @@ class TemplateMatcher(VisionBase):
         
         all_results: List[MatchResult] = []
         filtered_results: List[MatchResult] = []
+        # 结果对应的模板序号（AUTO 模式彩色复核时使用）
+        sources: Dict[int, int] = {}
         
-        # 对每个模板执行匹配
-        for i, template in enumerate(self._templates):
+        # 对每个模板执行匹配（max_workers > 1 时在线程池中并行）
+        for i, matches in enumerate(self._match_all_templates()):
             threshold = self._get_threshold(i)
-            matches = self._template_match(template)
+            for match in matches:
+                sources[id(match)] = i
             
             # 调试: 输出匹配结果
             if matches:
@@ -149,11 +264,18 @@ class TemplateMatcher(VisionBase):
         all_results = self.sort_results(all_results, self._param.order_by)
         filtered_results = self.sort_results(filtered_results, self._param.order_by)
         
-        # 选择最佳结果
-        if filtered_results:
+        # 选择最佳结果（AUTO 模式下彩色复核未通过的结果被丢弃，依次复核下一个）
+        while filtered_results:
             idx = self.pythonic_index(len(filtered_results), self._param.result_index)
-            if idx is not None:
-                result.best_result = filtered_results[idx]
+            if idx is None:
+                break
+            candidate = filtered_results[idx]
+            if self._param.color_mode == ColorMode.AUTO and \
+                    not self._verify_color(candidate, sources.get(id(candidate), 0)):
+                filtered_results.pop(idx)
+                continue
+            result.best_result = candidate
+            break
         
         result.all_results = all_results
         result.filtered_results = filtered_results
@@ -170,160 +292,498 @@ class TemplateMatcher(VisionBase):
         
         return result
     
-    def _template_match(self, template: np.ndarray) -> List[MatchResult]:
-        """执行单个模板的匹配 (优化版本 - 参考 MAA 框架)
+    def _verify_color(self, match: MatchResult, template_index: int) -> bool:
+        """在彩色图上复核灰度匹配的结果
         
-        支持多尺度匹配: 当启用 multi_scale 时，会在不同缩放比例下进行匹配
+        只对结果框所在的窗口做一次 matchTemplate（结果为 1x1），使用同一阈值判断。
+        无法确定结果对应的尺度或画面不是彩色图时不做复核。
         """
-        image_roi = self.image_with_roi()
+        template = self._templates[template_index]
+        if self._image.ndim != 3 or template.image.ndim != 3:
+            return True
         
-        # 处理匹配方法
-        method = self._param.method
-        invert_score = False
-        if method >= self.METHOD_INVERT_BASE:
-            invert_score = True
-            method -= self.METHOD_INVERT_BASE
+        box = match.box
+        scale = self._scale_of(template, box)
+        if scale is None:
+            return True
+        scaled = template.scaled(scale)
         
-        all_results: List[MatchResult] = []
+        patch = self._image[box.y:box.y + box.height, box.x:box.x + box.width]
+        if patch.shape[:2] != scaled.shape[:2]:
+            return False
+        
+        mask = template.mask(scale) if self._param.green_mask else None
+        score = float(self._match(patch, scaled, mask)[0, 0])
+        threshold = self._get_threshold(template_index)
+        passed = bool(np.isfinite(score)) and self._check_threshold(score, threshold)
+        print(f"[TemplateMatcher] 彩色复核: 灰度分数={match.score:.4f}, 彩色分数={score:.4f}, 阈值={threshold}, 通过={passed}")
+        return passed
+    
+    def _scale_of(self, template: TemplateEntry, box: Rect) -> Optional[float]:
+        """根据结果框尺寸反推对应的缩放比例"""
+        for scale in self._scales():
+            scaled = template.scaled(scale)
+            if scaled.shape[1] == box.width and scaled.shape[0] == box.height:
+                return scale
+        return None
+    
+    def _prior_store(self) -> Optional[ScalePriorStore]:
+        """自适应尺度使用的先验存储，未启用时返回 None"""
+        if not (self._param.adaptive_scale and self._param.multi_scale):
+            return None
+        return self._param.scale_priors or get_scale_prior_store()
+    
+    @staticmethod
+    def _prior_key(template: TemplateEntry) -> Optional[str]:
+        """尺度先验的键（模板文件路径），内存模板不记录"""
+        if template.key:
+            return template.key[0]
+        return template.path
+    
+    def _prior_scale(self, template: TemplateEntry) -> Optional[float]:
+        """模板在 scale_range 内的尺度先验"""
+        store = self._prior_store()
+        key = self._prior_key(template)
+        if store is None or key is None:
+            return None
+        scale = store.get(key)
+        low, high = self._param.scale_range
+        if scale is None or not (low - 1e-6 <= scale <= high + 1e-6):
+            return None
+        return scale
+    
+    def _record_scale(self, index: int, best: Optional[MatchResult]):
+        """模板命中时记录命中尺度"""
+        store = self._prior_store()
+        template = self._templates[index]
+        key = self._prior_key(template)
+        if store is None or key is None or best is None:
+            return
+        if not self._check_threshold(best.score, self._get_threshold(index)):
+            return
+        scale = self._scale_of(template, best.box)
+        if scale is not None:
+            store.record(key, scale)
+    
+    def _match_all_templates(self) -> List[List[MatchResult]]:
+        """对全部模板执行匹配，按模板顺序返回各自的结果
+        
+        并行模式下将 (模板, 尺度) 任务分发到线程池（matchTemplate 会释放 GIL），
+        再按原顺序合并，结果与串行模式完全一致。
+        金字塔模式和自适应尺度模式以模板为单位并行。
+        """
+        executor = _get_executor(self._param.max_workers)
+        indices = range(len(self._templates))
+        if executor is None:
+            return [self._template_match(i) for i in indices]
+        
+        if self._param.pyramid or self._prior_store() is not None:
+            return list(executor.map(self._template_match, indices))
+        
+        image_roi = self._search_image()
+        scales = self._scales()
+        jobs = [(template, scale) for template in self._templates for scale in scales]
+        outputs = list(executor.map(
+            lambda job: self._search_scale(job[0], image_roi, job[1]), jobs
+        ))
+        
+        results = []
+        for i, template in enumerate(self._templates):
+            chunk = outputs[i * len(scales):(i + 1) * len(scales)]
+            boxes, scores, best = self._merge_scale_outputs(chunk)
+            results.append(self._finalize_matches(template, boxes, scores, best))
+        return results
+    
+    def _template_match(self, index: int) -> List[MatchResult]:
+        """执行单个模板的匹配 (优化版本 - 参考 MAA 框架)
+        
+        支持多尺度匹配: 当启用 multi_scale 时，会在不同缩放比例下进行匹配，
+        各尺度的缩放模板和掩码由 TemplateEntry 缓存复用。
+        启用 pyramid 时先在缩小的图像上粗匹配，再在原分辨率下精修。
+        启用 adaptive_scale 时先尝试尺度先验，通过阈值即不再遍历其余尺度。
+        """
+        template = self._templates[index]
+        image_roi = self._search_image()
         
         # ===== 多尺度匹配 =====
-        if self._param.multi_scale:
-            scales = np.arange(
-                self._param.scale_range[0],
-                self._param.scale_range[1] + self._param.scale_step,
-                self._param.scale_step
-            )
+        scales = self._scales()
+        
+        # 先尝试上次命中的尺度
+        prior_output = None
+        prior = self._prior_scale(template)
+        if prior is not None:
+            prior_output = self._search_scale(template, image_roi, prior)
+            best = prior_output[2] if prior_output else None
+            if best is not None and self._check_threshold(best.score, self._get_threshold(index)):
+                boxes, scores, _ = prior_output
+                return self._finalize_matches(template, boxes, scores, best)
+            scales = [s for s in scales if round(s, 4) != round(prior, 4)]
+        
+        if self._param.pyramid:
+            output = self._pyramid_search(template, image_roi, scales)
         else:
-            scales = [1.0]
-        
-        best_overall_score = 0.0 if not self._low_score_better else float('inf')
-        best_overall_result = None
-        
-        for scale in scales:
-            # 缩放模板
-            if scale != 1.0:
-                new_w = max(1, int(template.shape[1] * scale))
-                new_h = max(1, int(template.shape[0] * scale))
-                scaled_template = cv2.resize(template, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
-            else:
-                scaled_template = template
-            
-            h, w = scaled_template.shape[:2]
-            
-            # 检查尺寸
-            if h > image_roi.shape[0] or w > image_roi.shape[1]:
+            output = self._full_search(template, image_roi, scales)
+        boxes, scores, best_overall_result = self._merge_scale_outputs([prior_output, output])
+        
+        self._record_scale(index, best_overall_result)
+        return self._finalize_matches(template, boxes, scores, best_overall_result)
+    
+    def _finalize_matches(
+        self,
+        template: TemplateEntry,
+        boxes: np.ndarray,
+        scores: np.ndarray,
+        best_overall_result: Optional[MatchResult]
+    ) -> List[MatchResult]:
+        """补全占位结果并做 NMS，得到单个模板的最终结果"""
+        # 确保至少有一个结果 (参考 MAA: At least there is a result)
+        if len(scores) == 0 and best_overall_result:
+            return [best_overall_result]
+        elif len(scores) == 0:
+            # 即使失败也返回一个占位结果
+            h, w = template.shape[:2]
+            return [MatchResult(
+                box=Rect(x=self._roi.x, y=self._roi.y, width=w, height=h),
+                score=0.0
+            )]
+        
+        # NMS 去重 (参考 MAA 的 0.7 阈值)，仅对保留下来的候选构造 MatchResult
+        keep = self.nms_indices(boxes, scores, iou_threshold=0.7)
+        return self.to_match_results(boxes[keep], scores[keep])
+    
+    def _full_search(
+        self,
+        template: TemplateEntry,
+        image_roi: np.ndarray,
+        scales: List[float]
+    ) -> Tuple[np.ndarray, np.ndarray, Optional[MatchResult]]:
+        """在整个 ROI 上逐尺度全分辨率匹配"""
+        return self._merge_scale_outputs(
+            [self._search_scale(template, image_roi, scale) for scale in scales]
+        )
+    
+    def _search_scale(
+        self,
+        template: TemplateEntry,
+        image_roi: np.ndarray,
+        scale: float
+    ) -> Optional[Tuple[np.ndarray, np.ndarray, Optional[MatchResult]]]:
+        """在整个 ROI 上匹配单个尺度，模板大于 ROI 时返回 None"""
+        # 缩放模板（缓存复用）
+        scaled_template = self._template_image(template, scale)
+        h, w = scaled_template.shape[:2]
+        
+        # 检查尺寸
+        if h > image_roi.shape[0] or w > image_roi.shape[1]:
+            return None
+        
+        # 创建掩码（可选，缓存复用）
+        mask = template.mask(scale) if self._param.green_mask else None
+        
+        return self._match_scale(
+            image_roi, scaled_template, mask, self._roi.x, self._roi.y
+        )
+    
+    def _merge_scale_outputs(
+        self,
+        outputs: List[Optional[Tuple[np.ndarray, np.ndarray, Optional[MatchResult]]]]
+    ) -> Tuple[np.ndarray, np.ndarray, Optional[MatchResult]]:
+        """按尺度顺序合并各尺度的匹配输出"""
+        box_chunks: List[np.ndarray] = []
+        score_chunks: List[np.ndarray] = []
+        best_overall_result: Optional[MatchResult] = None
+        
+        for output in outputs:
+            if output is None:
                 continue
-            
-            # 创建掩码（可选）
-            mask = self._create_mask(scaled_template) if self._param.green_mask else None
-            
-            # 执行模板匹配
-            if mask is not None:
-                matched = cv2.matchTemplate(image_roi, scaled_template, method, mask=mask)
-            else:
-                matched = cv2.matchTemplate(image_roi, scaled_template, method)
-            
-            # 反转分数
-            if invert_score:
-                matched = 1.0 - matched
-            
-            # 使用 minMaxLoc 找最佳匹配点
-            min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(matched)
-            
-            if self._low_score_better:
-                best_score = float(min_val)
-                best_loc = min_loc
-            else:
-                best_score = float(max_val)
-                best_loc = max_loc
-            
-            # 处理无效分数
-            if np.isnan(best_score) or np.isinf(best_score):
+            cand_boxes, cand_scores, best = output
+            box_chunks.append(cand_boxes)
+            score_chunks.append(cand_scores)
+            best_overall_result = self._better_result(best_overall_result, best)
+        
+        return self._stack_candidates(box_chunks, score_chunks) + (best_overall_result,)
+    
+    def _pyramid_search(
+        self,
+        template: TemplateEntry,
+        image_roi: np.ndarray,
+        scales: List[float]
+    ) -> Tuple[np.ndarray, np.ndarray, Optional[MatchResult]]:
+        """图像金字塔由粗到精搜索
+        
+        1. 将 ROI 和模板按 pyramid_factor 缩小，在全部尺度上粗匹配
+        2. 取全局前 pyramid_top_k 个峰值
+        3. 在原分辨率下，仅对峰值附近的小窗口、峰值尺度及相邻尺度精修
+        """
+        factor = self._param.pyramid_factor
+        roi_h, roi_w = image_roi.shape[:2]
+        # 粗匹配层由 Frame 缓存，同一帧上相同 ROI 的节点共享
+        coarse_roi = self._frame.resized(
+            self._roi, factor, cv2.COLOR_BGR2GRAY if self._use_gray() else 0
+        )
+        
+        box_chunks: List[np.ndarray] = []
+        score_chunks: List[np.ndarray] = []
+        best_overall_result: Optional[MatchResult] = None
+        
+        # 粗匹配峰值: (分数, 尺度索引, ROI 内 x, ROI 内 y)
+        peaks: List[Tuple[float, int, int, int]] = []
+        
+        for i, scale in enumerate(scales):
+            scaled_template = self._template_image(template, scale)
+            h, w = scaled_template.shape[:2]
+            if h > roi_h or w > roi_w:
                 continue
             
-            # 更新最佳结果
-            is_better = (not self._low_score_better and best_score > best_overall_score) or \
-                        (self._low_score_better and best_score < best_overall_score)
+            coarse_template = self._template_image(template, scale * factor)
+            ch, cw = coarse_template.shape[:2]
             
-            if is_better:
-                best_overall_score = best_score
-                best_overall_result = MatchResult(
-                    box=Rect(
-                        x=best_loc[0] + self._roi.x,
-                        y=best_loc[1] + self._roi.y,
-                        width=w,
-                        height=h
-                    ),
-                    score=best_score
+            # 模板缩小后细节不足，该尺度直接全分辨率匹配
+            if min(ch, cw) < self.PYRAMID_MIN_TEMPLATE_SIZE or \
+                    ch > coarse_roi.shape[0] or cw > coarse_roi.shape[1]:
+                mask = template.mask(scale) if self._param.green_mask else None
+                cand_boxes, cand_scores, best = self._match_scale(
+                    image_roi, scaled_template, mask, self._roi.x, self._roi.y
                 )
+                box_chunks.append(cand_boxes)
+                score_chunks.append(cand_scores)
+                best_overall_result = self._better_result(best_overall_result, best)
+                continue
             
-            # 提取当前尺度的候选点
-            pre_filter_threshold = 0.5
-            if self._low_score_better:
-                candidate_mask = matched < pre_filter_threshold
-            else:
-                candidate_mask = matched >= pre_filter_threshold
-            
-            candidate_coords = np.argwhere(candidate_mask)
-            
-            # 限制候选点数量
-            MAX_CANDIDATES = 50
-            if len(candidate_coords) > MAX_CANDIDATES:
-                scores = matched[candidate_mask]
-                if self._low_score_better:
-                    top_indices = np.argsort(scores)[:MAX_CANDIDATES]
-                else:
-                    top_indices = np.argsort(scores)[-MAX_CANDIDATES:][::-1]
-                candidate_coords = candidate_coords[top_indices]
+            coarse_mask = template.mask(scale * factor) if self._param.green_mask else None
+            matched = self._match(coarse_roi, coarse_template, coarse_mask)
             
-            for row, col in candidate_coords:
-                score = float(matched[row, col])
-                if np.isnan(score) or np.isinf(score):
+            for score, (x, y) in self._top_peaks(matched, self._param.pyramid_top_k, cw, ch):
+                peaks.append((score, i, int(x / factor), int(y / factor)))
+        
+        # 全局取前 K 个峰值（同一位置在多个尺度上的峰值只保留最优的一个）
+        peaks.sort(key=lambda p: p[0], reverse=not self._low_score_better)
+        selected: List[Tuple[float, int, int, int]] = []
+        for peak in peaks:
+            if len(selected) >= self._param.pyramid_top_k:
+                break
+            _, i, px, py = peak
+            h, w = template.scaled(scales[i]).shape[:2]
+            if any(abs(px - qx) < w // 2 and abs(py - qy) < h // 2 for _, _, qx, qy in selected):
+                continue
+            selected.append(peak)
+        
+        # 精修窗口边距: 覆盖粗匹配的量化误差
+        margin = int(np.ceil(1.0 / factor)) + self.PYRAMID_REFINE_MARGIN
+        refined = set()
+        
+        for _, i, px, py in selected:
+            for j in (i - 1, i, i + 1):
+                if j < 0 or j >= len(scales):
                     continue
+                scaled_template = self._template_image(template, scales[j])
+                h, w = scaled_template.shape[:2]
                 
-                box = Rect(
-                    x=col + self._roi.x,
-                    y=row + self._roi.y,
-                    width=w,
-                    height=h
+                x0 = max(0, px - margin)
+                y0 = max(0, py - margin)
+                x1 = min(roi_w, px + w + margin)
+                y1 = min(roi_h, py + h + margin)
+                if x1 - x0 < w or y1 - y0 < h or (j, x0, y0) in refined:
+                    continue
+                refined.add((j, x0, y0))
+                
+                mask = template.mask(scales[j]) if self._param.green_mask else None
+                cand_boxes, cand_scores, best = self._match_scale(
+                    image_roi[y0:y1, x0:x1], scaled_template, mask,
+                    self._roi.x + x0, self._roi.y + y0
                 )
-                all_results.append(MatchResult(box=box, score=score))
+                box_chunks.append(cand_boxes)
+                score_chunks.append(cand_scores)
+                best_overall_result = self._better_result(best_overall_result, best)
         
-        # 确保至少有一个结果 (参考 MAA: At least there is a result)
-        if not all_results and best_overall_result:
-            all_results.append(best_overall_result)
-        elif not all_results:
-            # 即使失败也返回一个占位结果
-            h, w = template.shape[:2]
-            all_results.append(MatchResult(
-                box=Rect(x=self._roi.x, y=self._roi.y, width=w, height=h),
-                score=0.0
-            ))
+        return self._stack_candidates(box_chunks, score_chunks) + (best_overall_result,)
+    
+    def _match(
+        self,
+        image: np.ndarray,
+        template: np.ndarray,
+        mask: Optional[np.ndarray]
+    ) -> np.ndarray:
+        """执行 matchTemplate，处理反转分数的方法"""
+        method = self._param.method
+        invert_score = False
+        if method >= self.METHOD_INVERT_BASE:
+            invert_score = True
+            method -= self.METHOD_INVERT_BASE
+        
+        if mask is not None:
+            matched = cv2.matchTemplate(image, template, method, mask=mask)
+        else:
+            matched = cv2.matchTemplate(image, template, method)
         
-        # NMS 去重 (参考 MAA 的 0.7 阈值)
-        all_results = self.nms(all_results, iou_threshold=0.7)
+        # 反转分数
+        if invert_score:
+            matched = 1.0 - matched
         
-        return all_results
+        return matched
     
-    def _create_mask(self, template: np.ndarray) -> Optional[np.ndarray]:
-        """创建绿色掩码
+    def _match_scale(
+        self,
+        image: np.ndarray,
+        scaled_template: np.ndarray,
+        mask: Optional[np.ndarray],
+        offset_x: int,
+        offset_y: int
+    ) -> Tuple[np.ndarray, np.ndarray, Optional[MatchResult]]:
+        """在单个尺度下匹配，返回 (候选框数组, 候选分数数组, 最佳结果)
         
-        将模板中纯绿色 RGB(0, 255, 0) 的区域设为掩码（不参与匹配）
+        候选框为 (N, 4) 的 [x, y, width, height] 数组，
+        offset_x/offset_y 为 image 左上角在原图中的坐标
         """
-        if template.shape[2] < 3:
-            return None
+        h, w = scaled_template.shape[:2]
+        matched = self._match(image, scaled_template, mask)
+        empty = (np.empty((0, 4), dtype=np.int64), np.empty(0, dtype=np.float64))
+        
+        # 使用 minMaxLoc 找最佳匹配点
+        min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(matched)
+        
+        if self._low_score_better:
+            best_score = float(min_val)
+            best_loc = min_loc
+        else:
+            best_score = float(max_val)
+            best_loc = max_loc
+        
+        # 处理无效分数
+        if np.isnan(best_score) or np.isinf(best_score):
+            return empty + (None,)
+        
+        best = MatchResult(
+            box=Rect(
+                x=int(best_loc[0] + offset_x),
+                y=int(best_loc[1] + offset_y),
+                width=w,
+                height=h
+            ),
+            score=best_score
+        )
+        
+        # 提取当前尺度的候选峰值
+        xs, ys, scores = self._candidate_peaks(matched, w, h)
+        
+        boxes = np.empty((len(scores), 4), dtype=np.int64)
+        boxes[:, 0] = xs + offset_x
+        boxes[:, 1] = ys + offset_y
+        boxes[:, 2] = w
+        boxes[:, 3] = h
+        
+        return boxes, scores, best
+    
+    def _candidate_peaks(
+        self,
+        matched: np.ndarray,
+        w: int,
+        h: int
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """从匹配结果图中提取最多 MAX_CANDIDATES 个候选峰值
+        
+        1. 膨胀（低分更优时为腐蚀）得到邻域极值，只保留等于邻域极值且通过预过滤阈值的点
+        2. findNonZero 只取出这些局部极大值，不再对整张结果图 argwhere / argsort
+        3. 峰值仍超过上限时用 argpartition 选出前 MAX_CANDIDATES 个，再对这些点排序
         
-        # BGR 格式中绿色是 (0, 255, 0)
-        green_lower = np.array([0, 250, 0])
-        green_upper = np.array([10, 255, 10])
+        Returns:
+            (x 数组, y 数组, 分数数组)，分数按优劣排序（超过上限时）
+        """
+        rx = max(1, int(w * self.PEAK_SUPPRESS_RATIO))
+        ry = max(1, int(h * self.PEAK_SUPPRESS_RATIO))
+        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (2 * rx + 1, 2 * ry + 1))
+        
+        if self._low_score_better:
+            local = cv2.erode(matched, kernel)
+            is_peak = cv2.compare(matched, local, cv2.CMP_LE)
+            passed = cv2.compare(matched, self.PRE_FILTER_THRESHOLD, cv2.CMP_LT)
+        else:
+            local = cv2.dilate(matched, kernel)
+            is_peak = cv2.compare(matched, local, cv2.CMP_GE)
+            passed = cv2.compare(matched, self.PRE_FILTER_THRESHOLD, cv2.CMP_GE)
+        
+        points = cv2.findNonZero(cv2.bitwise_and(is_peak, passed))
+        if points is None:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty, np.empty(0, dtype=np.float64)
+        
+        points = points.reshape(-1, 2)
+        xs = points[:, 0].astype(np.int64)
+        ys = points[:, 1].astype(np.int64)
+        scores = matched[ys, xs].astype(np.float64)
+        
+        # 去除无效分数
+        finite = np.isfinite(scores)
+        if not finite.all():
+            xs, ys, scores = xs[finite], ys[finite], scores[finite]
+        
+        # 限制候选点数量
+        k = self.MAX_CANDIDATES
+        if len(scores) > k:
+            keys = scores if self._low_score_better else -scores
+            top = np.argpartition(keys, k - 1)[:k]
+            top = top[np.argsort(keys[top], kind='stable')]
+            xs, ys, scores = xs[top], ys[top], scores[top]
+        
+        return xs, ys, scores
+    
+    @staticmethod
+    def _stack_candidates(
+        box_chunks: List[np.ndarray],
+        score_chunks: List[np.ndarray]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """合并各尺度的候选数组"""
+        if not score_chunks:
+            return np.empty((0, 4), dtype=np.int64), np.empty(0, dtype=np.float64)
+        return np.concatenate(box_chunks), np.concatenate(score_chunks)
+    
+    def _top_peaks(
+        self,
+        matched: np.ndarray,
+        k: int,
+        suppress_w: int,
+        suppress_h: int
+    ) -> List[Tuple[float, Tuple[int, int]]]:
+        """迭代 minMaxLoc 提取前 k 个峰值，每取一个峰值抑制其邻域"""
+        worst = np.inf if self._low_score_better else -np.inf
+        matched = np.nan_to_num(matched, nan=worst, posinf=worst, neginf=worst)
         
-        # 找到绿色区域
-        green_mask = cv2.inRange(template, green_lower, green_upper)
+        peaks = []
+        for _ in range(k):
+            min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(matched)
+            score, loc = (min_val, min_loc) if self._low_score_better else (max_val, max_loc)
+            if np.isinf(score):
+                break
+            peaks.append((float(score), loc))
+            
+            x, y = loc
+            matched[
+                max(0, y - suppress_h // 2) : y + suppress_h // 2 + 1,
+                max(0, x - suppress_w // 2) : x + suppress_w // 2 + 1
+            ] = worst
         
-        # 反转（绿色区域为0，其他为255）
-        mask = cv2.bitwise_not(green_mask)
+        return peaks
+    
+    def _better_result(
+        self,
+        current: Optional[MatchResult],
+        candidate: Optional[MatchResult]
+    ) -> Optional[MatchResult]:
+        """返回两者中分数更优的结果"""
+        if candidate is None:
+            return current
+        if current is None:
+            return candidate
+        if self._low_score_better:
+            return candidate if candidate.score < current.score else current
+        return candidate if candidate.score > current.score else current
+    
+    def _create_mask(self, template: np.ndarray) -> Optional[np.ndarray]:
+        """创建绿色掩码
         
-        return mask
+        将模板中纯绿色 RGB(0, 255, 0) 的区域设为掩码（不参与匹配）
+        """
+        return create_green_mask(template)
     
     def _get_threshold(self, index: int) -> float:
         """获取指定索引的阈值"""
@@ -0,0 +1,189 @@
+/**
+ * 后台任务 API
+ * 耗时操作（单元测试、Pipeline 测试、静态分析、AI 分析）在 Python 线程池中执行，
+ * submit 立即返回任务 ID，进度和结果通过 window 上的 'pyjob' 事件推送
+ */
+
+import { callPy } from './py'
+import type { TestCaseResult, TestResult, TestSuiteResult } from './unit-test'
+import type { CppcheckOptions, ProjectAnalysisResult } from './static-analysis'
+
+// ==================== 类型定义 ====================
+
+export type JobStatus = 'pending' | 'running' | 'succeeded' | 'failed' | 'cancelled'
+
+export interface JobInfo<T = unknown> {
+  id: string
+  kind: string
+  status: JobStatus
+  progress: number | null  // 0~1，null 表示不确定
+  message: string
+  error: string | null
+  created_at: number
+  started_at: number | null
+  finished_at: number | null
+  cancel_requested: boolean
+  result?: T  // 只在任务结束时提供
+  data?: unknown  // 进度事件附带的增量数据
+}
+
+/** 测试套件任务的增量数据: 用例结果或一个测试程序的最终结果 */
+export type SuiteProgressData =
+  | { type: 'case', test_name: string, case: TestCaseResult }
+  | { type: 'test', result: TestResult }
+
+export interface SubmitResult {
+  success: boolean
+  job_id?: string
+  error?: string
+}
+
+export const JOB_EVENT = 'pyjob'
+
+const FINISHED: JobStatus[] = ['succeeded', 'failed', 'cancelled']
+
+// ==================== 事件 ====================
+
+/**
+ * 监听任务事件，返回取消监听的函数
+ */
+export function onJobEvent(listener: (job: JobInfo) => void): () => void {
+  const handler = (e: Event) => listener((e as CustomEvent<JobInfo>).detail)
+  window.addEventListener(JOB_EVENT, handler)
+  return () => window.removeEventListener(JOB_EVENT, handler)
+}
+
+/**
+ * 等待任务结束
+ * 成功时返回结果，失败或取消时抛出异常；onProgress 接收运行中的进度事件
+ */
+export function waitForJob<T>(jobId: string, onProgress?: (job: JobInfo<T>) => void): Promise<T> {
+  return new Promise<T>((resolve, reject) => {
+    const settle = (job: JobInfo<T>) => {
+      if (!FINISHED.includes(job.status)) {
+        onProgress?.(job)
+        return
+      }
+      unsubscribe()
+      if (job.status === 'succeeded') {
+        resolve(job.result as T)
+      } else {
+        reject(new Error(job.status === 'cancelled' ? '任务已取消' : (job.error || '任务失败')))
+      }
+    }
+    const unsubscribe = onJobEvent((job) => {
+      if (job.id === jobId) settle(job as JobInfo<T>)
+    })
+    // 订阅前任务可能已经结束
+    getJob<T>(jobId).then((res) => {
+      if (res.success && res.job && FINISHED.includes(res.job.status)) settle(res.job)
+    })
+  })
+}
+
+async function submit<T>(fn: string, args: unknown[], onProgress?: (job: JobInfo<T>) => void): Promise<{ jobId: string, result: Promise<T> }> {
+  const res = await callPy<SubmitResult>(fn, ...args)
+  if (!res.success || !res.job_id) {
+    throw new Error(res.error || '提交任务失败')
+  }
+  return { jobId: res.job_id, result: waitForJob<T>(res.job_id, onProgress) }
+}
+
+// ==================== 任务提交 ====================
+
+/**
+ * 后台运行单元测试
+ */
+export function submitUnitTest(executablePath: string, testName: string, projectPath: string, onProgress?: (job: JobInfo<TestResult>) => void) {
+  return submit<TestResult>('submit_unit_test', [executablePath, testName, projectPath], onProgress)
+}
+
+/**
+ * 后台并发运行项目的全部单元测试，onProgress 的 job.data 为 SuiteProgressData
+ */
+export function submitUnitTestSuite(
+  projectPath: string,
+  jobs?: number,
+  splitFunctions: boolean = false,
+  onProgress?: (job: JobInfo<TestSuiteResult>) => void
+) {
+  return submit<TestSuiteResult>('submit_unit_test_suite', [projectPath, jobs ?? null, splitFunctions], onProgress)
+}
+
+/**
+ * 后台运行 UI 测试（含截图记录）
+ */
+export function submitUiTest(executablePath: string, testName: string, projectPath: string, onProgress?: (job: JobInfo<TestResult>) => void) {
+  return submit<TestResult>('submit_ui_test', [executablePath, testName, projectPath], onProgress)
+}
+
+/**
+ * 后台 AI 分析测试失败
+ */
+export function submitTestFailureAnalysis(
+  projectPath: string,
+  testName: string,
+  testFilePath: string,
+  failureOutput: string,
+  runId?: number
+) {
+  return submit<string>('submit_test_failure_analysis', [projectPath, testName, testFilePath, failureOutput, runId ?? null])
+}
+
+/**
+ * 后台静态分析项目
+ */
+export function submitStaticAnalysis(
+  projectDir: string,
+  options?: {
+    includePaths?: string[]
+    enableChecks?: string[]
+    severity?: string
+    cppcheckOptions?: CppcheckOptions
+  }
+) {
+  return submit<ProjectAnalysisResult>('submit_static_analysis', [
+    projectDir,
+    options?.includePaths || null,
+    options?.enableChecks && options.enableChecks.length > 0 ? options.enableChecks : null,
+    options?.severity || 'warning',
+    options?.cppcheckOptions || null,
+  ])
+}
+
+/**
+ * 后台运行 Pipeline 测试
+ */
+export function submitPipelineTest(
+  pipelinePath: string,
+  entry: string,
+  launchApp: boolean = true,
+  resourceDir?: string,
+  adaptiveRoi: boolean = false,
+  onProgress?: (job: JobInfo) => void
+) {
+  return submit<Record<string, unknown>>('submit_pipeline_test', [pipelinePath, entry, launchApp, resourceDir ?? null, adaptiveRoi], onProgress)
+}
+
+// ==================== 任务管理 ====================
+
+/**
+ * 取消任务
+ */
+export async function cancelJob(jobId: string): Promise<{ success: boolean, job_id?: string, error?: string }> {
+  return callPy('cancel_job', jobId)
+}
+
+/**
+ * 查询任务状态
+ */
+export async function getJob<T = unknown>(jobId: string): Promise<{ success: boolean, job?: JobInfo<T>, error?: string }> {
+  return callPy('get_job', jobId)
+}
+
+/**
+ * 列出任务（不含结果）
+ */
+export async function listJobs(kind?: string): Promise<{ success: boolean, jobs: JobInfo[] }> {
+  return callPy('list_jobs', kind ?? null)
+}
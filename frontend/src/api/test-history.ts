@@ -23,8 +23,9 @@ export interface TestCaseDetail {
   id: number
   run_id: number
   case_name: string
-  status: 'PASS' | 'FAIL' | 'SKIP'
+  status: 'PASS' | 'FAIL' | 'SKIP' | 'XPASS' | 'BPASS' | 'BFAIL' | 'BXPASS' | 'BXFAIL'
   message?: string
+  duration_ms?: number | null
 }
 
 export interface Screenshot {
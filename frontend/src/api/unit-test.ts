@@ -11,12 +11,28 @@ export interface UnitTestFile {
   exists: boolean
 }
 
+export interface BenchmarkResult {
+  value: number
+  unit: string        // 如 msecs、CPU ticks、instructions
+  total: number
+  iterations: number
+  metric?: string     // XML 报告中的指标名，如 WalltimeMilliseconds
+}
+
 export interface TestCaseResult {
   name: string
-  status: 'PASS' | 'FAIL' | 'SKIP'
+  status: 'PASS' | 'FAIL' | 'SKIP' | 'XPASS' | 'BPASS' | 'BFAIL' | 'BXPASS' | 'BXFAIL'
   message?: string
+  data_tag?: string | null           // 数据驱动测试的数据标签
+  location?: string | null           // 失败位置 file(line)
+  messages?: string[] | null         // QWARN / QDEBUG / XFAIL 等输出
+  benchmarks?: BenchmarkResult[] | null
+  duration_ms?: number | null        // 耗时（毫秒），来自 QTest XML 报告
 }
 
+/** 计为失败的用例状态（与后端 FAILED_STATUSES 一致，XPASS: 预期失败却通过） */
+export const FAILED_STATUSES: TestCaseResult['status'][] = ['FAIL', 'XPASS']
+
 export interface TestResult {
   test_name: string
   status: 'passed' | 'failed' | 'error'
@@ -31,6 +47,19 @@ export interface TestResult {
   ai_analysis?: string  // AI 分析结果（Markdown 格式）
 }
 
+export interface TestSuiteResult {
+  project_path: string
+  status: 'passed' | 'failed' | 'error'
+  total: number
+  passed: number
+  failed: number
+  skipped: number
+  wall_ms: number  // 整套测试的实际耗时
+  duration: string
+  jobs: number     // 并发进程数
+  results: TestResult[]
+}
+
 // ==================== API 调用 ====================
 
 async function callPy<T>(fn: string, ...args: unknown[]): Promise<T> {
@@ -60,6 +89,26 @@ export async function runUnitTest(executablePath: string, testName: string, proj
   return callPy<TestResult>('run_unit_test', executablePath, testName, projectPath)
 }
 
+/**
+ * 并发运行项目的全部单元测试
+ * @param jobs 同时运行的测试进程数，默认为 CPU 核数
+ * @param splitFunctions 是否把测试程序按测试函数拆分到多个进程
+ */
+export async function runUnitTestSuite(projectPath: string, jobs?: number, splitFunctions: boolean = false): Promise<TestSuiteResult> {
+  return callPy<TestSuiteResult>('run_unit_test_suite', projectPath, jobs ?? null, splitFunctions)
+}
+
+/**
+ * 导入测试报告文件（QTest XML / JUnit XML / TAP / QTest 纯文本）并记录
+ */
+export async function importTestReport(
+  projectPath: string,
+  reportPath: string,
+  testName?: string
+): Promise<{ success: boolean, results?: TestResult[], error?: string }> {
+  return callPy('import_test_report', projectPath, reportPath, testName ?? null)
+}
+
 /**
  * 运行 UI 测试（含截图记录）
  */
@@ -11,6 +11,8 @@ declare global {
         launch_target_app: () => Promise<AppLaunchResult>
         close_target_app: () => Promise<ApiResult>
         get_screen_frame: () => Promise<ScreenFrameResult>
+        start_live_view: (fps?: number, quality?: number, region?: number[]) => Promise<LiveViewResult>
+        stop_live_view: () => Promise<ApiResult>
         get_window_info: () => Promise<WindowInfoResult>
         focus_target_window: (windowTitle?: string) => Promise<ApiResult>
         run_stress_test: (iterations: number) => Promise<StressTestResult>
@@ -22,6 +24,7 @@ declare global {
         find_template: (templatePath: string, threshold?: number, roi?: number[]) => Promise<TemplateMatchResult>
         find_color: (lower: number[], upper: number[], roi?: number[], colorSpace?: string, minCount?: number) => Promise<ColorMatchResult>
         click_template: (templatePath: string, threshold?: number, roi?: number[], offset?: number[]) => Promise<ClickTemplateResult>
+        recognize_batch: (specs: RecognitionSpec[], parallel?: boolean) => Promise<BatchRecognitionResult>
         wait_for_template: (templatePath: string, threshold?: number, timeout?: number, interval?: number, roi?: number[]) => Promise<WaitTemplateResult>
         run_pipeline: (config: PipelineConfig, entry: string, resourceDir?: string) => Promise<PipelineResult>
         run_pipeline_from_file: (jsonPath: string, entry: string, resourceDir?: string) => Promise<PipelineResult>
@@ -52,6 +55,14 @@ export interface ScreenFrameResult extends ApiResult {
   height?: number
 }
 
+export interface LiveViewResult extends ApiResult {
+  url?: string
+  stream_url?: string  // 以下地址已包含访问令牌（?token=...），其他参数以 & 追加
+  frame_url?: string
+  tiles_url?: string
+  fps?: number
+}
+
 export interface WindowInfoResult extends ApiResult {
   all_windows?: string[]
   target_windows?: string[]
@@ -122,6 +133,22 @@ export interface ColorMatchResult extends ApiResult {
   filtered_count?: number
 }
 
+export type RecognitionSpec =
+  | { type: 'template'; template: string; threshold?: number; roi?: number[]; id?: string }
+  | { type: 'color'; lower: number[]; upper: number[]; roi?: number[]; color_space?: string; min_count?: number; id?: string }
+
+export type BatchItemResult = (TemplateMatchResult | ColorMatchResult) & {
+  index: number
+  id?: string | null
+}
+
+export interface BatchRecognitionResult extends ApiResult {
+  capture_ms?: number
+  cost_ms?: number
+  found?: number
+  results?: BatchItemResult[]
+}
+
 export interface ClickTemplateResult extends ApiResult {
   action?: string
   position?: { x: number; y: number }
@@ -230,6 +257,15 @@ export const visual = {
   getScreenFrame: () => 
     callPy<ScreenFrameResult>('get_screen_frame'),
   
+  /**
+   * 启动实时画面推流（本地 MJPEG 服务），stream_url 可直接作为 <img> 的 src
+   */
+  startLiveView: (fps = 10, quality = 70, region?: number[]) =>
+    callPy<LiveViewResult>('start_live_view', fps, quality, region),
+  
+  stopLiveView: () =>
+    callPy<ApiResult>('stop_live_view'),
+  
   getWindowInfo: () => 
     callPy<WindowInfoResult>('get_window_info'),
   
@@ -271,6 +307,12 @@ export const visual = {
   findColor: (lower: number[], upper: number[], roi?: number[], colorSpace = 'HSV', minCount = 100) =>
     callPy<ColorMatchResult>('find_color', lower, upper, roi, colorSpace, minCount),
   
+  /**
+   * 批量识别 - 截图一次，在同一帧上执行多个模板/颜色识别
+   */
+  recognizeBatch: (specs: RecognitionSpec[], parallel = true) =>
+    callPy<BatchRecognitionResult>('recognize_batch', specs, parallel),
+  
   /**
    * 找图并点击 - 查找模板并点击其中心
    */
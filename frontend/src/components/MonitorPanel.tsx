@@ -3,14 +3,14 @@
  */
 import { useState, useEffect, useRef } from 'react'
 import { visual } from '../api/visual'
-import type { ScreenFrameResult } from '../api/visual'
+import type { LiveViewResult, ScreenFrameResult } from '../api/visual'
 
 export function MonitorPanel() {
   const [isAppRunning, setIsAppRunning] = useState(false)
   const [screenFrame, setScreenFrame] = useState<string | null>(null)
   const [isMonitoring, setIsMonitoring] = useState(false)
   const [loading, setLoading] = useState(false)
-  const intervalRef = useRef<number | null>(null)
+  const viewRef = useRef<HTMLDivElement | null>(null)
 
   const launchApp = async () => {
     setLoading(true)
@@ -35,11 +35,7 @@ export function MonitorPanel() {
       const res = await visual.closeApp()
       if (res.success) {
         setIsAppRunning(false)
-        setIsMonitoring(false)
-        if (intervalRef.current) {
-          clearInterval(intervalRef.current)
-          intervalRef.current = null
-        }
+        stopMonitoring()
         alert('✅ 应用已关闭')
       } else {
         alert(`❌ 关闭失败: ${res.error}`)
@@ -51,23 +47,29 @@ export function MonitorPanel() {
     }
   }
 
-  const toggleMonitoring = () => {
+  const stopMonitoring = () => {
+    // 移除 <img> 即断开 MJPEG 连接，后台推流在没有观看者后自动停止截图
+    setIsMonitoring(false)
+    setScreenFrame(null)
+  }
+
+  const toggleMonitoring = async () => {
     if (isMonitoring) {
-      // 停止监控
-      if (intervalRef.current) {
-        clearInterval(intervalRef.current)
-        intervalRef.current = null
+      stopMonitoring()
+      return
+    }
+    // 开始监控：使用本地 MJPEG 推流，按显示区域宽度缩小画面
+    try {
+      const res: LiveViewResult = await visual.startLiveView(15)
+      if (res.success && res.stream_url) {
+        const width = Math.round((viewRef.current?.clientWidth || 1280) * window.devicePixelRatio)
+        setScreenFrame(`${res.stream_url}&width=${width}&t=${Date.now()}`)
+        setIsMonitoring(true)
+      } else {
+        alert(`❌ 启动监控失败: ${res.error}`)
       }
-      setIsMonitoring(false)
-    } else {
-      // 开始监控
-      setIsMonitoring(true)
-      captureFrame() // 立即捕获一帧
-      
-      // 每 500ms 捕获一帧
-      intervalRef.current = window.setInterval(() => {
-        captureFrame()
-      }, 500)
+    } catch (error) {
+      alert(`❌ 错误: ${error}`)
     }
   }
 
@@ -82,12 +84,10 @@ export function MonitorPanel() {
     }
   }
 
-  // 清理定时器
+  // 卸载时停止推流
   useEffect(() => {
     return () => {
-      if (intervalRef.current) {
-        clearInterval(intervalRef.current)
-      }
+      visual.stopLiveView().catch(() => {})
     }
   }, [])
 
@@ -124,7 +124,7 @@ export function MonitorPanel() {
         </button>
         <button
           onClick={captureFrame}
-          disabled={!isAppRunning}
+          disabled={!isAppRunning || isMonitoring}
           className="px-4 py-2 bg-purple-500 text-white rounded-lg hover:bg-purple-600 disabled:opacity-50 disabled:cursor-not-allowed text-sm font-medium transition-colors"
         >
           📸 单帧截图
@@ -132,7 +132,7 @@ export function MonitorPanel() {
       </div>
 
       {/* 视频监控区域 */}
-      <div className="border border-gray-300 dark:border-gray-600 rounded-lg overflow-hidden bg-gray-100 dark:bg-gray-900">
+      <div ref={viewRef} className="border border-gray-300 dark:border-gray-600 rounded-lg overflow-hidden bg-gray-100 dark:bg-gray-900">
         {screenFrame ? (
           <img 
             src={screenFrame} 
@@ -1,6 +1,7 @@
 import { useState, useEffect } from 'react'
 import { getTestHistory, getTestDetail } from '../api/test-history'
 import type { TestRun, TestRunDetail } from '../api/test-history'
+import { FAILED_STATUSES } from '../api/unit-test'
 import { Clock, CheckCircle, XCircle, AlertCircle, Image as ImageIcon, FileText } from 'lucide-react'
 import { renderMarkdown } from '../utils/markdown'
 
@@ -209,7 +210,7 @@ export function TestHistoryPanel({ projectPath, refreshTrigger }: TestHistoryPan
                         <span className="flex-1">{detail.case_name}</span>
                         <span className={`px-2 py-0.5 rounded text-xs ${detail.status === 'PASS'
                           ? 'bg-green-100 text-green-700'
-                          : detail.status === 'FAIL'
+                          : FAILED_STATUSES.includes(detail.status)
                             ? 'bg-red-100 text-red-700'
                             : 'bg-gray-100 text-gray-700'
                           }`}>
@@ -1,9 +1,25 @@
 import { useState, useEffect } from 'react'
 import { scanUnitTests, runUnitTest, runUiTest, analyzeTestFailure } from '../api/unit-test'
-import type { UnitTestFile, TestResult } from '../api/unit-test'
+import { FAILED_STATUSES } from '../api/unit-test'
+import type { UnitTestFile, TestResult, TestCaseResult } from '../api/unit-test'
 import { renderMarkdown } from '../utils/markdown'
 import { TestHistoryPanel } from './TestHistoryPanel'
 
+// 用例状态的图标和颜色: 只有 FAIL / XPASS 计为失败，跳过和黑名单结果使用中性样式
+function caseStyle(status: TestCaseResult['status']): { icon: string, className: string } {
+  if (status === 'PASS') {
+    return { icon: '✓', className: 'bg-green-50 dark:bg-green-900/20 text-green-800 dark:text-green-400' }
+  }
+  if (FAILED_STATUSES.includes(status)) {
+    return { icon: '✗', className: 'bg-red-50 dark:bg-red-900/20 text-red-800 dark:text-red-400' }
+  }
+  if (status === 'SKIP') {
+    return { icon: '⊘', className: 'bg-gray-50 dark:bg-gray-800 text-gray-600 dark:text-gray-400' }
+  }
+  // BPASS / BFAIL / BXPASS / BXFAIL: 黑名单中的用例，结果不计入通过或失败
+  return { icon: '○', className: 'bg-yellow-50 dark:bg-yellow-900/20 text-yellow-800 dark:text-yellow-400' }
+}
+
 interface UnitTestPanelProps {
   projectPath: string
   onViewFile?: (filePath: string) => void
@@ -319,23 +335,34 @@ export function UnitTestPanel({ projectPath, onViewFile }: UnitTestPanelProps) {
                     测试用例
                   </h4>
                   <div className="space-y-1">
-                    {selectedResult.details.map((detail, index) => (
-                      <div
-                        key={index}
-                        className={`p-2 rounded text-sm ${detail.status === 'PASS'
-                          ? 'bg-green-50 dark:bg-green-900/20 text-green-800 dark:text-green-400'
-                          : 'bg-red-50 dark:bg-red-900/20 text-red-800 dark:text-red-400'
-                          }`}
-                      >
-                        <div className="flex items-center gap-2">
-                          <span>{detail.status === 'PASS' ? '✓' : '✗'}</span>
-                          <span className="font-medium">{detail.name}</span>
+                    {selectedResult.details.map((detail, index) => {
+                      const style = caseStyle(detail.status)
+                      return (
+                        <div
+                          key={index}
+                          className={`p-2 rounded text-sm ${style.className}`}
+                        >
+                          <div className="flex items-center gap-2">
+                            <span>{style.icon}</span>
+                            <span className="font-medium">
+                              {detail.data_tag ? `${detail.name}(${detail.data_tag})` : detail.name}
+                            </span>
+                            {detail.status !== 'PASS' && detail.status !== 'FAIL' && (
+                              <span className="text-xs opacity-60">{detail.status}</span>
+                            )}
+                            {detail.duration_ms != null && (
+                              <span className="ml-auto text-xs opacity-60">{detail.duration_ms.toFixed(1)}ms</span>
+                            )}
+                          </div>
+                          {detail.message && (
+                            <div className="ml-6 mt-1 text-xs opacity-75 whitespace-pre-wrap">{detail.message}</div>
+                          )}
+                          {detail.location && (
+                            <div className="ml-6 mt-1 text-xs opacity-60 font-mono">{detail.location}</div>
+                          )}
                         </div>
-                        {detail.message && (
-                          <div className="ml-6 mt-1 text-xs opacity-75">{detail.message}</div>
-                        )}
-                      </div>
-                    ))}
+                      )
+                    })}
                   </div>
                 </div>
               )}